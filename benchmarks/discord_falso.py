@@ -0,0 +1,128 @@
+import asyncio
+from types import SimpleNamespace
+
+
+class CanalFalso:
+    """
+    Canal de texto que acepta mensajes sin red (con una latencia simulada opcional).
+    """
+    def __init__(self, canal_id: int, nombre: str, guild, latencia: float = 0.0):
+        self.id = canal_id
+        self.name = nombre
+        self.guild = guild
+        self.latencia = latencia
+        self.enviados = 0
+
+    async def send(self, content=None, file=None, embed=None, embeds=None):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+        if file is not None:
+            file.fp.read()
+        self.enviados += 1
+        return MensajeFalso(self)
+
+
+class MensajeFalso:
+    def __init__(self, canal):
+        self.channel = canal
+
+    async def edit(self, **kwargs):
+        return self
+
+
+class GuildFalso:
+    """
+    Servidor con canales indexados por ID, como la caché de discord.py.
+    """
+    def __init__(self, guild_id: int, nombre: str, latencia_envio: float = 0.0):
+        self.id = guild_id
+        self.name = nombre
+        self.filesize_limit = 10 * 1024 * 1024
+        self.me = SimpleNamespace(id=1)
+        self._canales = {}
+        self._latencia_envio = latencia_envio
+
+    def crear_canal(self, canal_id: int, nombre: str) -> CanalFalso:
+        canal = self._canales[canal_id] = CanalFalso(canal_id, nombre, self, self._latencia_envio)
+        return canal
+
+    def get_channel(self, canal_id: int):
+        return self._canales.get(canal_id)
+
+    def get_role(self, role_id: int):
+        return None
+
+
+class ClienteDiscordFalso:
+    def __init__(self, *guilds):
+        self._guilds = guilds
+
+    def get_channel(self, canal_id: int):
+        for guild in self._guilds:
+            canal = guild.get_channel(canal_id)
+            if canal is not None:
+                return canal
+        return None
+
+    def get_guild(self, guild_id: int):
+        return next((guild for guild in self._guilds if guild.id == guild_id), None)
+
+
+class RespuestaFalsa:
+    """
+    `interaction.response`: registra la respuesta inicial.
+    """
+    def __init__(self):
+        self._hecha = False
+
+    def is_done(self):
+        return self._hecha
+
+    async def defer(self, **kwargs):
+        self._hecha = True
+
+    async def send_message(self, *args, **kwargs):
+        self._hecha = True
+
+    async def send_modal(self, modal):
+        self._hecha = True
+
+
+class SeguimientoFalso:
+    """
+    `interaction.followup`: avisa con un evento cuando llega el resultado final.
+    """
+    def __init__(self):
+        self.enviados = []
+        self.terminado = asyncio.Event()
+
+    async def send(self, *args, **kwargs):
+        self.enviados.append((args, kwargs))
+        self.terminado.set()
+
+
+class InteraccionFalsa:
+    """
+    Lo que los handlers usan de `discord.Interaction`.
+    """
+    def __init__(self, guild: GuildFalso, cliente: ClienteDiscordFalso, usuario_id: int = 42):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.client = cliente
+        self.user = SimpleNamespace(id=usuario_id, name="bench")
+        self.response = RespuestaFalsa()
+        self.followup = SeguimientoFalso()
+        self.extras = {}
+
+
+class ContextoFalso:
+    """
+    Lo que los comandos con prefijo usan de `commands.Context`.
+    """
+    def __init__(self, guild: GuildFalso, usuario_id: int = 42):
+        self.guild = guild
+        self.author = SimpleNamespace(id=usuario_id, name="bench")
+        self.channel = CanalFalso(0, "bench", guild)
+
+    async def send(self, *args, **kwargs):
+        return await self.channel.send(*args, **kwargs)
@@ -0,0 +1,323 @@
+import asyncio
+import datetime
+from types import SimpleNamespace
+
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore import DELETE_FIELD
+
+
+class AlmacenFalso:
+    """
+    Datos en memoria compartidos por los clientes falsos: ruta de colección -> {doc_id: datos}.
+
+    Cuenta las lecturas y escrituras de documentos para compararlas entre versiones y puede
+    simular la latencia de red de cada llamada.
+    """
+    def __init__(self, latencia: float = 0.0):
+        self.latencia = latencia
+        self.colecciones = {}
+        self.actualizados = {}   # (ruta, doc_id) -> datetime de la última escritura
+        self._ordenados = {}     # ruta -> lista de IDs ordenada (se invalida al escribir)
+        self._oyentes = {}       # ruta -> [callback]
+        self.lecturas = 0
+        self.escrituras = 0
+
+    async def red(self):
+        if self.latencia:
+            await asyncio.sleep(self.latencia)
+
+    def coleccion(self, ruta):
+        return self.colecciones.setdefault(ruta, {})
+
+    def ids_ordenados(self, ruta):
+        ids = self._ordenados.get(ruta)
+        if ids is None:
+            ids = self._ordenados[ruta] = sorted(self.coleccion(ruta))
+        return ids
+
+    def snapshot(self, ruta, doc_id):
+        datos = self.coleccion(ruta).get(doc_id)
+        return DocumentoFalso(doc_id, datos, self.actualizados.get((ruta, doc_id)))
+
+    def escribir(self, ruta, doc_id, datos):
+        """
+        Guarda (o borra, con datos None) un documento y avisa a los listeners de la colección.
+        """
+        coleccion = self.coleccion(ruta)
+        existia = doc_id in coleccion
+        if datos is None:
+            coleccion.pop(doc_id, None)
+            self.actualizados.pop((ruta, doc_id), None)
+        else:
+            coleccion[doc_id] = datos
+            self.actualizados[(ruta, doc_id)] = datetime.datetime.now(datetime.timezone.utc)
+        if existia != (datos is not None) or datos is None:
+            self._ordenados.pop(ruta, None)
+        self.escrituras += 1
+
+        oyentes = self._oyentes.get(ruta)
+        if oyentes:
+            tipo = "REMOVED" if datos is None else ("MODIFIED" if existia else "ADDED")
+            cambio = SimpleNamespace(type=SimpleNamespace(name=tipo), document=self.snapshot(ruta, doc_id))
+            for callback in oyentes:
+                callback([], [cambio], None)
+
+    def cargar(self, ruta, documentos):
+        """
+        Siembra una colección sin contar escrituras ni avisar a listeners.
+        """
+        ahora = datetime.datetime.now(datetime.timezone.utc)
+        coleccion = self.coleccion(ruta)
+        for doc_id, datos in documentos:
+            coleccion[doc_id] = datos
+            self.actualizados[(ruta, doc_id)] = ahora
+        self._ordenados.pop(ruta, None)
+
+
+def _aplicar_campos(actual, campos):
+    datos = dict(actual or {})
+    for clave, valor in campos.items():
+        if valor is DELETE_FIELD:
+            datos.pop(clave, None)
+        else:
+            datos[clave] = valor
+    return datos
+
+
+class DocumentoFalso:
+    """
+    Equivalente a `DocumentSnapshot`.
+    """
+    def __init__(self, doc_id, datos, actualizado=None, campos=None):
+        self.id = doc_id
+        self.exists = datos is not None
+        self.update_time = actualizado
+        if datos is not None and campos is not None:
+            datos = {campo: datos[campo] for campo in campos if campo in datos}
+        self._datos = datos
+
+    def to_dict(self):
+        return dict(self._datos) if self._datos is not None else None
+
+
+class ReferenciaFalsa:
+    """
+    Equivalente asíncrono de `DocumentReference`.
+    """
+    def __init__(self, almacen, ruta, doc_id):
+        self._almacen = almacen
+        self._ruta = ruta
+        self.id = doc_id
+
+    async def get(self):
+        await self._almacen.red()
+        self._almacen.lecturas += 1
+        return self._almacen.snapshot(self._ruta, self.id)
+
+    async def set(self, datos, merge=False):
+        await self._almacen.red()
+        actual = self._almacen.coleccion(self._ruta).get(self.id) if merge else None
+        self._almacen.escribir(self._ruta, self.id, _aplicar_campos(actual, datos))
+
+    async def update(self, campos):
+        await self._almacen.red()
+        actual = self._almacen.coleccion(self._ruta).get(self.id)
+        if actual is None:
+            raise NotFound(f"No existe el documento {self._ruta}/{self.id}")
+        self._almacen.escribir(self._ruta, self.id, _aplicar_campos(actual, campos))
+
+    async def create(self, datos):
+        await self._almacen.red()
+        if self.id in self._almacen.coleccion(self._ruta):
+            raise AlreadyExists(f"Ya existe el documento {self._ruta}/{self.id}")
+        self._almacen.escribir(self._ruta, self.id, _aplicar_campos(None, datos))
+
+    async def delete(self):
+        await self._almacen.red()
+        self._almacen.escribir(self._ruta, self.id, None)
+
+
+class ConsultaFalsa:
+    """
+    Consultas con los filtros que usa el bot: igualdad, orden por ID, límite, cursor y proyección.
+    """
+    def __init__(self, almacen, ruta, filtros=(), limite=None, despues_de=None, campos=None):
+        self._almacen = almacen
+        self._ruta = ruta
+        self._filtros = filtros
+        self._limite = limite
+        self._despues_de = despues_de
+        self._campos = campos
+
+    def _copiar(self, **cambios):
+        argumentos = dict(filtros=self._filtros, limite=self._limite, despues_de=self._despues_de, campos=self._campos)
+        argumentos.update(cambios)
+        return ConsultaFalsa(self._almacen, self._ruta, **argumentos)
+
+    def where(self, campo, operador, valor):
+        if operador != '==':
+            raise NotImplementedError(f"Operador no soportado en el Firestore falso: {operador}")
+        return self._copiar(filtros=self._filtros + ((campo, valor),))
+
+    def order_by(self, campo):
+        if campo != '__name__':
+            raise NotImplementedError("El Firestore falso solo ordena por ID de documento.")
+        return self
+
+    def limit(self, limite):
+        return self._copiar(limite=limite)
+
+    def start_after(self, cursor):
+        return self._copiar(despues_de=cursor['__name__'])
+
+    def select(self, campos):
+        return self._copiar(campos=tuple(campos))
+
+    def _resolver(self):
+        import bisect
+        coleccion = self._almacen.coleccion(self._ruta)
+        ids = self._almacen.ids_ordenados(self._ruta)
+        inicio = bisect.bisect_right(ids, self._despues_de) if self._despues_de is not None else 0
+        resultado = []
+        for doc_id in ids[inicio:]:
+            datos = coleccion.get(doc_id)
+            if datos is None or any(datos.get(campo) != valor for campo, valor in self._filtros):
+                continue
+            resultado.append(DocumentoFalso(doc_id, datos, self._almacen.actualizados.get((self._ruta, doc_id)),
+                                            self._campos))
+            if self._limite is not None and len(resultado) >= self._limite:
+                break
+        self._almacen.lecturas += max(1, len(resultado))
+        return resultado
+
+    async def get(self):
+        await self._almacen.red()
+        return self._resolver()
+
+    async def stream(self):
+        await self._almacen.red()
+        for doc in self._resolver():
+            yield doc
+
+
+class ColeccionFalsa(ConsultaFalsa):
+    """
+    Equivalente asíncrono de `CollectionReference`.
+    """
+    def document(self, doc_id):
+        return ReferenciaFalsa(self._almacen, self._ruta, doc_id)
+
+
+class LoteFalso:
+    """
+    Equivalente de `WriteBatch`: las escrituras se aplican juntas al confirmar.
+    """
+    def __init__(self, almacen):
+        self._almacen = almacen
+        self._operaciones = []
+
+    def create(self, ref, datos):
+        self._operaciones.append(("create", ref, datos))
+
+    def set(self, ref, datos, merge=False):
+        self._operaciones.append(("set", ref, datos, merge))
+
+    def update(self, ref, campos):
+        self._operaciones.append(("update", ref, campos))
+
+    def delete(self, ref):
+        self._operaciones.append(("delete", ref))
+
+    async def commit(self):
+        await self._almacen.red()
+        # Validar todo antes de aplicar, como una escritura atómica
+        for operacion in self._operaciones:
+            existe = operacion[1].id in self._almacen.coleccion(operacion[1]._ruta)
+            if operacion[0] == "create" and existe:
+                raise AlreadyExists(f"Ya existe el documento {operacion[1]._ruta}/{operacion[1].id}")
+            if operacion[0] == "update" and not existe:
+                raise NotFound(f"No existe el documento {operacion[1]._ruta}/{operacion[1].id}")
+        for operacion in self._operaciones:
+            tipo, ref = operacion[0], operacion[1]
+            actual = self._almacen.coleccion(ref._ruta).get(ref.id)
+            if tipo == "delete":
+                self._almacen.escribir(ref._ruta, ref.id, None)
+            elif tipo == "set":
+                self._almacen.escribir(ref._ruta, ref.id, _aplicar_campos(actual if operacion[3] else None, operacion[2]))
+            else:
+                self._almacen.escribir(ref._ruta, ref.id, _aplicar_campos(actual, operacion[2]))
+        self._operaciones = []
+
+
+class ClienteFalso:
+    """
+    Sustituto de `firestore_async.client()`.
+    """
+    def __init__(self, almacen):
+        self._almacen = almacen
+
+    def collection(self, ruta):
+        return ColeccionFalsa(self._almacen, ruta)
+
+    def batch(self):
+        return LoteFalso(self._almacen)
+
+    async def get_all(self, refs):
+        refs = list(refs)
+        await self._almacen.red()
+        self._almacen.lecturas += len(refs)
+        for ref in refs:
+            yield self._almacen.snapshot(ref._ruta, ref.id)
+
+
+class ColeccionSincronaFalsa:
+    """
+    Solo lo que usa el cliente síncrono: los listeners `on_snapshot`.
+    """
+    def __init__(self, almacen, ruta):
+        self._almacen = almacen
+        self._ruta = ruta
+
+    def on_snapshot(self, callback):
+        # Snapshot inicial con todos los documentos, luego un aviso por escritura
+        cambios = [SimpleNamespace(type=SimpleNamespace(name="ADDED"), document=self._almacen.snapshot(self._ruta, doc_id))
+                   for doc_id in self._almacen.coleccion(self._ruta)]
+        self._almacen.lecturas += len(cambios)
+        callback([], cambios, None)
+        oyentes = self._almacen._oyentes.setdefault(self._ruta, [])
+        oyentes.append(callback)
+        return SimpleNamespace(unsubscribe=lambda: oyentes.remove(callback))
+
+
+class ClienteSincronoFalso:
+    """
+    Sustituto de `firestore.client()`.
+    """
+    def __init__(self, almacen):
+        self._almacen = almacen
+
+    def collection(self, ruta):
+        return ColeccionSincronaFalsa(self._almacen, ruta)
+
+
+class ProveedorFalso:
+    """
+    Sustituto de `proveedor_firestore`: los clientes falsos están listos desde el principio.
+    """
+    listo = True
+
+    def __init__(self, almacen):
+        self._db = ClienteSincronoFalso(almacen)
+        self._db_async = ClienteFalso(almacen)
+
+    def cliente(self):
+        return self._db
+
+    async def cliente_async(self):
+        return self._db_async
+
+    def precalentar(self):
+        return None
+
+    def estadisticas(self):
+        return {"listo": True, "tiempos_ms": {}, "ultimo_error": None}
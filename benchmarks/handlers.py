@@ -0,0 +1,329 @@
+"""
+Benchmark offline de los handlers del bot: Firestore en memoria e interacciones falsas, sin red.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.handlers --tamanos 10 1000 50000 --concurrencias 1 8 --salida bench.json
+    python -m benchmarks.handlers --comparar bench_anterior.json
+
+Para cada handler, tamaño de colección y nivel de concurrencia informa la latencia
+p50/p99, la primera llamada (en frío), la memoria asignada por operación (tracemalloc)
+y los documentos leídos/escritos en el Firestore falso.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+# La caché de portadas escribe en disco: usar un directorio temporal
+os.environ.setdefault("CACHE_PORTADAS_DIR", tempfile.mkdtemp(prefix="bench_portadas_"))
+# Sin endpoint de métricas durante el benchmark
+os.environ.setdefault("METRICAS_PUERTO", "0")
+
+from benchmarks.firestore_falso import AlmacenFalso, ProveedorFalso
+from benchmarks.discord_falso import ClienteDiscordFalso, ContextoFalso, GuildFalso, InteraccionFalsa
+
+# Firestore falso en lugar de `utils_py.firestore` (que se conecta con credenciales reales)
+almacen = AlmacenFalso()
+_modulo_firestore = types.ModuleType("utils_py.firestore")
+_modulo_firestore.proveedor_firestore = ProveedorFalso(almacen)
+sys.modules["utils_py.firestore"] = _modulo_firestore
+
+from comandos_py.actualizarproyecto import ActualizarProyectoModal, autocomplete_proyectos  # noqa: E402
+from comandos_py.generarmensaje import GenerarMensajeModal, autocomplete_titulos  # noqa: E402
+from comandos_pref.prefiactua import PrefixedCommands  # noqa: E402
+from utils_py.cola_envios import cola_envios  # noqa: E402
+from utils_py.cache_imagenes import EntradaPortada, cache_imagenes  # noqa: E402
+from utils_py.limites_discord import LimitadorRutas  # noqa: E402
+from utils_py.proyectos import clave_titulo  # noqa: E402
+from utils_py.sesion_http import cerrar_sesion  # noqa: E402
+
+# Los rate limits de Discord son esperas deliberadas, no coste del handler: no se simulan
+cola_envios.limitador = LimitadorRutas(por_canal=10 ** 9, periodo_canal=1.0, globales=10 ** 9)
+
+TAMANOS = [10, 100, 1000, 10000, 50000]
+CONCURRENCIAS = [1, 8, 32]
+HANDLERS = ["autocomplete_proyectos", "autocomplete_titulos", "generarmensaje", "actualizarproyecto",
+            "actualizar_dominio"]
+URL_PORTADA = "https://bench.invalid/portada.png"
+PNG_MINIMO = (b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f'
+              b'\x15\xc4\x89\x00\x00\x00\rIDATx\x9cc\xf8\x0f\x00\x00\x01\x01\x00\x05\x18\xd8N\x00\x00\x00'
+              b'\x00IEND\xaeB`\x82')
+_PALABRAS = ("solo", "leveling", "ragnarök", "el", "regreso", "del", "héroe", "academia", "mágica", "torre",
+             "dios", "espada", "reencarnación", "villana", "duque", "cazador", "dragón", "emperador", "cielo",
+             "sombra", "martial", "peak", "omniscient", "reader", "tower", "god", "return", "mount", "hua")
+
+
+def generar_titulos(cantidad: int, semilla: int = 7):
+    """
+    Títulos únicos y realistas (acentos, mayúsculas, palabras repetidas entre proyectos).
+    """
+    azar = random.Random(semilla)
+    titulos = []
+    for numero in range(cantidad):
+        palabras = azar.sample(_PALABRAS, azar.randint(2, 5))
+        titulos.append(" ".join(palabras).title() + f" {numero}")
+    return titulos
+
+
+class Escenario:
+    """
+    Un servidor sembrado con `tamano` proyectos, su configuración y sus canales.
+    """
+    def __init__(self, server_id: int, tamano: int, latencia_envio: float):
+        self.server_id = str(server_id)
+        self.titulos = generar_titulos(tamano)
+        self.guild = GuildFalso(server_id, f"Bench {tamano}", latencia_envio)
+        self.canal = self.guild.crear_canal(server_id * 10 + 1, "publicaciones")
+        self.cliente = ClienteDiscordFalso(self.guild)
+        self.azar = random.Random(server_id)
+        self.dominio = 0
+
+        almacen.cargar(f"servidores/{self.server_id}/proyectos", (
+            (clave_titulo(titulo), {"titulo": titulo, "sinopsis": "Sinopsis " * 20,
+                                    "link_ikigai": f"https://viejo.ejemplo/series/{indice}"})
+            for indice, titulo in enumerate(self.titulos)
+        ))
+        almacen.cargar(f"servidores/{self.server_id}/configugeneral", [("main", {
+            "server_name": self.guild.name, "idsv_": self.server_id, "id_canalp": self.canal.id,
+            "ide_1": 111, "ide_2": 222, "ido_1": 333,
+        })])
+
+    def interaccion(self):
+        return InteraccionFalsa(self.guild, self.cliente)
+
+    def consulta(self):
+        """
+        Texto parcial como el que escribe un usuario: prefijo, palabra suelta o con errores.
+        """
+        titulo = self.azar.choice(self.titulos)
+        modo = self.azar.random()
+        if modo < 0.5:
+            return titulo[:self.azar.randint(1, 8)].lower()
+        if modo < 0.8:
+            return self.azar.choice(titulo.split())
+        return titulo[:6].replace(titulo[2], "x")
+
+
+def _llenar(modal, **valores):
+    # Simula lo que el usuario escribió en cada campo del modal
+    for campo, valor in valores.items():
+        getattr(modal, campo)._value = valor
+
+
+def construir_casos(escenario: Escenario):
+    """
+    Devuelve {nombre: coroutine function(i)} para cada handler.
+
+    Si el caso devuelve un número, es la latencia de respuesta del handler (antes de
+    que termine el trabajo encolado); la latencia total la mide el arnés.
+    """
+    cog = PrefixedCommands(bot=None)
+
+    async def caso_autocomplete_proyectos(i):
+        await autocomplete_proyectos(escenario.interaccion(), escenario.consulta())
+
+    async def caso_autocomplete_titulos(i):
+        await autocomplete_titulos(escenario.interaccion(), escenario.consulta())
+
+    async def caso_generarmensaje(i):
+        interaccion = escenario.interaccion()
+        modal = GenerarMensajeModal(titulo=escenario.azar.choice(escenario.titulos))
+        _llenar(modal, capitulo=str(i), tmo_link="https://tmo.ejemplo/1", imagen=URL_PORTADA)
+        inicio = time.perf_counter()
+        await modal.on_submit(interaccion)
+        respuesta = time.perf_counter() - inicio
+        await interaccion.followup.terminado.wait()
+        return respuesta
+
+    async def caso_actualizarproyecto(i):
+        # Cada operación renombra un proyecto distinto (y mueve su documento de clave)
+        indice = i % len(escenario.titulos)
+        anterior = escenario.titulos[indice]
+        nuevo = f"{anterior.rsplit(' (', 1)[0]} (v{i})"
+        escenario.titulos[indice] = nuevo
+        modal = ActualizarProyectoModal(titulo=anterior)
+        _llenar(modal, nombre_nuevo=nuevo, sinopsis="Sinopsis actualizada")
+        await modal.on_submit(escenario.interaccion())
+
+    async def caso_actualizar_dominio(i):
+        escenario.dominio += 1
+        await cog.actualizar_dominio.callback(cog, ContextoFalso(escenario.guild), f"d{escenario.dominio}.ejemplo")
+
+    return {
+        "autocomplete_proyectos": caso_autocomplete_proyectos,
+        "autocomplete_titulos": caso_autocomplete_titulos,
+        "generarmensaje": caso_generarmensaje,
+        "actualizarproyecto": caso_actualizarproyecto,
+        "actualizar_dominio": caso_actualizar_dominio,
+    }
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000, 3)
+
+
+async def medir(caso, iteraciones: int, concurrencia: int, desplazamiento: int):
+    """
+    Ejecuta `iteraciones` llamadas con `concurrencia` en vuelo; devuelve las latencias.
+    """
+    totales, respuestas = [], []
+    siguiente = iter(range(desplazamiento, desplazamiento + iteraciones))
+
+    async def trabajador():
+        for i in siguiente:
+            inicio = time.perf_counter()
+            respuesta = await caso(i)
+            totales.append(time.perf_counter() - inicio)
+            if respuesta is not None:
+                respuestas.append(respuesta)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabajador() for _ in range(concurrencia)))
+    return totales, respuestas, time.perf_counter() - inicio
+
+
+async def medir_memoria(caso, iteraciones: int, desplazamiento: int):
+    """
+    Pico de memoria asignada por operación (en KB), una operación cada vez.
+    """
+    picos = []
+    tracemalloc.start()
+    try:
+        for i in range(desplazamiento, desplazamiento + iteraciones):
+            actual, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            await caso(i)
+            picos.append(tracemalloc.get_traced_memory()[1] - actual)
+    finally:
+        tracemalloc.stop()
+    return picos
+
+
+async def ejecutar(argumentos):
+    almacen.latencia = argumentos.latencia_firestore_ms / 1000
+    await cache_imagenes.guardar(EntradaPortada(URL_PORTADA, PNG_MINIMO, "png", "image/png", frescura=10 ** 9))
+
+    resultados = []
+    for numero, tamano in enumerate(argumentos.tamanos):
+        escenario = Escenario(900000 + numero, tamano, argumentos.latencia_discord_ms / 1000)
+        casos = construir_casos(escenario)
+        for nombre in argumentos.handlers:
+            caso = casos[nombre]
+            # La migración de dominio recorre toda la colección: pocas repeticiones y sin concurrencia
+            iteraciones = min(argumentos.iteraciones, 5) if nombre == "actualizar_dominio" else argumentos.iteraciones
+            concurrencias = [1] if nombre == "actualizar_dominio" else argumentos.concurrencias
+            desplazamiento = 0
+
+            inicio = time.perf_counter()
+            await caso(desplazamiento)
+            frio = time.perf_counter() - inicio
+            desplazamiento += 1
+
+            for concurrencia in concurrencias:
+                lecturas, escrituras = almacen.lecturas, almacen.escrituras
+                totales, respuestas, duracion = await medir(caso, iteraciones, concurrencia, desplazamiento)
+                desplazamiento += iteraciones
+                lecturas, escrituras = almacen.lecturas - lecturas, almacen.escrituras - escrituras
+
+                picos = await medir_memoria(caso, min(iteraciones, argumentos.iteraciones_memoria), desplazamiento)
+                desplazamiento += len(picos)
+
+                resultado = {
+                    "handler": nombre,
+                    "tamano": tamano,
+                    "concurrencia": concurrencia,
+                    "iteraciones": len(totales),
+                    "frio_ms": round(frio * 1000, 3),
+                    "p50_ms": percentil(totales, 0.50),
+                    "p99_ms": percentil(totales, 0.99),
+                    "max_ms": round(max(totales) * 1000, 3),
+                    "ops_por_segundo": round(len(totales) / duracion, 1),
+                    "memoria_kb_p50": round(sorted(picos)[len(picos) // 2] / 1024, 1) if picos else 0.0,
+                    "memoria_kb_max": round(max(picos, default=0) / 1024, 1),
+                    "lecturas_por_op": round(lecturas / len(totales), 2),
+                    "escrituras_por_op": round(escrituras / len(totales), 2),
+                }
+                if respuestas:
+                    resultado["respuesta_p50_ms"] = percentil(respuestas, 0.50)
+                    resultado["respuesta_p99_ms"] = percentil(respuestas, 0.99)
+                resultados.append(resultado)
+                print(f"{nombre:<24} n={tamano:<6} c={concurrencia:<3} p50={resultado['p50_ms']:>9} ms "
+                      f"p99={resultado['p99_ms']:>9} ms  mem={resultado['memoria_kb_max']:>8} KB  "
+                      f"lect/op={resultado['lecturas_por_op']}")
+
+    await cerrar_sesion()
+    return resultados
+
+
+def comparar(actuales, archivo: str, umbral: float):
+    """
+    Muestra la variación de p50/p99 respecto a un JSON anterior y marca las regresiones.
+    """
+    with open(archivo, encoding="utf-8") as f:
+        anteriores = {(r["handler"], r["tamano"], r["concurrencia"]): r for r in json.load(f)["resultados"]}
+    regresiones = 0
+    for actual in actuales:
+        anterior = anteriores.get((actual["handler"], actual["tamano"], actual["concurrencia"]))
+        if anterior is None:
+            continue
+        for metrica in ("p50_ms", "p99_ms"):
+            if not anterior[metrica]:
+                continue
+            cambio = actual[metrica] / anterior[metrica] - 1
+            if cambio > umbral:
+                regresiones += 1
+                print(f"REGRESIÓN {actual['handler']} n={actual['tamano']} c={actual['concurrencia']} "
+                      f"{metrica}: {anterior[metrica]} -> {actual[metrica]} ms ({cambio:+.0%})")
+    print(f"{regresiones} regresiones por encima del {umbral:.0%} frente a {archivo}")
+    return regresiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de los handlers del bot.")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=TAMANOS, help="Proyectos por servidor")
+    parser.add_argument("--concurrencias", type=int, nargs="+", default=CONCURRENCIAS)
+    parser.add_argument("--handlers", nargs="+", choices=HANDLERS, default=HANDLERS)
+    parser.add_argument("--iteraciones", type=int, default=200)
+    parser.add_argument("--iteraciones-memoria", type=int, default=20)
+    parser.add_argument("--latencia-firestore-ms", type=float, default=0.0, help="Latencia simulada por llamada")
+    parser.add_argument("--latencia-discord-ms", type=float, default=0.0, help="Latencia simulada por envío")
+    parser.add_argument("--salida", default="bench_output.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    parser.add_argument("--umbral", type=float, default=0.10, help="Variación que cuenta como regresión")
+    parser.add_argument("--logs", action="store_true", help="Mostrar los logs INFO de los handlers")
+    argumentos = parser.parse_args()
+
+    if not argumentos.logs:
+        logging.disable(logging.INFO)
+
+    resultados = asyncio.run(ejecutar(argumentos))
+    with open(argumentos.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            "meta": {
+                "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "plataforma": platform.platform(),
+                "argumentos": {clave: valor for clave, valor in vars(argumentos).items() if clave != "comparar"},
+            },
+            "resultados": resultados,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {argumentos.salida}")
+
+    if argumentos.comparar:
+        sys.exit(1 if comparar(resultados, argumentos.comparar, argumentos.umbral) else 0)
+
+
+if __name__ == "__main__":
+    main()
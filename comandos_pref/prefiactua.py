@@ -1,10 +1,21 @@
 # comandos_pref/prefiactua.py
 import discord
 from discord.ext import commands
-from utils_py.firestore import db
-from google.cloud.firestore import DELETE_FIELD
+from utils_py.cache_config import cache_config
+from utils_py.dominiofire import migrar_dominio_global, migrar_dominio_servidor
+from utils_py.proyectos import migrar_claves as migrar_claves_proyectos
+from utils_py.cola_publicaciones import cola_publicaciones
+from utils_py.cola_envios import PRIORIDAD_ADMIN, cola_envios
+from utils_py.cache_imagenes import cache_imagenes
+from utils_py.monitor_loop import monitor_loop
+from utils_py.validacion_ids import resolver_ids, campos_numerados
+from utils_py.plantillas import PlantillaCompilada
+from utils_py.almacenamiento import BORRAR_CAMPO, almacenamiento
+from utils_py.clusters import CLUSTER_ID, CLUSTERS, estado_shards
 import asyncio
 import logging
+import os
+from collections import OrderedDict
 
 # Configuración del logger
 logger = logging.getLogger(__name__)
@@ -14,20 +25,69 @@ formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(messag
 handler.setFormatter(formatter)
 logger.addHandler(handler)
 
+# Máximo de servidores de Discord con el contexto por defecto (el propio servidor) en memoria
+MAX_CONTEXTOS = int(os.getenv("MAX_CONTEXTOS_ADMIN", "1000"))
+
 class PrefixedCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.server_config = {}  # Inicializa server_config como un diccionario vacío
+        # Contexto de administración por servidor de Discord: guild_id -> server_config
+        self.server_configs = OrderedDict()  # Por defecto (el propio servidor); LRU, se puede volver a cargar
+        self.servidores_elegidos = {}  # Elegidos con `$manager server`; nunca se descartan
 
-    def set_server_config(self, server_id: str, server_name: str):
+    def set_server_config(self, guild_id: int, server_id: str, server_name: str, explicito: bool = True):
         """
-        Configura los datos del servidor actual.
+        Configura el servidor destino de los comandos invocados desde un servidor de Discord.
+
+        Los destinos elegidos explícitamente no entran en el LRU: descartarlos cambiaría en silencio
+        el servidor al que apuntan los comandos.
         """
-        self.server_config = {
+        server_config = {
             "server_id": server_id,
             "server_name": server_name
         }
-        logger.info(f"Server configurado: ID={server_id}, Nombre={server_name}")
+        if explicito:
+            self.servidores_elegidos[guild_id] = server_config
+            self.server_configs.pop(guild_id, None)
+            logger.info(f"Server configurado para el servidor de Discord {guild_id}: ID={server_id}, Nombre={server_name}")
+            return
+        self.server_configs[guild_id] = server_config
+        self.server_configs.move_to_end(guild_id)
+        while len(self.server_configs) > MAX_CONTEXTOS:
+            self.server_configs.popitem(last=False)
+
+    async def get_server_config(self, ctx) -> dict:
+        """
+        Devuelve el servidor destino del servidor de Discord donde se invoca el comando.
+
+        Por defecto es el propio servidor; `$manager server` lo cambia solo para ese servidor de Discord.
+        El nombre se carga la primera vez desde la configuración (normalmente ya cacheada).
+        """
+        if ctx.guild is None:
+            raise ValueError("Los comandos de configuración solo se pueden usar dentro de un servidor.")
+        server_config = self.servidores_elegidos.get(ctx.guild.id)
+        if server_config is not None:
+            return server_config
+        server_config = self.server_configs.get(ctx.guild.id)
+        if server_config is None:
+            server_id = str(ctx.guild.id)
+            config = await cache_config.obtener(server_id) or {}
+            self.set_server_config(ctx.guild.id, server_id, config.get("server_name", ctx.guild.name), explicito=False)
+            server_config = self.server_configs[ctx.guild.id]
+        else:
+            self.server_configs.move_to_end(ctx.guild.id)
+        return server_config
+
+    def get_guild_destino(self, ctx, server_id: str) -> discord.Guild:
+        """
+        Devuelve el servidor de Discord contra el que se validan los roles y canales.
+        """
+        if str(ctx.guild.id) == server_id:
+            return ctx.guild
+        guild = self.bot.get_guild(int(server_id)) if server_id.isdigit() else None
+        if guild is None:
+            raise ValueError(f"El bot no está en el servidor `{server_id}`; no se pueden validar sus roles ni canales.")
+        return guild
 
     # Función para crear embeds
     def create_embed(self, title, description, color=discord.Color.blue()):
@@ -35,6 +95,15 @@ class PrefixedCommands(commands.Cog):
         Crea un embed personalizado para mensajes.
         """
         return discord.Embed(title=title, description=description, color=color)
+
+    async def responder(self, ctx, agrupable=True, **kwargs):
+        """
+        Responde en el canal del comando a través de su cola de envíos (detrás de las publicaciones).
+
+        Las respuestas agrupables pueden salir juntas en un mismo mensaje; usa `agrupable=False`
+        si después se va a editar el mensaje devuelto.
+        """
+        return await cola_envios.enviar(ctx.channel, prioridad=PRIORIDAD_ADMIN, agrupable=agrupable, **kwargs)
     
     @commands.command(name="ayuda")
     async def ayuda(self, ctx):
@@ -44,19 +113,88 @@ class PrefixedCommands(commands.Cog):
         embed = self.create_embed(
             title="Comandos de Configuración",
             description=(
-                "**$manager server <id> <nombre>** - Configura Firestore para el servidor.\n"
+                "**$manager server <id> <nombre>** - Cambia el servidor de Firestore que administra este servidor de Discord (por defecto, el propio).\n"
+                "**$manager estado** - Muestra el estado de la cola de publicaciones y las cachés.\n"
+                "**$manager shards** - Muestra la latencia y los servidores de cada shard de este proceso.\n"
                 "**$manager canal_publicaciones <ID del canal>** - Configura el canal de publicaciones.\n"
+                "**$manager canales_espejo <IDs de canales>** - Replica las publicaciones en otros canales o servidores socios.\n"
+                "**$manager eliminarcanalesespejo** - Elimina los canales espejo.\n"
                 "**$manager rolesautorizados <IDs de roles>** - Configura roles autorizados.\n"
                 "**$manager resetearroles** - Elimina todos los roles autorizados.\n"
                 "**$manager rolesetiquetar <IDs de roles>** - Configura roles para publicaciones.\n"
                 "**$manager eliminarrolesetiquetar** - Elimina roles configurados para publicaciones.\n"
                 "**$manager rolesdona <IDs de roles>** - Configura roles de donadores.\n"
                 "**$manager eliminarrolesdona** - Elimina roles configurados como donadores.\n"
-                "**$manager actualizar_dominio <nuevo dominio>** - Cambia el dominio en Firestore."
+                "**$manager plantilla <texto>** - Personaliza el texto de los anuncios (con campos como `{titulo}`).\n"
+                "**$manager eliminarplantilla** - Vuelve al anuncio predeterminado.\n"
+                "**$manager actualizar_dominio <nuevo dominio> [simular]** - Cambia el dominio en Firestore.\n"
+                "**$manager migrar_claves [simular]** - Re-clava los proyectos por título normalizado.\n"
+                "**$manager actualizar_dominio_global <dominio anterior> <nuevo dominio> [simular]** - Cambia el dominio en todos los servidores (dueño del bot)."
             )
         )
         embed.set_footer(text="Usa estos comandos para configurar tu servidor.")
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="estado")
+    async def estado(self, ctx):
+        """
+        Muestra el estado interno del bot: colas, caché de portadas, event loop y almacenamiento.
+        """
+        cola = cola_publicaciones.estadisticas()
+        portadas = cache_imagenes.estadisticas()
+        loop = monitor_loop.estadisticas()
+        envios = cola_envios.estadisticas()
+        datos = almacenamiento.estadisticas()
+        tiempos = ", ".join(f"{fase} {ms} ms" for fase, ms in datos.get("tiempos_ms", {}).items())
+        embed = self.create_embed(
+            title="Estado del Bot",
+            description=(
+                f"**Cola de publicaciones:** {cola['profundidad']} pendientes, {cola['trabajadores']} trabajadores\n"
+                f"Procesadas: {cola['procesados']} (fallidas: {cola['fallidos']})\n"
+                f"Espera p50: {cola['espera_p50_ms']} ms | Latencia p50/p95: "
+                f"{cola['latencia_p50_ms']}/{cola['latencia_p95_ms']} ms\n\n"
+                f"**Cola de envíos:** {envios['pendientes']} mensajes pendientes en {envios['canales']} canales\n"
+                f"Enviados: {envios['enviados']} | Agrupados: {envios['agrupados']} | "
+                f"Rechazados: {envios['rechazados']}\n\n"
+                f"**Caché de portadas:** {portadas['entradas_memoria']} en memoria "
+                f"({portadas['bytes_memoria'] // 1024} KB)\n"
+                f"Aciertos memoria/disco: {portadas['aciertos_memoria']}/{portadas['aciertos_disco']} | "
+                f"Revalidadas: {portadas['revalidadas']} | Fallos: {portadas['fallos']}\n\n"
+                f"**Event loop:** retraso actual {loop['ultimo_retraso_ms']} ms, máximo {loop['max_retraso_ms']} ms, "
+                f"{loop['bloqueos']} bloqueos\n\n"
+                f"**Almacenamiento:** {datos['backend']}, {'conectado' if datos['listo'] else 'sin conectar'}"
+                + (f" ({tiempos})" if tiempos else "")
+                + (f"\nÚltimo error: {datos['ultimo_error']}" if datos.get("ultimo_error") else "")
+                + (f"\nDiario de escrituras: {datos['diario_pendientes']} pendientes, "
+                   f"{datos['diario_aplicadas']} aplicadas, {datos['diario_descartadas']} descartadas"
+                   if "diario_pendientes" in datos else "")
+                + (f"\nBackend sin responder ({datos['diario_fallos_seguidos']} intentos): {datos['diario_error']}"
+                   if datos.get("diario_error") else "")
+            )
+        )
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="shards")
+    async def shards(self, ctx):
+        """
+        Muestra la latencia, la conexión y los servidores de cada shard de este cluster.
+        """
+        lineas = []
+        for shard in estado_shards(self.bot):
+            latencia = f"{shard['latencia_ms']} ms" if shard["latencia_ms"] is not None else "sin medir"
+            actual = " (este servidor)" if ctx.guild is not None and ctx.guild.shard_id == shard["shard"] else ""
+            lineas.append(f"**Shard {shard['shard']}**{actual}: {latencia}, {shard['servidores']} servidores, "
+                          f"{'conectado' if shard['conectado'] else 'desconectado'}")
+        embed = self.create_embed(
+            title="Estado de los Shards",
+            description=(
+                f"**Cluster:** {CLUSTER_ID + 1} de {CLUSTERS} | **Shards totales:** {self.bot.shard_count}\n\n"
+                + "\n".join(lineas)
+            )
+        )
+        # Un embed admite 4096 caracteres en la descripción
+        embed.description = embed.description[:4096]
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="server")
     async def server(self, ctx, server_id: str, *, server_name: str):
@@ -64,12 +202,15 @@ class PrefixedCommands(commands.Cog):
         Configura un servidor y guarda los datos en Firestore.
         """
         try:
-            # Llama al método `set_server_config` para guardar la configuración
-            self.set_server_config(server_id, server_name)
+            if ctx.guild is None:
+                raise ValueError("Los comandos de configuración solo se pueden usar dentro de un servidor.")
 
-            # Guarda en Firestore
-            collection_name = f"servidores/{server_id}/configugeneral"
-            db.collection(collection_name).document("main").set(
+            # Los siguientes comandos de este servidor de Discord (y solo de este) apuntarán al servidor elegido
+            self.set_server_config(ctx.guild.id, server_id, server_name)
+
+            # Guarda en Firestore (y en la caché de configuración)
+            await cache_config.establecer(
+                server_id,
                 {
                     "server_name": server_name,
                     "idsv_": server_id
@@ -88,7 +229,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo configurar el servidor: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="canal_publicaciones")
     async def canal_publicaciones(self, ctx, canal_id: int):
@@ -96,30 +237,27 @@ class PrefixedCommands(commands.Cog):
         Configura el canal donde se harán las publicaciones.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
-            collection_name = f"servidores/{server_id}/configugeneral"
-            doc_ref = db.collection(collection_name).document("main")
-
-            # Verificar si el documento ya existe
-            doc = doc_ref.get()
-            if not doc.exists:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+
+            # Validar el canal antes de escribir
+            canal = resolver_ids(self.get_guild_destino(ctx, server_id), canales_ids=[canal_id]).validar().canales[0]
+
+            # Verificar si el documento ya existe (desde la caché de configuración)
+            config = await cache_config.obtener(server_id)
+            if config is None:
                 # Crear el documento si no existe
-                doc_ref.set({"id_canalp": canal_id})
+                await cache_config.establecer(server_id, {"id_canalp": canal.id}, merge=False)
                 embed = self.create_embed(
                     title="Canal Configurado",
-                    description=f"Canal de publicaciones configurado: `{canal_id}` (Nuevo documento creado)."
+                    description=f"Canal de publicaciones configurado: #{canal.name} (`{canal.id}`) (Nuevo documento creado)."
                 )
             else:
                 # Actualizar el documento existente
-                doc_ref.update({"id_canalp": canal_id})
+                await cache_config.actualizar(server_id, {"id_canalp": canal.id})
                 embed = self.create_embed(
                     title="Canal Configurado",
-                    description=f"Canal de publicaciones configurado: `{canal_id}`."
+                    description=f"Canal de publicaciones configurado: #{canal.name} (`{canal.id}`)."
                 )
         except ValueError as ve:
             # Error si el servidor no está configurado
@@ -135,7 +273,100 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo configurar el canal: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="canales_espejo")
+    async def canales_espejo(self, ctx, *canales_ids: int):
+        """
+        Configura canales adicionales (de este servidor o de servidores socios) donde se replican las publicaciones.
+        """
+        try:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+            if not canales_ids:
+                raise ValueError("Indica al menos un ID de canal.")
+
+            config = await cache_config.obtener(server_id) or {}
+            canal_principal = int(config["id_canalp"]) if config.get("id_canalp") else None
+
+            # Validar cada canal antes de escribir
+            validos, invalidos, vistos = [], [], set()
+            for canal_id in canales_ids:
+                if canal_id == canal_principal:
+                    invalidos.append(f"`{canal_id}` (es el canal principal de publicaciones)")
+                    continue
+                if canal_id in vistos:
+                    invalidos.append(f"`{canal_id}` (está repetido)")
+                    continue
+                vistos.add(canal_id)
+                canal = self.bot.get_channel(canal_id)
+                if canal is None:
+                    invalidos.append(f"`{canal_id}` (no existe o el bot no tiene acceso)")
+                    continue
+                if canal.guild.id != ctx.guild.id:
+                    # Solo se replica en un servidor socio si quien lo configura administra ese canal allí
+                    try:
+                        miembro = await canal.guild.fetch_member(ctx.author.id)
+                    except discord.HTTPException:
+                        miembro = None
+                    if miembro is None or not canal.permissions_for(miembro).manage_channels:
+                        invalidos.append(f"`{canal_id}` (no administras ese canal en {canal.guild.name})")
+                        continue
+                validos.append(canal)
+            if invalidos:
+                raise ValueError("Canales no válidos:\n" + "\n".join(invalidos))
+
+            await cache_config.establecer(server_id, {"canales_espejo": [canal.id for canal in validos]})
+            logger.info(f"Canales espejo configurados para {server_id}: {[canal.id for canal in validos]}")
+
+            embed = self.create_embed(
+                title="Canales Espejo Configurados",
+                description="Las publicaciones también se enviarán a:\n" + "\n".join(
+                    f"#{canal.name} ({canal.guild.name})" for canal in validos
+                )
+            )
+        except ValueError as ve:
+            embed = self.create_embed(
+                title="Error",
+                description=str(ve),
+                color=discord.Color.red()
+            )
+        except Exception as e:
+            logger.error(f"Error al configurar canales espejo: {e}")
+            embed = self.create_embed(
+                title="Error al Configurar Canales Espejo",
+                description=f"No se pudieron configurar los canales: {str(e)}",
+                color=discord.Color.red()
+            )
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="eliminarcanalesespejo")
+    async def eliminarcanalesespejo(self, ctx):
+        """
+        Elimina los canales espejo configurados.
+        """
+        try:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+            await cache_config.actualizar(server_id, {"canales_espejo": BORRAR_CAMPO})
+            embed = self.create_embed(
+                title="Canales Espejo Eliminados",
+                description="Las publicaciones se enviarán solo al canal principal."
+            )
+        except ValueError as ve:
+            embed = self.create_embed(
+                title="Error",
+                description=str(ve),
+                color=discord.Color.red()
+            )
+        except Exception as e:
+            logger.error(f"Error al eliminar canales espejo: {e}")
+            embed = self.create_embed(
+                title="Error al Eliminar Canales Espejo",
+                description=f"No se pudieron eliminar los canales: {str(e)}",
+                color=discord.Color.red()
+            )
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="rolesautorizados")
     async def rolesautorizados(self, ctx, *roles_ids: int):
@@ -143,24 +374,22 @@ class PrefixedCommands(commands.Cog):
         Configura roles autorizados para usar comandos.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
-            # Referencia directa al documento en Firestore
-            doc_ref = db.collection(f"servidores/{server_id}/configugeneral").document("main")
-            
             # Log para depuración
             logger.info(f"Accediendo a Firestore: servidores/{server_id}/configugeneral/main")
             
-            # Crear un diccionario con los roles autorizados
-            roles_dict = {f"id_role_{i+1}": role_id for i, role_id in enumerate(roles_ids)}
+            # Validar todos los roles antes de escribir
+            if not roles_ids:
+                raise ValueError("Indica al menos un ID de rol.")
+            roles = resolver_ids(self.get_guild_destino(ctx, server_id), roles_ids=roles_ids).validar().roles
+
+            # Crear un diccionario con los roles autorizados (y borrar los sobrantes)
+            roles_dict = campos_numerados("id_role_", [rol.id for rol in roles], await cache_config.obtener(server_id))
 
-            # Actualizar o crear los roles en el documento Firestore
-            doc_ref.update(roles_dict)
+            # Actualizar o crear los roles en el documento Firestore con una sola escritura
+            await cache_config.establecer(server_id, roles_dict)
 
             # Log de éxito
             logger.info(f"Roles configurados exitosamente: {roles_dict}")
@@ -168,7 +397,7 @@ class PrefixedCommands(commands.Cog):
             # Crear el embed de respuesta
             embed = self.create_embed(
                 title="Roles Configurados",
-                description=f"Roles autorizados agregados: {', '.join(map(str, roles_ids))}."
+                description=f"Roles autorizados agregados: {', '.join(f'{rol.name} (`{rol.id}`)' for rol in roles)}."
             )
         except Exception as e:
             # Log de error
@@ -180,7 +409,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo configurar los roles: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="resetearroles")
     async def resetearroles(self, ctx):
@@ -188,15 +417,8 @@ class PrefixedCommands(commands.Cog):
         Elimina los roles configurados en la base de datos.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
-
-            # Referencia al documento en Firestore
-            doc_ref = db.collection(f"servidores/{server_id}/configugeneral").document("main")
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
             # Log para depuración
             logger.info(f"Accediendo a Firestore: servidores/{server_id}/configugeneral/main")
@@ -210,22 +432,22 @@ class PrefixedCommands(commands.Cog):
                 title="Confirmación de Reseteo",
                 description="¿Deseas eliminar los roles de autoridad agregados? Escribe `si` o `no` (30 segundos para responder)."
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
             # Esperar respuesta del usuario
             try:
                 msg = await self.bot.wait_for("message", timeout=30.0, check=check)
                 if msg.content.lower() == "si":
                     # Obtener datos del documento
-                    doc_data = doc_ref.get().to_dict()
+                    doc_data = await cache_config.obtener(server_id)
                     if not doc_data:
                         raise ValueError("No hay roles configurados para eliminar.")
 
                     # Crear un diccionario para eliminar todos los roles que empiezan con "id_role_"
-                    updates = {key: DELETE_FIELD for key in doc_data.keys() if key.startswith("id_role_")}
+                    updates = {key: BORRAR_CAMPO for key in doc_data.keys() if key.startswith("id_role_")}
 
                     # Actualizar el documento en Firestore
-                    doc_ref.update(updates)
+                    await cache_config.actualizar(server_id, updates)
 
                     # Log de éxito
                     logger.info(f"Roles eliminados: {updates}")
@@ -247,7 +469,7 @@ class PrefixedCommands(commands.Cog):
                     title="Tiempo Excedido",
                     description="No respondiste a tiempo, los roles no se han eliminado."
                 )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
         except ValueError as ve:
             # Error si el servidor no está configurado o no hay roles configurados
@@ -257,7 +479,7 @@ class PrefixedCommands(commands.Cog):
                 description=str(ve),
                 color=discord.Color.red()
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
         except Exception as e:
             # Log de error genérico
@@ -268,7 +490,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo eliminar los roles: {str(e)}",
                 color=discord.Color.red()
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
     @commands.command(name="rolesetiquetar")
     async def rolesetiquetar(self, ctx, *roles_ids: int):
@@ -276,26 +498,23 @@ class PrefixedCommands(commands.Cog):
         Configura roles que serán usados para las publicaciones.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
-            doc_ref = db.collection("servidores").document(server_id).collection("configugeneral").document("main")
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
-            # Crear un diccionario con los roles etiquetados
-            roles_dict = {f"ide_{i+1}": role_id for i, role_id in enumerate(roles_ids)}
-            doc_ref.update(roles_dict)
+            # Validar todos los roles antes de escribir
+            if not roles_ids:
+                raise ValueError("Indica al menos un ID de rol.")
+            roles = resolver_ids(self.get_guild_destino(ctx, server_id), roles_ids=roles_ids).validar().roles
 
-            # Obtener los nombres de los roles agregados
-            role_names = [discord.utils.get(ctx.guild.roles, id=role_id).name for role_id in roles_ids]
+            # Crear un diccionario con los roles etiquetados (y borrar los sobrantes)
+            roles_dict = campos_numerados("ide_", [rol.id for rol in roles], await cache_config.obtener(server_id))
+            await cache_config.establecer(server_id, roles_dict)
 
             # Log y respuesta
             logger.info(f"Roles etiquetados configurados: {roles_dict}")
             embed = self.create_embed(
                 title="Roles Configurados",
-                description=f"Roles configurados correctamente:\n**ID(s):** {', '.join(map(str, roles_ids))}\n**Nombre(s):** {', '.join(role_names)}."
+                description=f"Roles configurados correctamente:\n**ID(s):** {', '.join(str(rol.id) for rol in roles)}\n**Nombre(s):** {', '.join(rol.name for rol in roles)}."
             )
         except Exception as e:
             # Log de error y respuesta
@@ -305,7 +524,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo configurar los roles: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="eliminarrolesetiquetar")
     async def eliminarrolesetiquetar(self, ctx):
@@ -313,13 +532,8 @@ class PrefixedCommands(commands.Cog):
         Elimina los roles etiquetados configurados en la base de datos.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
-            doc_ref = db.collection("servidores").document(server_id).collection("configugeneral").document("main")
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
             # Confirmación al usuario
             def check(msg):
@@ -329,18 +543,18 @@ class PrefixedCommands(commands.Cog):
                 title="Confirmación de Eliminación",
                 description="¿Deseas eliminar los roles etiquetados configurados? Escribe `si` o `no` (30 segundos para responder)."
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
             try:
                 msg = await self.bot.wait_for("message", timeout=30.0, check=check)
                 if msg.content.lower() == "si":
                     # Obtener datos del documento y preparar eliminación
-                    doc_data = doc_ref.get().to_dict()
+                    doc_data = await cache_config.obtener(server_id)
                     if not doc_data:
                         raise ValueError("No hay roles etiquetados configurados para eliminar.")
 
-                    updates = {key: DELETE_FIELD for key in doc_data.keys() if key.startswith("ide_")}
-                    doc_ref.update(updates)
+                    updates = {key: BORRAR_CAMPO for key in doc_data.keys() if key.startswith("ide_")}
+                    await cache_config.actualizar(server_id, updates)
 
                     # Log y respuesta de éxito
                     logger.info(f"Roles etiquetados eliminados: {updates}")
@@ -360,7 +574,7 @@ class PrefixedCommands(commands.Cog):
                     title="Tiempo Excedido",
                     description="Care pene no me hagas perder el tiempo."
                 )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
         except ValueError as ve:
             # Log y respuesta de error de configuración
@@ -370,7 +584,7 @@ class PrefixedCommands(commands.Cog):
                 description=str(ve),
                 color=discord.Color.red()
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
         except Exception as e:
             # Log y respuesta de error genérico
@@ -380,7 +594,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo eliminar los roles: {str(e)}",
                 color=discord.Color.red()
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
     @commands.command(name="rolesdona")
     async def rolesdona(self, ctx, *roles_ids: int):
@@ -388,33 +602,27 @@ class PrefixedCommands(commands.Cog):
         Configura roles de donadores para publicaciones.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
-            # Referencia al documento en Firestore
-            doc_ref = db.collection("servidores").document(server_id).collection("configugeneral").document("main")
-            
             # Log para depuración
             logger.info(f"Accediendo a Firestore: servidores/{server_id}/configugeneral/main")
             
-            # Crear un diccionario con los roles donadores
-            roles_dict = {f"ido_{i+1}": role_id for i, role_id in enumerate(roles_ids)}
+            # Validar todos los roles antes de escribir
+            if not roles_ids:
+                raise ValueError("Indica al menos un ID de rol.")
+            roles = resolver_ids(self.get_guild_destino(ctx, server_id), roles_ids=roles_ids).validar().roles
 
-            # Actualizar o crear los roles en el documento Firestore
-            doc_ref.update(roles_dict)
+            # Crear un diccionario con los roles donadores (y borrar los sobrantes)
+            roles_dict = campos_numerados("ido_", [rol.id for rol in roles], await cache_config.obtener(server_id))
 
-            # Obtener nombres de los roles
-            role_names = [ctx.guild.get_role(role_id).name for role_id in roles_ids if ctx.guild.get_role(role_id)]
-            role_names_str = ', '.join(role_names)
+            # Actualizar o crear los roles en el documento Firestore con una sola escritura
+            await cache_config.establecer(server_id, roles_dict)
 
             # Respuesta de confirmación
             embed = self.create_embed(
                 title="Roles Configurados",
-                description=f"Los roles se han configurado correctamente.\nIDs de roles: {', '.join(map(str, roles_ids))}\nRoles: {role_names_str}."
+                description=f"Los roles se han configurado correctamente.\nIDs de roles: {', '.join(str(rol.id) for rol in roles)}\nRoles: {', '.join(rol.name for rol in roles)}."
             )
         except Exception as e:
             # Log de error
@@ -426,7 +634,7 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudo realizar la configuración de roles por alguna razón: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="eliminarrolesdona")
     async def eliminarrolesdona(self, ctx):
@@ -434,16 +642,9 @@ class PrefixedCommands(commands.Cog):
         Elimina los roles configurados como donadores.
         """
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
 
-            # Referencia al documento en Firestore
-            doc_ref = db.collection("servidores").document(server_id).collection("configugeneral").document("main")
-            
             # Log para depuración
             logger.info(f"Accediendo a Firestore: servidores/{server_id}/configugeneral/main")
 
@@ -456,21 +657,21 @@ class PrefixedCommands(commands.Cog):
                 title="Confirmación de Eliminación",
                 description="¿Deseas eliminar los roles de donadores configurados? Escribe `si` o `no` (30 segundos para responder)."
             )
-            await ctx.send(embed=embed)
+            await self.responder(ctx, embed=embed)
 
             try:
                 msg = await self.bot.wait_for("message", timeout=30.0, check=check)
                 if msg.content.lower() == "si":
                     # Obtener datos del documento
-                    doc_data = doc_ref.get().to_dict()
+                    doc_data = await cache_config.obtener(server_id)
                     if not doc_data:
                         raise ValueError("No hay roles configurados para eliminar.")
 
                     # Crear un diccionario para eliminar todos los roles que empiezan con "ido_"
-                    updates = {key: DELETE_FIELD for key in doc_data.keys() if key.startswith("ido_")}
+                    updates = {key: BORRAR_CAMPO for key in doc_data.keys() if key.startswith("ido_")}
 
                     # Actualizar el documento en Firestore
-                    doc_ref.update(updates)
+                    await cache_config.actualizar(server_id, updates)
 
                     # Log de éxito
                     logger.info(f"Roles eliminados: {updates}")
@@ -518,54 +719,125 @@ class PrefixedCommands(commands.Cog):
                 description=f"No se pudieron eliminar los roles de donadores: {str(e)}",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="plantilla")
+    async def plantilla(self, ctx, *, texto: str):
+        """
+        Configura la plantilla de los anuncios de capítulos del servidor.
+        """
+        try:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+
+            # Compilar antes de guardar: los campos desconocidos o mal cerrados se rechazan aquí
+            compilada = PlantillaCompilada(texto, await cache_config.obtener(server_id) or {})
+            await cache_config.establecer(server_id, {"plantilla_anuncio": texto})
+            logger.info(f"Plantilla de anuncios configurada para {server_id}")
+
+            ejemplo = compilada.renderizar(
+                {"titulo": "Proyecto de ejemplo", "sinopsis": "Sinopsis de ejemplo.", "link_ikigai": "https://ejemplo.com"},
+                "1", "https://ejemplo.com/tmo"
+            )
+            embed = self.create_embed(
+                title="Plantilla Configurada",
+                description=f"Así se verán los anuncios:\n\n{ejemplo}"[:4000]
+            )
+        except ValueError as ve:
+            embed = self.create_embed(
+                title="Error",
+                description=str(ve),
+                color=discord.Color.red()
+            )
+        except Exception as e:
+            logger.error(f"Error al configurar la plantilla: {e}")
+            embed = self.create_embed(
+                title="Error al Configurar la Plantilla",
+                description=f"No se pudo configurar la plantilla: {str(e)}",
+                color=discord.Color.red()
+            )
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="eliminarplantilla")
+    async def eliminarplantilla(self, ctx):
+        """
+        Elimina la plantilla personalizada y vuelve al anuncio predeterminado.
+        """
+        try:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+            await cache_config.establecer(server_id, {"plantilla_anuncio": BORRAR_CAMPO})
+            embed = self.create_embed(
+                title="Plantilla Eliminada",
+                description="Los anuncios vuelven a usar el texto predeterminado."
+            )
+        except ValueError as ve:
+            embed = self.create_embed(
+                title="Error",
+                description=str(ve),
+                color=discord.Color.red()
+            )
+        except Exception as e:
+            logger.error(f"Error al eliminar la plantilla: {e}")
+            embed = self.create_embed(
+                title="Error al Eliminar la Plantilla",
+                description=f"No se pudo eliminar la plantilla: {str(e)}",
+                color=discord.Color.red()
+            )
+        await self.responder(ctx, embed=embed)
 
     @commands.command(name="actualizar_dominio")
-    async def actualizar_dominio(self, ctx, nuevo_dominio: str):
+    async def actualizar_dominio(self, ctx, nuevo_dominio: str, modo: str = None):
         """
         Cambia el dominio en todos los proyectos de la base de datos del servidor actual.
+        Con `simular` solo informa cuántos proyectos cambiarían.
         """
+        mensaje = None
         try:
-            # Verificar que el servidor esté configurado
-            if not self.server_config:
-                raise ValueError("No se ha configurado ningún servidor. Usa `$manager server` primero.")
-            
-            # Usar el ID del servidor configurado
-            server_id = self.server_config["server_id"]
-            collection_name = f"servidores/{server_id}/proyectos"
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+            simular = (modo or "").lower() in ("simular", "--simular", "dry-run")
 
             # Log para depuración
-            logger.info(f"Actualizando dominios en la colección: {collection_name}")
-
-            # Obtener todos los documentos en la colección de proyectos
-            docs = db.collection(collection_name).stream()
-            updated_count = 0  # Contador de proyectos actualizados
-
-            for doc in docs:
-                doc_ref = db.collection(collection_name).document(doc.id)
-                doc_data = doc.to_dict()
-
-                # Verificar y actualizar el campo "link_ikigai" si existe
-                if "link_ikigai" in doc_data:
-                    # Reemplazar el dominio completo con el nuevo
-                    path_parts = doc_data["link_ikigai"].split("/", 3)  # Dividir por la tercera '/' (dominio)
-                    if len(path_parts) > 3:
-                        path_suffix = path_parts[3]  # Obtener la parte restante del enlace
-                    else:
-                        path_suffix = ""  # Por si acaso el enlace no tiene un sufijo
-                    
-                    # Construir el nuevo enlace
-                    new_link = f"{nuevo_dominio.rstrip('/')}/{path_suffix}"
-                    doc_ref.update({"link_ikigai": new_link})
-                    updated_count += 1  # Incrementar contador de actualizaciones
-
-                    # Log de cada proyecto actualizado
-                    logger.info(f"Documento actualizado: {doc.id}, Nuevo link: {new_link}")
+            logger.info(f"Actualizando dominios en la colección: servidores/{server_id}/proyectos (simular={simular})")
+
+            # Mensaje de progreso que se va editando durante la migración
+            mensaje = await self.responder(ctx, agrupable=False, embed=self.create_embed(
+                title="Actualizando Dominio",
+                description=f"Iniciando la {'simulación' if simular else 'migración'} a `{nuevo_dominio}`..."
+            ))
+            ultima_edicion = 0.0
+
+            async def progreso(resumen):
+                nonlocal ultima_edicion
+                # Limitar las ediciones para no chocar con los rate limits de Discord
+                ahora = asyncio.get_running_loop().time()
+                if ahora - ultima_edicion < 2:
+                    return
+                ultima_edicion = ahora
+                try:
+                    await mensaje.edit(embed=self.create_embed(
+                        title="Actualizando Dominio",
+                        description=f"Proyectos revisados: {resumen['revisados']}\n"
+                                    f"Proyectos {'a actualizar' if simular else 'actualizados'}: {resumen['actualizados']}"
+                    ))
+                except discord.HTTPException as e:
+                    # Un fallo al editar el progreso no debe cortar la migración
+                    logger.error(f"No se pudo actualizar el mensaje de progreso: {e}")
+
+            resumen = await migrar_dominio_servidor(server_id, nuevo_dominio, simular=simular, progreso=progreso)
 
             # Crear respuesta
+            if simular:
+                descripcion = (f"Simulación completada: {resumen['actualizados']} de {resumen['revisados']} proyectos "
+                               f"cambiarían a `{nuevo_dominio}` ({resumen['sin_cambios']} ya lo usan).")
+            else:
+                descripcion = f"El dominio ha sido actualizado a `{nuevo_dominio}` en {resumen['actualizados']} proyectos."
+                if resumen["reanudado_desde"]:
+                    descripcion += "\n(Se reanudó una migración interrumpida.)"
             embed = self.create_embed(
-                title="Dominio Actualizado",
-                description=f"El dominio ha sido actualizado a `{nuevo_dominio}` en {updated_count} proyectos."
+                title="Dominio Actualizado" if not simular else "Simulación de Dominio",
+                description=descripcion
             )
         except ValueError as ve:
             # Error si el servidor no está configurado
@@ -580,12 +852,99 @@ class PrefixedCommands(commands.Cog):
             logger.error(f"Error al actualizar dominios: {e}")
             embed = self.create_embed(
                 title="Error al Actualizar Dominio",
-                description=f"No se pudo actualizar el dominio: {str(e)}",
+                description=f"No se pudo actualizar el dominio: {str(e)}\n"
+                            f"Vuelve a ejecutar el comando para reanudar desde el último lote guardado.",
                 color=discord.Color.red()
             )
-        await ctx.send(embed=embed)
+        if mensaje is not None:
+            await mensaje.edit(embed=embed)
+        else:
+            await self.responder(ctx, embed=embed)
 
 
+    @commands.command(name="migrar_claves")
+    async def migrar_claves(self, ctx, modo: str = None):
+        """
+        Re-clava los proyectos del servidor para buscarlos directamente por su título normalizado.
+        Con `simular` solo informa cuántos proyectos se moverían.
+        """
+        try:
+            # Servidor destino del servidor de Discord donde se invoca el comando
+            server_id = (await self.get_server_config(ctx))["server_id"]
+            simular = (modo or "").lower() in ("simular", "--simular", "dry-run")
+            logger.info(f"Migrando claves de proyectos en servidores/{server_id}/proyectos (simular={simular})")
+
+            resumen = await migrar_claves_proyectos(server_id, simular=simular)
+            descripcion = (f"Proyectos revisados: {resumen['revisados']}\n"
+                           f"{'Se migrarían' if simular else 'Migrados'}: {resumen['migrados']}\n"
+                           f"Ya migrados: {resumen['ya_migrados']}")
+            if resumen["colisiones"]:
+                descripcion += ("\n\n**Omitidos por título duplicado o vacío:**\n"
+                                + "\n".join(resumen["colisiones"]))[:3500]
+            embed = self.create_embed(
+                title="Simulación de Migración de Claves" if simular else "Claves Migradas",
+                description=descripcion
+            )
+        except ValueError as ve:
+            embed = self.create_embed(
+                title="Error",
+                description=str(ve),
+                color=discord.Color.red()
+            )
+        except Exception as e:
+            logger.error(f"Error al migrar claves de proyectos: {e}")
+            embed = self.create_embed(
+                title="Error al Migrar Claves",
+                description=f"No se pudieron migrar las claves: {str(e)}\nPuedes volver a ejecutar el comando sin riesgo.",
+                color=discord.Color.red()
+            )
+        await self.responder(ctx, embed=embed)
+
+    @commands.command(name="actualizar_dominio_global")
+    @commands.is_owner()
+    async def actualizar_dominio_global(self, ctx, dominio_anterior: str, nuevo_dominio: str, modo: str = None):
+        """
+        Cambia el dominio de los enlaces en los proyectos de todos los servidores (solo el dueño del bot).
+        Únicamente se reescriben los enlaces cuyo host es `dominio_anterior`.
+        """
+        simular = (modo or "").lower() in ("simular", "--simular", "dry-run")
+        mensaje = await self.responder(ctx, agrupable=False, embed=self.create_embed(
+            title="Actualizando Dominio Global",
+            description=f"{'Simulando' if simular else 'Migrando'} `{dominio_anterior}` → `{nuevo_dominio}` en todos los servidores..."
+        ))
+        try:
+            informe = await migrar_dominio_global(nuevo_dominio, dominio_anterior=dominio_anterior, simular=simular)
+
+            # Resumen por servidor
+            lineas = []
+            total_actualizados = 0
+            for server_id, resumen in sorted(informe.items()):
+                if "error" in resumen:
+                    lineas.append(f"`{server_id}`: error - {resumen['error']}")
+                else:
+                    total_actualizados += resumen["actualizados"]
+                    lineas.append(f"`{server_id}`: {resumen['actualizados']}/{resumen['revisados']} proyectos")
+            errores = sum(1 for resumen in informe.values() if "error" in resumen)
+
+            descripcion = (f"Servidores procesados: {len(informe)} ({errores} con error)\n"
+                           f"Proyectos {'a actualizar' if simular else 'actualizados'}: {total_actualizados}\n\n")
+            detalle = "\n".join(lineas)
+            # Los embeds admiten hasta 4096 caracteres de descripción
+            if len(descripcion) + len(detalle) > 4000:
+                detalle = detalle[:4000 - len(descripcion)].rsplit("\n", 1)[0] + "\n..."
+            embed = self.create_embed(
+                title="Simulación de Dominio Global" if simular else "Dominio Global Actualizado",
+                description=descripcion + detalle
+            )
+        except Exception as e:
+            logger.error(f"Error al actualizar dominios globalmente: {e}")
+            embed = self.create_embed(
+                title="Error al Actualizar Dominio Global",
+                description=f"No se pudo actualizar el dominio: {str(e)}",
+                color=discord.Color.red()
+            )
+        await mensaje.edit(embed=embed)
+
 async def setup(bot):
     cog = PrefixedCommands(bot)
     await bot.add_cog(cog)
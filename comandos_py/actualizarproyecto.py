@@ -1,7 +1,9 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils_py.firestore import db
+from utils_py.proyectos import actualizar_proyecto
+from utils_py.cache_proyectos import cache_titulos
+from utils_py.metricas import medir_autocompletado, medir_comando
 import logging
 
 # Configuración del logger
@@ -43,6 +45,7 @@ class ActualizarProyectoModal(discord.ui.Modal):
         )
         self.add_item(self.sinopsis)
 
+    @medir_comando("modal", "actualizarproyecto")
     async def on_submit(self, interaction: discord.Interaction):
         """
         Procesa los datos ingresados en el modal y los guarda en Firestore.
@@ -50,11 +53,15 @@ class ActualizarProyectoModal(discord.ui.Modal):
         try:
             # Obtener ID del servidor
             server_id = str(interaction.guild_id)
-            proyectos_ref = db.collection(f'servidores/{server_id}/proyectos')
 
-            # Buscar el proyecto por título
-            proyecto = proyectos_ref.where('titulo', '==', self.nombre_actual.value).get()
-            if not proyecto:
+            # Construir campos a actualizar
+            campos_a_actualizar = {"titulo": self.nombre_nuevo.value}
+            if self.sinopsis.value.strip():
+                campos_a_actualizar["sinopsis"] = self.sinopsis.value.strip()
+
+            # Actualizar el proyecto (si cambia el título, pasa al ID de la nueva clave)
+            ids = await actualizar_proyecto(server_id, self.nombre_actual.value, campos_a_actualizar)
+            if ids is None:
                 await interaction.response.send_message(
                     embed=discord.Embed(
                         title="Error",
@@ -65,14 +72,9 @@ class ActualizarProyectoModal(discord.ui.Modal):
                 )
                 return
 
-            # Construir campos a actualizar
-            campos_a_actualizar = {"titulo": self.nombre_nuevo.value}
-            if self.sinopsis.value.strip():
-                campos_a_actualizar["sinopsis"] = self.sinopsis.value.strip()
-
-            # Actualizar los campos
-            proyecto_ref = proyectos_ref.document(proyecto[0].id)
-            proyecto_ref.update(campos_a_actualizar)
+            id_anterior, id_nuevo = ids
+            cache_titulos.eliminar(server_id, id_anterior)
+            cache_titulos.registrar(server_id, id_nuevo, self.nombre_nuevo.value)
 
             # Confirmación al usuario
             embed = discord.Embed(
@@ -95,6 +97,7 @@ class ActualizarProyectoModal(discord.ui.Modal):
             )
 
 
+@medir_autocompletado("proyectos")
 async def autocomplete_proyectos(interaction: discord.Interaction, current: str):
     """
     Autocompletado para el campo de título basado en los proyectos existentes en Firestore.
@@ -102,14 +105,7 @@ async def autocomplete_proyectos(interaction: discord.Interaction, current: str)
     try:
         logger.info(f"Iniciando autocompletado de proyectos con filtro: {current}")
         server_id = str(interaction.guild_id)
-        proyectos_ref = db.collection(f'servidores/{server_id}/proyectos')
-        proyectos = proyectos_ref.stream()
-
-        matching_titulos = [
-            proyecto.to_dict().get('titulo', '')
-            for proyecto in proyectos
-            if current.lower() in proyecto.to_dict().get('titulo', '').lower()
-        ]
+        matching_titulos = await cache_titulos.buscar(server_id, current, limite=25)
 
         logger.info(f"Resultados del autocompletado: {matching_titulos[:25]}")
         return [app_commands.Choice(name=titulo, value=titulo) for titulo in matching_titulos[:25]]
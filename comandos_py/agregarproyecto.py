@@ -2,7 +2,9 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 from discord.ui import Modal, TextInput
-from utils_py.firestore import db
+from utils_py.proyectos import crear_proyecto
+from utils_py.cache_proyectos import cache_titulos
+from utils_py.metricas import medir_comando
 
 class AgregarProyectoModal(Modal):
     """
@@ -38,6 +40,7 @@ class AgregarProyectoModal(Modal):
         )
         self.add_item(self.sinopsis)
 
+    @medir_comando("modal", "agregarproyecto")
     async def on_submit(self, interaction: discord.Interaction):
         """
         Procesa los datos ingresados en el modal y los guarda en Firestore.
@@ -45,14 +48,13 @@ class AgregarProyectoModal(Modal):
         try:
             # Obtener ID del servidor
             server_id = str(interaction.guild_id)
-            # Referencia a la colección de Firestore
-            proyectos_ref = db.collection('servidores').document(server_id).collection('proyectos')
-            # Agregar los datos del proyecto
-            proyectos_ref.add({
+            # Agregar los datos del proyecto (el ID del documento se deriva del título)
+            doc_id = await crear_proyecto(server_id, {
                 "titulo": self.nombre.value,
                 "link_ikigai": self.link.value,
                 "sinopsis": self.sinopsis.value or "Sin sinopsis"
             })
+            cache_titulos.registrar(server_id, doc_id, self.nombre.value)
 
             # Respuesta al usuario
             embed = discord.Embed(
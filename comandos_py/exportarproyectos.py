@@ -0,0 +1,55 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils_py.intercambio_proyectos import exportar_proyectos
+import logging
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Límite de subida sin boost de Discord (25 MB)
+LIMITE_ARCHIVO = 25 * 1024 * 1024
+
+
+async def setup(bot: commands.Bot):
+    """
+    Configura el comando /exportarproyectos en el árbol de comandos del bot.
+    """
+    @app_commands.command(name="exportarproyectos", description="Descarga todos los proyectos del servidor en un archivo.")
+    @app_commands.describe(formato="CSV (hoja de cálculo) o JSON (un proyecto por línea, con todos sus campos)")
+    @app_commands.choices(formato=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSON", value="json"),
+    ])
+    async def exportarproyectos(interaction: discord.Interaction, formato: app_commands.Choice[str] = None):
+        """
+        Comando slash para exportar los proyectos como adjunto.
+        """
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            server_id = str(interaction.guild_id)
+            limite = interaction.guild.filesize_limit if interaction.guild is not None else LIMITE_ARCHIVO
+            archivo, nombre, total = await exportar_proyectos(server_id, formato.value if formato else "csv", limite)
+            with archivo:
+                await interaction.followup.send(
+                    embed=discord.Embed(
+                        title="Proyectos Exportados",
+                        description=f"Se exportaron **{total}** proyectos.",
+                        color=discord.Color.green()
+                    ),
+                    file=discord.File(archivo, filename=nombre),
+                    ephemeral=True
+                )
+        except Exception as e:
+            logger.error(f"Error al exportar proyectos: {e}")
+            await interaction.followup.send(
+                embed=discord.Embed(
+                    title="Error al Exportar Proyectos",
+                    description=str(e),
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
+    bot.tree.add_command(exportarproyectos)
+    logger.info("Comando /exportarproyectos registrado correctamente.")
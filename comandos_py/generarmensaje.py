@@ -1,15 +1,90 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-from utils_py.firestore import db
+from utils_py.proyectos import obtener_proyecto
+from utils_py.cache_proyectos import cache_titulos
+from utils_py.cache_config import cache_config
+from utils_py.plantillas import cache_plantillas
+from utils_py.imagenes import LIMITE_SUBIDA, descargar_imagen
+from utils_py.sesion_http import obtener_sesion
+from utils_py.cola_publicaciones import cola_publicaciones
+from utils_py.difusion import difundir
+from utils_py.metricas import medir_autocompletado, medir_comando
 import logging
-import aiohttp
-import os
+import asyncio
 
 # Configuración del logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def construir_mensaje(server_id: str, config: dict, proyecto_data: dict, capitulo: str, tmo_link: str = "") -> str:
+    """
+    Arma el texto del anuncio de un capítulo con la plantilla compilada del servidor.
+    """
+    return cache_plantillas.obtener(server_id, config).renderizar(proyecto_data, capitulo, tmo_link)
+
+
+async def resolver_destinos(interaction: discord.Interaction, config: dict, proyecto_data: dict,
+                            capitulo: str, tmo_link: str = ""):
+    """
+    Devuelve los destinos (canal_id, canal, contenido) de un anuncio: el canal principal
+    más los canales espejo, del mismo servidor o de servidores socios.
+    """
+    # Obtener el canal configurado
+    canal_id = config.get('id_canalp')
+    if not canal_id:
+        raise ValueError("No se configuró un canal para publicaciones en este servidor.")
+
+    canal = interaction.guild.get_channel(int(canal_id))
+    if not canal:
+        raise ValueError("El canal configurado no es válido o no existe en este servidor.")
+
+    destinos = [(canal.id, canal, construir_mensaje(str(interaction.guild_id), config, proyecto_data, capitulo, tmo_link))]
+    # Un canal recibe el anuncio una sola vez aunque esté repetido o sea también el principal
+    vistos = {canal.id}
+    for espejo_id in config.get('canales_espejo', []):
+        if int(espejo_id) in vistos:
+            continue
+        vistos.add(int(espejo_id))
+        espejo = interaction.client.get_channel(int(espejo_id))
+        if espejo is not None and espejo.guild.id != interaction.guild_id:
+            # En un servidor socio se mencionan sus propios roles
+            server_socio = str(espejo.guild.id)
+            config_socio = await cache_config.obtener(server_socio) or {}
+        else:
+            server_socio, config_socio = str(interaction.guild_id), config
+        destinos.append((int(espejo_id), espejo,
+                         construir_mensaje(server_socio, config_socio, proyecto_data, capitulo, tmo_link)))
+    return destinos
+
+
+def limite_destinos(destinos) -> int:
+    """
+    Límite de subida más estricto entre los servidores destino.
+    """
+    limites = [destino.guild.filesize_limit for _, destino, _ in destinos if destino is not None]
+    return min(limites, default=LIMITE_SUBIDA)
+
+
+def informe_difusion(resultados) -> discord.Embed:
+    """
+    Embed con la latencia o el error de cada canal destino.
+    """
+    lineas = []
+    for resultado in resultados:
+        if resultado.ok:
+            lineas.append(f":white_check_mark: {resultado.nombre}: {resultado.latencia * 1000:.0f} ms"
+                          f" (espera {resultado.espera * 1000:.0f} ms)")
+        else:
+            lineas.append(f":x: {resultado.nombre}: {resultado.error}")
+    fallidos = sum(1 for resultado in resultados if not resultado.ok)
+    return discord.Embed(
+        title="Mensaje Publicado" if not fallidos else f"Publicación con {fallidos} errores",
+        description="\n".join(lineas)[:4000],
+        color=discord.Color.green() if not fallidos else discord.Color.orange()
+    )
+
+
 class GenerarMensajeModal(discord.ui.Modal):
     def __init__(self, titulo: str = None):
         super().__init__(title="Generar Mensaje")
@@ -47,7 +122,32 @@ class GenerarMensajeModal(discord.ui.Modal):
         )
         self.add_item(self.imagen)
 
+    @medir_comando("modal", "generarmensaje")
     async def on_submit(self, interaction: discord.Interaction):
+        """
+        Responde de inmediato (defer) y deja la publicación en la cola de trabajos.
+        """
+        try:
+            # Discord exige responder en 3 segundos: el resultado llega luego como followup
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            cola_publicaciones.encolar(self.publicar, interaction)
+            logger.info("Publicación encolada.")
+        except Exception as e:
+            logger.error(f"Error al encolar la publicación: {e}")
+            await interaction.followup.send(
+                embed=discord.Embed(
+                    title="Error al Generar Mensaje",
+                    description=str(e),
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
+    @medir_comando("trabajo", "generarmensaje")
+    async def publicar(self, interaction: discord.Interaction):
+        """
+        Trabajo de publicación: arma el mensaje, descarga la imagen y lo envía al canal.
+        """
         try:
             logger.info("Iniciando procesamiento del modal para generar mensaje.")
 
@@ -55,89 +155,43 @@ class GenerarMensajeModal(discord.ui.Modal):
             server_id = str(interaction.guild_id)
             logger.info(f"ID del servidor: {server_id}")
 
-            # Obtener configuración general del servidor
-            config_ref = db.collection(f'servidores/{server_id}/configugeneral').document('main')
-            logger.info("Obteniendo configuración general del servidor.")
-            config_doc = config_ref.get()
+            # Obtener configuración general del servidor (cacheada) y el proyecto en paralelo
+            logger.info("Obteniendo configuración general del servidor y datos del proyecto.")
+            config, proyecto = await asyncio.gather(
+                cache_config.obtener(server_id),
+                obtener_proyecto(server_id, self.titulo.value),
+            )
 
-            if not config_doc.exists:
+            if config is None:
                 raise ValueError("No se encontró la configuración general del servidor.")
 
-            config = config_doc.to_dict()
             if not isinstance(config, dict):
                 raise TypeError("La configuración del servidor no es un diccionario válido.")
             logger.info(f"Configuración general obtenida: {config}")
 
-            # Buscar el proyecto en la base de datos
-            proyecto_ref = db.collection(f'servidores/{server_id}/proyectos').where('titulo', '==', self.titulo.value)
-            proyectos = proyecto_ref.stream()
-            proyecto = next(proyectos, None)
-
+            # Proyecto encontrado en la base de datos (lectura directa por clave del título)
             if not proyecto:
                 raise ValueError(f"No se encontró el proyecto con el título '{self.titulo.value}'.")
 
-            proyecto_data = proyecto.to_dict()
+            _, proyecto_data = proyecto
             logger.info(f"Datos del proyecto encontrados: {proyecto_data}")
 
-            # Datos obtenidos
-            titulo = proyecto_data.get('titulo', 'Título no encontrado')
-            sinopsis = proyecto_data.get('sinopsis', 'Sin sinopsis disponible')
-            link_ikigai = proyecto_data.get('link_ikigai', '#')
-
-            # Obtener roles etiquetados para agradecimientos
-            ide_roles = [config.get(f'ide_{i}') for i in range(1, 6) if config.get(f'ide_{i}')]
-            ido_roles = [config.get(f'ido_{i}') for i in range(1, 6) if config.get(f'ido_{i}')]
-
-            menciones_ide = ' '.join([f'<@&{role_id}>' for role_id in ide_roles])
-            menciones_ido = ' '.join([f'<@&{role_id}>' for role_id in ido_roles])
-
-            # Construir el mensaje
-            mensaje = (
-                f":mega:| {menciones_ide}\n"
-                f":loudspeaker: Buenas, nuevo capítulo de **{titulo}** :rotating_light:\n"
-                f"# :newspaper2: Capítulo {self.capitulo.value}\n"
-                f"# :link: [Link de Ikigai](<{link_ikigai}>)\n"
-            )
-
-            # Agregar el link de TMO si está presente
-            if self.tmo_link.value.strip():
-                mensaje += f":link: [Link de TMO](<{self.tmo_link.value}>)\n"
+            # Canal principal más los canales espejo
+            destinos = await resolver_destinos(interaction, config, proyecto_data, self.capitulo.value, self.tmo_link.value)
 
-            mensaje += ":newspaper2: Gracias a todo el staff por el trabajo realizado :hearts:\n"
+            # Descargar la imagen una sola vez, en memoria, con el límite más estricto de los destinos
+            imagen = await descargar_imagen(obtener_sesion(), self.imagen.value, limite_destinos(destinos))
+            resultados = await difundir(destinos, imagen)
 
-            # Agradecimientos a los roles de donadores
-            if menciones_ido:
-                mensaje += f":newspaper2: Gracias a {menciones_ido} por apoyar el proyecto :hearts:\n"
-
-            mensaje += f"⊳Sinopsis:\n```{sinopsis}```\n"
-
-            # Obtener el canal configurado
-            canal_id = config.get('id_canalp')
-            if not canal_id:
-                raise ValueError("No se configuró un canal para publicaciones en este servidor.")
-
-            canal = interaction.guild.get_channel(int(canal_id))
-            if not canal:
-                raise ValueError("El canal configurado no es válido o no existe en este servidor.")
-
-            # Descargar y adjuntar la imagen
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.imagen.value) as resp:
-                    if resp.status == 200:
-                        file_path = "temp_image.png"
-                        with open(file_path, "wb") as f:
-                            f.write(await resp.read())
-                        await canal.send(content=mensaje, file=discord.File(file_path))
-                        os.remove(file_path)
-                    else:
-                        raise ValueError("No se pudo descargar la imagen desde la URL proporcionada.")
-
-            await interaction.response.send_message("¡Mensaje publicado!", ephemeral=True)
-            logger.info("¡Mensaje enviado exitosamente!")
+            if len(resultados) == 1 and resultados[0].ok:
+                await interaction.followup.send("¡Mensaje publicado!", ephemeral=True)
+            else:
+                await interaction.followup.send(embed=informe_difusion(resultados), ephemeral=True)
+            logger.info(f"Publicación terminada: {sum(1 for r in resultados if r.ok)}/{len(resultados)} destinos.")
 
         except Exception as e:
             logger.error(f"Error al procesar el modal: {e}")
-            await interaction.response.send_message(
+            await interaction.followup.send(
                 embed=discord.Embed(
                     title="Error al Generar Mensaje",
                     description=str(e),
@@ -145,19 +199,19 @@ class GenerarMensajeModal(discord.ui.Modal):
                 ),
                 ephemeral=True
             )
+            # Relanzar para que la cola cuente la publicación como fallida
+            raise
+
+        if not any(resultado.ok for resultado in resultados):
+            # El informe ya se envió al usuario; la cola y las métricas lo cuentan como fallido
+            raise RuntimeError("No se pudo publicar en ningún destino.")
 
+@medir_autocompletado("titulos")
 async def autocomplete_titulos(interaction: discord.Interaction, current: str):
     try:
         logger.info(f"Iniciando autocompletado de títulos con filtro: {current}")
         server_id = str(interaction.guild_id)
-        proyectos_ref = db.collection(f'servidores/{server_id}/proyectos')
-        proyectos = proyectos_ref.stream()
-
-        matching_titulos = [
-            proyecto.to_dict().get('titulo', '')
-            for proyecto in proyectos
-            if current.lower() in proyecto.to_dict().get('titulo', '').lower()
-        ]
+        matching_titulos = await cache_titulos.buscar(server_id, current, limite=25)
 
         return [app_commands.Choice(name=titulo, value=titulo) for titulo in matching_titulos[:25]]
     except Exception as e:
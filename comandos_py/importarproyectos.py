@@ -0,0 +1,77 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils_py.intercambio_proyectos import descargar_adjunto, detectar_formato, importar_proyectos
+import logging
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+
+def describir_resumen(resumen: dict, simular: bool) -> str:
+    """
+    Texto del informe de importación para el embed.
+    """
+    descripcion = (f"Filas leídas: {resumen['filas']}\n"
+                   f"{'Se crearían' if simular else 'Creados'}: {resumen['creados']}\n"
+                   f"{'Se actualizarían' if simular else 'Actualizados'}: {resumen['actualizados']}\n"
+                   f"Omitidos por existir ya: {resumen['existentes']}\n"
+                   f"Omitidos por título repetido en el archivo: {resumen['duplicados']}\n"
+                   f"Filas no válidas: {resumen['invalidos']}")
+    if resumen["problemas"]:
+        descripcion += "\n\n**Filas omitidas:**\n" + "\n".join(resumen["problemas"])
+    return descripcion[:4000]
+
+
+async def setup(bot: commands.Bot):
+    """
+    Configura el comando /importarproyectos en el árbol de comandos del bot.
+    """
+    @app_commands.command(name="importarproyectos", description="Agrega proyectos en bloque desde un archivo CSV o JSON.")
+    @app_commands.describe(
+        archivo="CSV con columnas titulo;link_ikigai;sinopsis o JSON con un proyecto por línea (con todos sus campos)",
+        actualizar="Sobrescribir los proyectos que ya existen en lugar de omitirlos",
+        simular="Solo validar el archivo y mostrar el informe, sin guardar nada"
+    )
+    @app_commands.default_permissions(manage_guild=True)
+    async def importarproyectos(interaction: discord.Interaction, archivo: discord.Attachment,
+                                actualizar: bool = False, simular: bool = False):
+        """
+        Comando slash para importar proyectos; responde con un resumen y un informe de las filas omitidas.
+        """
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+            server_id = str(interaction.guild_id)
+            logger.info(f"Ejecutando comando /importarproyectos en {server_id} con {archivo.filename} "
+                        f"({archivo.size} bytes, actualizar={actualizar}, simular={simular})")
+
+            with await descargar_adjunto(archivo.url, archivo.size) as contenido:
+                formato = detectar_formato(archivo.filename, contenido)
+                resumen, informe = await importar_proyectos(server_id, contenido, formato,
+                                                            actualizar=actualizar, simular=simular)
+            with informe:
+                omitidos = resumen["existentes"] + resumen["duplicados"] + resumen["invalidos"]
+                await interaction.followup.send(
+                    embed=discord.Embed(
+                        title="Simulación de Importación" if simular else "Proyectos Importados",
+                        description=describir_resumen(resumen, simular),
+                        color=discord.Color.green() if not omitidos else discord.Color.orange()
+                    ),
+                    file=discord.File(informe, filename="informe-importacion.csv") if omitidos else discord.utils.MISSING,
+                    ephemeral=True
+                )
+        except Exception as e:
+            logger.error(f"Error al importar proyectos: {e}")
+            await interaction.followup.send(
+                embed=discord.Embed(
+                    title="Error al Importar Proyectos",
+                    description=str(e) if isinstance(e, ValueError) else (
+                        f"{e}\nLos lotes ya guardados se mantienen; puedes volver a ejecutar el comando "
+                        f"sin riesgo, los proyectos existentes se omiten."),
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
+    bot.tree.add_command(importarproyectos)
+    logger.info("Comando /importarproyectos registrado correctamente.")
@@ -0,0 +1,188 @@
+import discord
+from discord.ext import commands
+from discord import app_commands
+from utils_py.proyectos import obtener_proyectos
+from utils_py.cache_config import cache_config
+from utils_py.imagenes import descargar_imagen
+from utils_py.sesion_http import obtener_sesion
+from utils_py.cola_publicaciones import cola_publicaciones
+from utils_py.difusion import difundir
+from utils_py.metricas import medir_comando
+from comandos_py.generarmensaje import autocomplete_titulos, resolver_destinos, limite_destinos
+import asyncio
+import csv
+import io
+import logging
+import os
+
+# Configuración del logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Máximo de capítulos por lote, descargas simultáneas y pausa entre capítulos (segundos)
+MAX_CAPITULOS_LOTE = int(os.getenv("LOTE_MAX_CAPITULOS", "50"))
+DESCARGAS_CONCURRENTES = int(os.getenv("LOTE_DESCARGAS_CONCURRENTES", "4"))
+PAUSA_ENTRE_CAPITULOS = float(os.getenv("LOTE_PAUSA", "1"))
+# Tamaño máximo del archivo de lote (sobra para MAX_CAPITULOS_LOTE filas; se comprueba antes de descargarlo)
+MAX_BYTES_ARCHIVO_LOTE = int(os.getenv("LOTE_MAX_BYTES", str(256 * 1024)))
+
+
+def leer_filas(contenido: str):
+    """
+    Lee las filas `titulo;capitulo;imagen[;link de TMO]` de un archivo de lote.
+    """
+    filas = []
+    for numero, fila in enumerate(csv.reader(io.StringIO(contenido), delimiter=';'), start=1):
+        if not fila or not ''.join(fila).strip() or fila[0].startswith('#'):
+            continue
+        if len(fila) < 3:
+            raise ValueError(f"Fila {numero}: se esperaba `titulo;capitulo;imagen[;link de TMO]`.")
+        titulo, capitulo, imagen = (valor.strip() for valor in fila[:3])
+        tmo_link = fila[3].strip() if len(fila) > 3 else ""
+        filas.append((titulo, capitulo, imagen, tmo_link))
+    return filas
+
+
+async def prefetch_imagenes(urls, limite: int):
+    """
+    Descarga en paralelo (con un máximo de descargas simultáneas) las imágenes distintas del lote.
+    """
+    semaforo = asyncio.Semaphore(DESCARGAS_CONCURRENTES)
+
+    async def descargar(url):
+        async with semaforo:
+            try:
+                return url, await descargar_imagen(obtener_sesion(), url, limite)
+            except Exception as e:
+                return url, e
+
+    return dict(await asyncio.gather(*(descargar(url) for url in dict.fromkeys(urls))))
+
+
+@medir_comando("trabajo", "publicarlote")
+async def publicar_lote(interaction: discord.Interaction, filas):
+    """
+    Trabajo de publicación de un lote: resuelve proyectos e imágenes de una vez y publica en orden.
+    """
+    try:
+        server_id = str(interaction.guild_id)
+        config, proyectos = await asyncio.gather(
+            cache_config.obtener(server_id),
+            obtener_proyectos(server_id, [fila[0] for fila in filas]),
+        )
+        if config is None:
+            raise ValueError("No se encontró la configuración general del servidor.")
+
+        # Resolver los destinos con el primer proyecto encontrado para conocer el límite de subida
+        muestra = next(iter(proyectos.values()), {})
+        limite = limite_destinos(await resolver_destinos(interaction, config, muestra, ""))
+        imagenes = await prefetch_imagenes([fila[2] for fila in filas], limite)
+
+        lineas = []
+        for indice, (titulo, capitulo, url, tmo_link) in enumerate(filas):
+            proyecto_data = proyectos.get(titulo)
+            imagen = imagenes.get(url)
+            if proyecto_data is None:
+                lineas.append(f":x: {titulo} {capitulo}: proyecto no encontrado")
+                continue
+            if isinstance(imagen, Exception):
+                lineas.append(f":x: {titulo} {capitulo}: {imagen}")
+                continue
+
+            destinos = await resolver_destinos(interaction, config, proyecto_data, capitulo, tmo_link)
+            resultados = await difundir(destinos, imagen)
+            fallidos = [resultado for resultado in resultados if not resultado.ok]
+            if fallidos:
+                lineas.append(f":warning: {titulo} {capitulo}: " + "; ".join(
+                    f"{resultado.nombre}: {resultado.error}" for resultado in fallidos))
+            else:
+                lineas.append(f":white_check_mark: {titulo} {capitulo}")
+
+            # Ritmo controlado entre capítulos para que salgan en orden y sin ráfagas
+            if indice < len(filas) - 1:
+                await asyncio.sleep(PAUSA_ENTRE_CAPITULOS)
+
+        publicados = sum(1 for linea in lineas if linea.startswith(":white_check_mark:"))
+        await interaction.followup.send(
+            embed=discord.Embed(
+                title=f"Lote Publicado ({publicados}/{len(filas)})",
+                description="\n".join(lineas)[:4000],
+                color=discord.Color.green() if publicados == len(filas) else discord.Color.orange()
+            ),
+            ephemeral=True
+        )
+    except Exception as e:
+        logger.error(f"Error al publicar el lote: {e}")
+        await interaction.followup.send(
+            embed=discord.Embed(
+                title="Error al Publicar el Lote",
+                description=str(e),
+                color=discord.Color.red()
+            ),
+            ephemeral=True
+        )
+        # Relanzar para que la cola cuente el lote como fallido
+        raise
+
+    if publicados == 0:
+        # El informe ya se envió al usuario; la cola y las métricas lo cuentan como fallido
+        raise RuntimeError("No se publicó ningún capítulo del lote.")
+
+
+async def setup(bot: commands.Bot):
+    """
+    Configura el comando /publicarlote en el árbol de comandos del bot.
+    """
+    @app_commands.command(name="publicarlote", description="Publica varios capítulos de una vez.")
+    @app_commands.describe(
+        titulo="Proyecto a publicar (con desde/hasta/imagen)",
+        desde="Primer capítulo del rango",
+        hasta="Último capítulo del rango",
+        imagen="URL de la imagen para todos los capítulos del rango",
+        tmo_link="Link de TMO (opcional)",
+        archivo="Archivo con filas `titulo;capitulo;imagen[;link de TMO]` (en lugar del rango)"
+    )
+    @app_commands.autocomplete(titulo=autocomplete_titulos)
+    async def publicarlote(interaction: discord.Interaction, titulo: str = None, desde: int = None,
+                           hasta: int = None, imagen: str = None, tmo_link: str = None,
+                           archivo: discord.Attachment = None):
+        """
+        Comando slash para publicar un rango de capítulos o una lista de filas.
+        """
+        try:
+            await interaction.response.defer(ephemeral=True, thinking=True)
+
+            if archivo is not None:
+                if archivo.size > MAX_BYTES_ARCHIVO_LOTE:
+                    raise ValueError(f"El archivo de lote supera el máximo de {MAX_BYTES_ARCHIVO_LOTE // 1024} KB.")
+                try:
+                    filas = leer_filas((await archivo.read()).decode('utf-8-sig'))
+                except UnicodeDecodeError:
+                    raise ValueError("El archivo de lote debe estar codificado en UTF-8.")
+            elif titulo and desde is not None and hasta is not None and imagen:
+                if hasta < desde:
+                    raise ValueError("El capítulo final debe ser mayor o igual que el inicial.")
+                filas = [(titulo, str(capitulo), imagen, tmo_link or "") for capitulo in range(desde, hasta + 1)]
+            else:
+                raise ValueError("Indica `titulo`, `desde`, `hasta` e `imagen`, o adjunta un `archivo`.")
+
+            if not filas:
+                raise ValueError("El lote no tiene capítulos.")
+            if len(filas) > MAX_CAPITULOS_LOTE:
+                raise ValueError(f"Un lote admite como máximo {MAX_CAPITULOS_LOTE} capítulos.")
+
+            logger.info(f"Ejecutando comando /publicarlote con {len(filas)} capítulos")
+            cola_publicaciones.encolar(publicar_lote, interaction, filas)
+        except Exception as e:
+            logger.error(f"Error al preparar el lote: {e}")
+            await interaction.followup.send(
+                embed=discord.Embed(
+                    title="Error al Publicar el Lote",
+                    description=str(e),
+                    color=discord.Color.red()
+                ),
+                ephemeral=True
+            )
+
+    bot.tree.add_command(publicarlote)
+    logger.info("Comando /publicarlote registrado correctamente.")
@@ -1,11 +1,45 @@
+import time
+
+# Inicio del proceso: el arranque incluye el tiempo de importar los módulos del bot
+INICIO_ARRANQUE = time.perf_counter()
+
+# Cargar variables de entorno antes de importar los módulos del bot: leen su configuración al importarse
+from dotenv import load_dotenv
+load_dotenv()
+
 import os
+import sys
+from utils_py.clusters import es_supervisor, ejecutar_supervisor
+
+# Con varios clusters, este proceso solo lanza y vigila uno por rango de shards. Se desvía antes de importar
+# los módulos del bot: crearían el almacenamiento y tomarían el diario de escrituras sin llegar a vaciarlo
+if __name__ == "__main__" and es_supervisor():
+    import logging
+    logging.basicConfig(level=logging.INFO)
+    if not os.getenv("DISCORD_TOKEN"):
+        raise ValueError("El token de Discord no está configurado en las variables de entorno.")
+    ejecutar_supervisor(os.path.abspath(__file__), os.getenv("DISCORD_TOKEN"))
+    sys.exit(0)
+
 import discord
+from discord import app_commands
 from discord.ext import commands
 from comandos_py.agregarproyecto import setup as setup_agregar_proyecto
 from comandos_py.generarmensaje import setup as setup_generar_mensaje
 from comandos_py.actualizarproyecto import setup as setup_actualizar_proyecto
+from comandos_py.publicarlote import setup as setup_publicar_lote
+from comandos_py.exportarproyectos import setup as setup_exportar_proyectos
+from comandos_py.importarproyectos import setup as setup_importar_proyectos
 from comandos_pref.prefiactua import setup as setup_prefixed_commands
-from dotenv import load_dotenv
+from utils_py.monitor_loop import monitor_loop
+from utils_py.sesion_http import obtener_sesion, cerrar_sesion
+from utils_py.cola_publicaciones import cola_publicaciones
+from utils_py.cola_envios import NOMBRES_PRIORIDAD, cola_envios
+from utils_py.cache_imagenes import cache_imagenes
+from utils_py.metricas import metricas, latencia_comandos, METRICAS_PUERTO
+from utils_py.clusters import CLUSTER_ID, CLUSTERS, estado_shards, opciones_bot
+from utils_py.sincronizacion_comandos import reintentar_sincronizacion, sincronizar_si_cambia
+from utils_py.almacenamiento import almacenamiento
 import asyncio
 import logging
 
@@ -13,8 +47,10 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Cargar variables de entorno
-load_dotenv()
+# Tiempos del arranque (segundos)
+arranque = {"importaciones": time.perf_counter() - INICIO_ARRANQUE, "extensiones": None, "sincronizacion": None,
+            "total": None}
+
 TOKEN = os.getenv("DISCORD_TOKEN")
 
 if not TOKEN:
@@ -24,20 +60,103 @@ if not TOKEN:
 intents = discord.Intents.default()
 intents.message_content = True  # Habilitar el contenido de mensajes
 
-# Inicializar bot
-bot = commands.Bot(command_prefix="$manager ", intents=intents, help_command=None)  # Prefijo personalizado
+class ArbolComandos(app_commands.CommandTree):
+    """
+    Árbol de comandos de barra que mide la duración de cada comando.
+    """
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["inicio"] = time.perf_counter()
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        observar_comando("barra", interaction.command, interaction.extras.get("inicio"), "error")
+        await super().on_error(interaction, error)
+
+
+def observar_comando(tipo, comando, inicio, resultado):
+    if comando is not None and inicio is not None:
+        latencia_comandos.observar(time.perf_counter() - inicio, tipo=tipo,
+                                   comando=comando.qualified_name, resultado=resultado)
+
+
+# Inicializar bot (con shards; en un cluster, solo los suyos)
+bot = commands.AutoShardedBot(command_prefix="$manager ", intents=intents, help_command=None,  # Prefijo personalizado
+                              tree_cls=ArbolComandos, **opciones_bot())
+
+# Indicadores leídos en cada consulta a /metrics
+metricas.indicador("publimanager_cola_profundidad", "Trabajos de publicación pendientes",
+                   lambda: cola_publicaciones.estadisticas()["profundidad"])
+metricas.indicador("publimanager_cola_envios_pendientes", "Mensajes esperando en las colas de envío por canal",
+                   lambda: {(nombre,): cola_envios.pendientes(prioridad) for prioridad, nombre in NOMBRES_PRIORIDAD.items()},
+                   etiquetas=("prioridad",))
+metricas.indicador("publimanager_diario_pendientes", "Escrituras anotadas en el diario local sin aplicar aún",
+                   lambda: almacenamiento.estadisticas().get("diario_pendientes", 0))
+metricas.indicador("publimanager_diario_fallos_seguidos", "Intentos seguidos de vaciar el diario que fallaron (0 = backend disponible)",
+                   lambda: almacenamiento.estadisticas().get("diario_fallos_seguidos", 0))
+metricas.indicador("publimanager_loop_retraso_segundos", "Último retraso medido del event loop",
+                   lambda: monitor_loop.ultimo_retraso)
+metricas.indicador("publimanager_portadas_memoria_bytes", "Bytes de portadas en la caché en memoria",
+                   lambda: cache_imagenes.estadisticas()["bytes_memoria"])
+metricas.indicador("publimanager_portadas_disco_bytes", "Bytes de portadas en la caché en disco (contenidos y fichas)",
+                   lambda: cache_imagenes.estadisticas()["bytes_disco"])
+metricas.indicador("publimanager_latencia_gateway_segundos", "Latencia del gateway de Discord",
+                   lambda: bot.latency if bot.latency == bot.latency else 0.0)
+metricas.indicador("publimanager_arranque_segundos", "Duración del arranque hasta el primer on_ready",
+                   lambda: arranque["total"] or 0.0)
+metricas.indicador("publimanager_shard_latencia_segundos", "Latencia del gateway de cada shard",
+                   lambda: {(shard["shard"],): (shard["latencia_ms"] or 0.0) / 1000 for shard in estado_shards(bot)},
+                   etiquetas=("shard",))
+metricas.indicador("publimanager_shard_servidores", "Servidores atendidos por cada shard",
+                   lambda: {(shard["shard"],): shard["servidores"] for shard in estado_shards(bot)},
+                   etiquetas=("shard",))
+
+
+# Duración de los comandos de barra y con prefijo
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    observar_comando("barra", command, interaction.extras.get("inicio"), "ok")
+
+
+@bot.before_invoke
+async def antes_de_comando(ctx):
+    ctx.inicio = time.perf_counter()
+
+
+@bot.after_invoke
+async def despues_de_comando(ctx):
+    observar_comando("prefijo", ctx.command, getattr(ctx, "inicio", None), "error" if ctx.command_failed else "ok")
+
+
+# Conexión de cada shard
+@bot.event
+async def on_shard_ready(shard_id):
+    logger.info(f"Shard {shard_id} listo (cluster {CLUSTER_ID})")
+
+
+@bot.event
+async def on_shard_disconnect(shard_id):
+    logger.warning(f"Shard {shard_id} desconectado (cluster {CLUSTER_ID})")
+
 
 # Evento cuando el bot está listo
 @bot.event
 async def on_ready():
-    logger.info(f"Bot conectado como {bot.user}")
+    logger.info(f"Bot conectado como {bot.user} (cluster {CLUSTER_ID}/{CLUSTERS}, shards {sorted(bot.shards)} "
+                f"de {bot.shard_count})")
 
-    # Sincronizar comandos de barra
-    try:
-        synced = await bot.tree.sync()
-        logger.info(f"Comandos de barra sincronizados: {len(synced)}")
-    except Exception as e:
-        logger.error(f"Error al sincronizar comandos de barra: {e}")
+    # on_ready se repite en cada reconexión del gateway; el árbol de comandos no cambia entre ellas
+    if arranque["total"] is not None:
+        logger.info("Reconexión al gateway: no se vuelven a sincronizar los comandos de barra")
+        return
+
+    # Sincronizar comandos de barra solo si cambiaron desde la última vez (son globales: basta un cluster)
+    if CLUSTER_ID == 0:
+        try:
+            sincronizacion = await sincronizar_si_cambia(bot)
+            arranque["sincronizacion"] = sincronizacion["segundos"]
+        except Exception as e:
+            logger.error(f"Error al sincronizar comandos de barra, se reintentará en segundo plano: {e}")
+            reintentar_sincronizacion(bot)
 
     # Listar comandos de prefijo registrados
     prefixed_commands = [command.name for command in bot.commands]
@@ -47,11 +166,17 @@ async def on_ready():
     cogs = list(bot.cogs.keys())
     logger.info(f"Cogs registrados: {cogs}")
 
+    arranque["total"] = time.perf_counter() - INICIO_ARRANQUE
+    logger.info(f"Arranque completado en {arranque['total']:.2f} s "
+                f"(importaciones: {arranque['importaciones']:.2f} s, extensiones: {arranque['extensiones'] or 0:.2f} s, "
+                f"sincronización de comandos: {arranque['sincronizacion'] or 0:.2f} s)")
+
 # Cargar extensiones de comandos
 async def load_extensions():
     """
     Carga todos los comandos de prefijo y barra desde sus respectivos módulos.
     """
+    inicio = time.perf_counter()
     try:
         # Cargar comandos de barra
         await setup_agregar_proyecto(bot)
@@ -60,6 +185,12 @@ async def load_extensions():
         logger.info("Comando generarmensaje cargado.")
         await setup_actualizar_proyecto(bot)
         logger.info("Comando actualizarproyecto cargado.")
+        await setup_publicar_lote(bot)
+        logger.info("Comando publicarlote cargado.")
+        await setup_exportar_proyectos(bot)
+        logger.info("Comando exportarproyectos cargado.")
+        await setup_importar_proyectos(bot)
+        logger.info("Comando importarproyectos cargado.")
 
         # Cargar comandos de prefijo
         await setup_prefixed_commands(bot)
@@ -68,6 +199,7 @@ async def load_extensions():
         logger.info("Todas las extensiones cargadas correctamente.")
     except Exception as e:
         logger.error(f"Error al cargar extensiones: {e}")
+    arranque["extensiones"] = time.perf_counter() - inicio
 
 # Ejecutar el bot
 if __name__ == "__main__":
@@ -77,10 +209,27 @@ if __name__ == "__main__":
         """
         try:
             async with bot:
+                # Vigilar bloqueos del event loop
+                monitor_loop.iniciar()
+                # Sesión HTTP compartida durante toda la vida del bot
+                obtener_sesion()
+                # Trabajadores de la cola de publicaciones
+                cola_publicaciones.iniciar()
+                # Endpoint /metrics en el mismo event loop (un puerto por cluster)
+                await metricas.iniciar_servidor(puerto=METRICAS_PUERTO + CLUSTER_ID if METRICAS_PUERTO else 0)
+                # Conectar con la base de datos en segundo plano mientras el gateway hace login
+                almacenamiento.precalentar()
                 await load_extensions()
                 logger.info("Iniciando el bot...")
                 await bot.start(TOKEN)
         except Exception as e:
             logger.error(f"Error al iniciar el bot: {e}")
+        finally:
+            monitor_loop.detener()
+            await cola_publicaciones.detener()
+            # Aplicar lo que quede en el diario de escrituras (si está activo)
+            await almacenamiento.cerrar()
+            await metricas.detener_servidor()
+            await cerrar_sesion()
 
     asyncio.run(main())
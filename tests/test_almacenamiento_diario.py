@@ -0,0 +1,241 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import almacenamiento_diario
+from utils_py.almacenamiento import BORRAR_CAMPO, DocumentoExistente, diarios_heredados, ruta_diario_proceso
+from utils_py.almacenamiento_diario import AlmacenamientoDiferido
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+class BackendRegistrado(AlmacenamientoSQLite):
+    """
+    Backend SQLite que anota cada escritura recibida y puede simular una caída.
+    """
+    def __init__(self, ruta):
+        super().__init__(ruta)
+        self.llamadas = []
+        self.caido = False
+
+    async def escribir_config(self, server_id, campos, merge=True):
+        self.llamadas.append(("config", server_id, dict(campos)))
+        if self.caido:
+            raise ConnectionError("backend caído")
+        await super().escribir_config(server_id, campos, merge)
+
+    async def actualizar_config(self, server_id, campos):
+        self.llamadas.append(("config", server_id, dict(campos)))
+        if self.caido:
+            raise ConnectionError("backend caído")
+        await super().actualizar_config(server_id, campos)
+
+    async def escribir_lote(self, server_id, operaciones):
+        operaciones = list(operaciones)
+        self.llamadas.append(("lote", server_id, [(operacion, doc_id) for operacion, doc_id, _ in operaciones]))
+        if self.caido:
+            raise ConnectionError("backend caído")
+        await super().escribir_lote(server_id, operaciones)
+
+
+class PruebasDiario(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta_backend = os.path.join(self.directorio.name, "datos.db")
+        self.ruta_diario = os.path.join(self.directorio.name, "diario.db")
+        self.diarios = []
+        intervalo = mock.patch.object(almacenamiento_diario, "INTERVALO_VACIADO", 0.01)
+        intervalo.start()
+        self.addCleanup(intervalo.stop)
+
+    async def asyncTearDown(self):
+        for diario in self.diarios:
+            if diario._tarea is not None:
+                diario._tarea.cancel()
+            diario._hilo.submit(diario._conexion.close).result()
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def abrir(self, backend=None):
+        backend = backend or BackendRegistrado(self.ruta_backend)
+        diario = AlmacenamientoDiferido(backend, self.ruta_diario)
+        self.diarios.append(diario)
+        return backend, diario
+
+    async def anotar_sin_vaciar(self, diario, *escrituras):
+        """
+        Ejecuta las escrituras mientras el vaciador espera, para que todas queden pendientes a la vez.
+        """
+        diario._iniciar()
+        async with diario._lock_vaciado:
+            for escritura in escrituras:
+                await escritura
+
+    def cerrar(self, diario):
+        """
+        Simula la caída del proceso: para el vaciador y libera el archivo sin vaciar.
+        """
+        if diario._tarea is not None:
+            diario._tarea.cancel()
+        diario._hilo.submit(diario._conexion.close).result()
+        self.diarios.remove(diario)
+
+    async def test_vacia_en_orden(self):
+        backend, diario = self.abrir()
+        await self.anotar_sin_vaciar(
+            diario,
+            diario.escribir_config("1", {"canal": "a"}),
+            diario.crear_proyecto("1", "p1", {"titulo": "Uno", "n": 1}),
+            diario.actualizar_proyecto("1", "p1", {"n": 2}),
+            diario.escribir_config("1", {"canal": "b"}, merge=False),
+        )
+        await diario.vaciar()
+
+        self.assertEqual([llamada[0] for llamada in backend.llamadas], ["config", "lote", "config"])
+        self.assertEqual(backend.llamadas[1][2], [("crear", "p1"), ("actualizar", "p1")])
+        self.assertEqual(await backend.leer_config("1"), {"canal": "b"})
+        self.assertEqual((await backend.leer_proyecto("1", "p1"))["n"], 2)
+        self.assertEqual(diario.estadisticas()["diario_pendientes"], 0)
+
+    async def test_agrupa_cambios_de_configuracion(self):
+        backend, diario = self.abrir()
+        await self.anotar_sin_vaciar(
+            diario,
+            diario.escribir_config("1", {"a": 1, "b": 2}),
+            diario.escribir_config("1", {"b": BORRAR_CAMPO, "c": 3}),
+            diario.escribir_config("2", {"x": 1}),
+        )
+        # Antes de vaciar, las lecturas ya ven lo pendiente
+        self.assertEqual(await diario.leer_config("1"), {"a": 1, "c": 3})
+        await diario.vaciar()
+
+        self.assertEqual(backend.llamadas, [("config", "1", {"a": 1, "b": BORRAR_CAMPO, "c": 3}),
+                                            ("config", "2", {"x": 1})])
+        self.assertEqual(await backend.leer_config("1"), {"a": 1, "c": 3})
+
+    async def test_aisla_el_conflicto_dentro_de_un_lote(self):
+        backend, diario = self.abrir()
+        # Otro proceso creó p2 directamente en el backend después de la comprobación
+        await self.anotar_sin_vaciar(
+            diario,
+            diario._anotar([("1", "proyecto", "crear", "p1", {"titulo": "Uno"}, True),
+                            ("1", "proyecto", "crear", "p2", {"titulo": "Dos"}, True),
+                            ("1", "proyecto", "crear", "p3", {"titulo": "Tres"}, True)]),
+            backend.crear_proyecto("1", "p2", {"titulo": "Original"}),
+        )
+        await diario.vaciar()
+
+        self.assertEqual(diario.descartadas, 1)
+        self.assertEqual(diario.aplicadas, 2)
+        self.assertEqual((await backend.leer_proyecto("1", "p2"))["titulo"], "Original")
+        self.assertIsNotNone(await backend.leer_proyecto("1", "p1"))
+        self.assertIsNotNone(await backend.leer_proyecto("1", "p3"))
+        estados = diario._hilo.submit(lambda: diario._conexion.execute(
+            "SELECT doc_id, estado FROM diario").fetchall()).result()
+        self.assertEqual(estados, [("p2", "descartada")])
+
+    async def test_crear_duplicado_pendiente_se_rechaza(self):
+        _, diario = self.abrir()
+        await diario.crear_proyecto("1", "p1", {"titulo": "Uno"})
+        with self.assertRaises(DocumentoExistente):
+            await diario.crear_proyecto("1", "p1", {"titulo": "Uno"})
+
+    async def test_reaplica_tras_reiniciar(self):
+        backend, diario = self.abrir()
+        backend.caido = True
+        await diario.escribir_config("1", {"a": 1})
+        await diario.crear_proyecto("1", "p1", {"titulo": "Uno"})
+        await diario.actualizar_proyecto("1", "p1", {"n": 5})
+        with self.assertRaises(ConnectionError):
+            await diario.vaciar()
+        self.cerrar(diario)
+
+        backend = BackendRegistrado(self.ruta_backend)
+        _, diario = self.abrir(backend)
+        self.assertEqual(diario.estadisticas()["diario_pendientes"], 3)
+        await diario.vaciar()
+        self.assertEqual([llamada[0] for llamada in backend.llamadas], ["config", "lote"])
+        self.assertEqual(await backend.leer_config("1"), {"a": 1})
+        self.assertEqual(await backend.leer_proyecto("1", "p1"), {"titulo": "Uno", "n": 5})
+
+    async def test_error_transitorio_no_descarta(self):
+        backend, diario = self.abrir()
+        backend.caido = True
+        await diario.escribir_config("1", {"a": 1})
+        with mock.patch.object(almacenamiento_diario, "ESPERA_MAX_REINTENTO", 0.01):
+            await asyncio.sleep(0.3)
+        estadisticas = diario.estadisticas()
+        self.assertGreater(estadisticas["diario_fallos_seguidos"], 5)
+        self.assertEqual(estadisticas["diario_pendientes"], 1)
+        self.assertEqual(estadisticas["diario_descartadas"], 0)
+        self.assertIn("backend caído", estadisticas["diario_error"])
+
+        backend.caido = False
+        await diario.vaciar()
+        self.assertEqual(await backend.leer_config("1"), {"a": 1})
+
+    async def test_un_solo_proceso_por_diario(self):
+        self.abrir()
+        with self.assertRaises(RuntimeError):
+            AlmacenamientoDiferido(BackendRegistrado(self.ruta_backend), self.ruta_diario)
+
+    def test_ruta_por_cluster(self):
+        with mock.patch.dict(os.environ, {"CLUSTER_ID": "2"}):
+            self.assertEqual(ruta_diario_proceso("datos/diario.db"), "datos/diario.cluster2.db")
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(ruta_diario_proceso("datos/diario.db"), "datos/diario.db")
+
+
+    async def test_actualizar_configuracion_inexistente_falla_al_llamar(self):
+        backend, diario = self.abrir()
+        with self.assertRaises(ValueError):
+            await diario.actualizar_config("1", {"a": 1})
+        self.assertEqual(diario.estadisticas()["diario_pendientes"], 0)
+
+        # Una configuración aún pendiente en el diario ya cuenta como existente
+        await self.anotar_sin_vaciar(
+            diario,
+            diario.escribir_config("1", {"a": 1, "b": 2}),
+            diario.actualizar_config("1", {"b": BORRAR_CAMPO}),
+        )
+        await diario.vaciar()
+        self.assertEqual(await backend.leer_config("1"), {"a": 1})
+        self.assertEqual(diario.descartadas, 0)
+
+    async def test_el_cluster_0_vacia_antes_el_diario_sin_clusters(self):
+        backend, diario = self.abrir()
+        backend.caido = True
+        await diario.escribir_config("1", {"a": 1})
+        self.cerrar(diario)
+
+        backend = BackendRegistrado(self.ruta_backend)
+        with mock.patch.dict(os.environ, {"CLUSTER_ID": "0"}):
+            heredados = diarios_heredados(self.ruta_diario)
+            diario = AlmacenamientoDiferido(backend, ruta_diario_proceso(self.ruta_diario), heredados)
+        self.diarios.append(diario)
+        self.assertEqual(heredados, [self.ruta_diario])
+        await diario.escribir_config("1", {"a": 2})
+        for _ in range(200):
+            if not diario._heredados and not diario._pendientes:
+                break
+            await asyncio.sleep(0.01)
+
+        self.assertEqual(backend.llamadas, [("config", "1", {"a": 1}), ("config", "1", {"a": 2})])
+        self.assertEqual(await backend.leer_config("1"), {"a": 2})
+        self.assertFalse(os.path.exists(self.ruta_diario))
+
+    def test_diarios_heredados(self):
+        for nombre in ("diario.cluster0.db", "diario.cluster1.db", "diario.cluster1.db-wal"):
+            open(os.path.join(self.directorio.name, nombre), "w").close()
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual([os.path.basename(ruta) for ruta in diarios_heredados(self.ruta_diario)],
+                             ["diario.cluster0.db", "diario.cluster1.db"])
+        with mock.patch.dict(os.environ, {"CLUSTER_ID": "1"}):
+            open(self.ruta_diario, "w").close()
+            self.assertEqual(diarios_heredados(self.ruta_diario), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from utils_py.almacenamiento import Almacenamiento
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+class PruebasAlmacenamientoSQLite(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.almacenamiento = AlmacenamientoSQLite(os.path.join(self.directorio.name, "datos.db"))
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    async def test_escuchar_no_bloquea_el_event_loop(self):
+        await self.almacenamiento.crear_proyecto("1", "uno", {"titulo": "Uno"})
+        # Trabajo largo en el hilo de SQLite (p. ej. un lote de migración)
+        self.almacenamiento._hilo.submit(time.sleep, 0.3)
+
+        recibidos = []
+        inicio = time.perf_counter()
+        registro = asyncio.create_task(self.almacenamiento.escuchar_proyectos("1", recibidos.extend))
+        await asyncio.sleep(0.05)
+        self.assertLess(time.perf_counter() - inicio, 0.2)
+        self.assertFalse(registro.done())
+
+        escucha = await registro
+        self.assertEqual([doc_id for doc_id, _, _ in recibidos], ["uno"])
+        await self.almacenamiento.crear_proyecto("1", "dos", {"titulo": "Dos"})
+        self.assertEqual([doc_id for doc_id, _, _ in recibidos], ["uno", "dos"])
+        escucha.unsubscribe()
+
+
+    async def test_cancelar_listeners_desde_varios_hilos(self):
+        escuchas = [await self.almacenamiento.escuchar_proyectos("1", lambda cambios: None) for _ in range(200)]
+        hilos = [threading.Thread(target=escucha.unsubscribe) for escucha in escuchas]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(self.almacenamiento._oyentes["1"], [])
+
+    def test_un_backend_incompleto_falla_al_instanciarse(self):
+        class Incompleto(Almacenamiento):
+            async def leer_config(self, server_id):
+                return None
+
+        with self.assertRaises(TypeError):
+            Incompleto()
+
+
+if __name__ == "__main__":
+    unittest.main()
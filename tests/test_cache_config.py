@@ -0,0 +1,33 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from utils_py import cache_config as modulo
+from utils_py.cache_config import CacheConfig
+
+
+class PruebasCacheConfig(unittest.IsolatedAsyncioTestCase):
+    async def test_lecturas_concurrentes_y_locks_acotados(self):
+        lecturas = []
+
+        async def leer_config(server_id):
+            lecturas.append(server_id)
+            if server_id == "1":
+                await asyncio.sleep(0.01)
+            return {"server_name": f"Servidor {server_id}"}
+
+        falso = mock.Mock(nombre="falso")
+        falso.leer_config = mock.AsyncMock(side_effect=leer_config)
+        cache = CacheConfig()
+        with mock.patch.object(modulo, "almacenamiento", falso):
+            configs = await asyncio.gather(*(cache.obtener("1") for _ in range(10)))
+            for server_id in range(2, 500):
+                await cache.obtener(str(server_id))
+
+        self.assertEqual(configs, [{"server_name": "Servidor 1"}] * 10)
+        self.assertEqual(lecturas.count("1"), 1)
+        self.assertEqual(len(cache._locks), modulo.NUM_LOCKS_LECTURA)
+
+
+if __name__ == "__main__":
+    unittest.main()
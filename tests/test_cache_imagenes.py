@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py.cache_imagenes import CacheImagenes, EntradaPortada
+from utils_py.metricas import consultas_portadas
+
+
+def entrada(numero, tamano=1000):
+    return EntradaPortada(f"https://img.example/{numero}.png", bytes([numero % 256]) * tamano + str(numero).encode(),
+                          "png", "image/png")
+
+
+class PruebasCacheImagenes(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+
+    def archivos(self, subcarpeta):
+        carpeta = os.path.join(self.directorio.name, subcarpeta)
+        return {nombre: os.path.getsize(os.path.join(carpeta, nombre)) for nombre in os.listdir(carpeta)}
+
+    def bytes_en_disco(self):
+        return sum(self.archivos("datos").values()) + sum(self.archivos("urls").values())
+
+    async def test_solo_recorre_el_disco_al_superar_el_limite(self):
+        cache = CacheImagenes(max_bytes_memoria=10_000, max_bytes_disco=100_000, directorio=self.directorio.name)
+        with mock.patch.object(cache, "_recortar_disco", wraps=cache._recortar_disco) as recortar:
+            for numero in range(60):
+                await cache.guardar(entrada(numero))
+            # La primera escritura mide el disco; las siguientes solo suman
+            self.assertEqual(recortar.call_count, 1)
+
+            # Al llenarse, cada recorte deja sitio para unas cuantas escrituras más
+            for numero in range(60, 260):
+                await cache.guardar(entrada(numero))
+            self.assertLess(recortar.call_count, 40)
+
+        self.assertLessEqual(self.bytes_en_disco(), 100_000)
+        self.assertEqual(cache.estadisticas()["bytes_disco"], self.bytes_en_disco())
+
+    async def test_las_fichas_tambien_se_expulsan(self):
+        cache = CacheImagenes(max_bytes_memoria=10_000, max_bytes_disco=20_000, directorio=self.directorio.name)
+        # Muchas URLs con el mismo contenido: casi todo el espacio son fichas
+        for numero in range(300):
+            portada = entrada(0)
+            portada.url = f"https://img.example/copia-{numero}.png"
+            await cache.guardar(portada)
+        self.assertLess(len(self.archivos("urls")), 300)
+        self.assertLessEqual(self.bytes_en_disco(), 20_000)
+
+    async def test_no_toca_escrituras_en_curso(self):
+        cache = CacheImagenes(max_bytes_memoria=10_000, max_bytes_disco=5_000, directorio=self.directorio.name)
+        await cache.guardar(entrada(0))
+        temporal = os.path.join(self.directorio.name, "datos", "abc.999.tmp")
+        with open(temporal, "wb") as f:
+            f.write(b"x" * 50_000)
+        os.utime(temporal, (0, 0))
+        for numero in range(1, 20):
+            await cache.guardar(entrada(numero))
+        self.assertTrue(os.path.exists(temporal))
+        self.assertLessEqual(self.bytes_en_disco() - 50_000, 5_000)
+
+    async def test_contadores_en_metricas(self):
+        cache = CacheImagenes(directorio=self.directorio.name)
+        antes = dict(consultas_portadas._valores)
+        await cache.buscar("https://img.example/no-existe.png")
+        await cache.guardar(entrada(1))
+        await cache.buscar(entrada(1).url)
+        self.assertEqual(consultas_portadas._valores[("fallos",)] - antes.get(("fallos",), 0), 1)
+        self.assertEqual(consultas_portadas._valores[("aciertos_memoria",)] - antes.get(("aciertos_memoria",), 0), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from utils_py import cache_proyectos
+from utils_py.cache_proyectos import CacheTitulos
+from utils_py.indice_titulos import IndiceTitulos
+
+
+def almacenamiento_falso(listener=True, titulos=()):
+    """
+    Almacenamiento mínimo: listener que entrega los títulos al momento, o que falla.
+    """
+    falso = mock.Mock()
+    if listener:
+        def escuchar(server_id, callback):
+            callback([(doc_id, {"titulo": titulo}, 0.0) for doc_id, titulo in titulos])
+            return mock.Mock()
+        falso.escuchar_proyectos = mock.AsyncMock(side_effect=escuchar)
+    else:
+        falso.escuchar_proyectos = mock.AsyncMock(side_effect=ConnectionError("sin listener"))
+    falso.listar_titulos = mock.AsyncMock(side_effect=ConnectionError("sin conexión"))
+    return falso
+
+
+class PruebasCacheTitulos(unittest.IsolatedAsyncioTestCase):
+    async def test_carga_fallida_no_queda_en_cache(self):
+        cache = CacheTitulos()
+        falso = almacenamiento_falso(listener=False)
+        with mock.patch.object(cache_proyectos, "almacenamiento", falso):
+            with self.assertRaises(ConnectionError):
+                await cache.buscar("1", "uno")
+            self.assertNotIn("1", cache._servidores)
+
+            # El siguiente intento vuelve a cargar en lugar de esperar a una entrada vacía
+            falso.listar_titulos.side_effect = None
+            falso.listar_titulos.return_value = [("uno", {"titulo": "Uno"}, 0.0)]
+            self.assertEqual(await cache.buscar("1", "uno"), ["Uno"])
+
+    async def test_purga_inactivos_al_buscar(self):
+        cache = CacheTitulos(inactividad=10)
+        falso = almacenamiento_falso(titulos=[("uno", "Uno")])
+        with mock.patch.object(cache_proyectos, "almacenamiento", falso):
+            await cache.buscar("1", "uno")
+            await cache.buscar("2", "uno")
+            cache._servidores["1"].ultimo_acceso -= 60
+            cache._ultima_purga -= cache_proyectos.INTERVALO_PURGA + 1
+            await cache.buscar("2", "uno")
+        self.assertEqual(list(cache._servidores), ["2"])
+
+
+    async def test_servidor_sin_cargar_responde_dentro_del_plazo(self):
+        cache = CacheTitulos()
+        falso = almacenamiento_falso()
+        registrado = asyncio.Event()
+
+        async def escuchar_lento(server_id, callback):
+            # Backend frío: el listener tarda más que el plazo del autocompletado
+            await registrado.wait()
+            callback([("uno", {"titulo": "Uno"}, 0.0)])
+            return mock.Mock()
+        falso.escuchar_proyectos.side_effect = escuchar_lento
+
+        with mock.patch.object(cache_proyectos, "almacenamiento", falso), \
+                mock.patch.object(cache_proyectos, "ESPERA_SNAPSHOT_INICIAL", 0.2):
+            inicio = time.monotonic()
+            self.assertEqual(await cache.buscar("1", "uno"), [])
+            self.assertLess(time.monotonic() - inicio, 0.5)
+            registrado.set()
+            await cache._servidores["1"].carga
+            self.assertEqual(await cache.buscar("1", "uno"), ["Uno"])
+
+    async def test_registrar_respeta_el_maximo_de_titulos(self):
+        cache = CacheTitulos(max_titulos=2)
+        falso = almacenamiento_falso(titulos=[("uno", "Uno")])
+        with mock.patch.object(cache_proyectos, "almacenamiento", falso):
+            await cache.buscar("1", "")
+        cache.registrar("1", "dos", "Dos")
+        cache.registrar("1", "tres", "Tres")
+        self.assertEqual(sorted(await cache.buscar("1", "")), ["Dos", "Tres"])
+
+    def test_mas_antiguo_con_marcas_desordenadas_y_actualizadas(self):
+        indice = IndiceTitulos()
+        for doc_id, marca in (("b", 5.0), ("a", 1.0), ("c", 3.0)):
+            indice.agregar(doc_id, doc_id, marca)
+        indice.agregar("a", "a", 9.0)
+        self.assertEqual(indice.mas_antiguo(), "c")
+        indice.eliminar("c")
+        self.assertEqual(indice.mas_antiguo(), "b")
+        for marca in range(100):
+            indice.agregar("b", "b", 10.0 + marca)
+        self.assertEqual(indice.mas_antiguo(), "a")
+        self.assertLess(len(indice._por_marca), 30)
+
+
+if __name__ == "__main__":
+    unittest.main()
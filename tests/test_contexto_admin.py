@@ -0,0 +1,30 @@
+import unittest
+from unittest import mock
+
+from comandos_pref import prefiactua
+
+
+def ctx_falso(guild_id):
+    ctx = mock.Mock()
+    ctx.guild.id = guild_id
+    ctx.guild.name = f"Servidor {guild_id}"
+    return ctx
+
+
+class PruebasContextoAdmin(unittest.IsolatedAsyncioTestCase):
+    async def test_el_servidor_elegido_no_se_pierde_al_llenar_el_lru(self):
+        cog = prefiactua.PrefixedCommands(mock.Mock())
+        cog.set_server_config(1, "999", "Socio")
+
+        with mock.patch.object(prefiactua, "MAX_CONTEXTOS", 2), \
+                mock.patch.object(prefiactua.cache_config, "obtener", mock.AsyncMock(return_value={})):
+            for guild_id in range(2, 10):
+                await cog.get_server_config(ctx_falso(guild_id))
+            server_config = await cog.get_server_config(ctx_falso(1))
+
+        self.assertEqual(server_config["server_id"], "999")
+        self.assertLessEqual(len(cog.server_configs), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
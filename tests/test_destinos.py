@@ -0,0 +1,28 @@
+import unittest
+from unittest import mock
+
+from comandos_py import generarmensaje
+
+
+def canal_falso(canal_id, guild_id=1):
+    canal = mock.Mock(id=canal_id)
+    canal.guild.id = guild_id
+    return canal
+
+
+class PruebasDestinos(unittest.IsolatedAsyncioTestCase):
+    async def test_un_canal_recibe_el_anuncio_una_sola_vez(self):
+        canales = {canal_id: canal_falso(canal_id) for canal_id in (10, 20, 30)}
+        interaction = mock.Mock(guild_id=1)
+        interaction.guild.get_channel.side_effect = canales.get
+        interaction.client.get_channel.side_effect = canales.get
+        config = {"id_canalp": "10", "canales_espejo": [20, 10, 20, 30]}
+
+        with mock.patch.object(generarmensaje, "construir_mensaje", return_value="anuncio"):
+            destinos = await generarmensaje.resolver_destinos(interaction, config, {"titulo": "Uno"}, "1")
+
+        self.assertEqual([canal_id for canal_id, _, _ in destinos], [10, 20, 30])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import dominiofire
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+class PruebasMigracionDominio(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.almacenamiento = AlmacenamientoSQLite(os.path.join(self.directorio.name, "datos.db"))
+        parche = mock.patch.object(dominiofire, "almacenamiento", self.almacenamiento)
+        parche.start()
+        self.addCleanup(parche.stop)
+        await self.almacenamiento.escribir_lote("1", [
+            ("crear", "a", {"titulo": "A", "link_ikigai": "https://otro.com/a"}),
+            ("crear", "b", {"titulo": "B", "link_ikigai": "https://viejo.com/b"}),
+            ("crear", "c", {"titulo": "C", "link_ikigai": "https://otro.com/c"}),
+        ])
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    async def test_no_reanuda_un_punto_de_control_con_otro_filtro(self):
+        # Migración filtrada por viejo.com interrumpida tras el documento "b"
+        await self.almacenamiento.escribir_migracion("1", "dominio", {
+            "dominio": "nuevo.com", "dominio_anterior": "viejo.com", "ultimo_id": "b",
+            "revisados": 2, "actualizados": 1, "completado": False,
+        })
+        resumen = await dominiofire.migrar_dominio_servidor("1", "nuevo.com")
+
+        self.assertIsNone(resumen["reanudado_desde"])
+        for doc_id in ("a", "b", "c"):
+            datos = await self.almacenamiento.leer_proyecto("1", doc_id)
+            self.assertTrue(datos["link_ikigai"].startswith("https://nuevo.com/"), datos)
+
+    async def test_reanuda_con_el_mismo_filtro(self):
+        await self.almacenamiento.escribir_migracion("1", "dominio", {
+            "dominio": "nuevo.com", "dominio_anterior": "viejo.com", "ultimo_id": "b",
+            "revisados": 2, "actualizados": 1, "completado": False,
+        })
+        resumen = await dominiofire.migrar_dominio_servidor("1", "nuevo.com", dominio_anterior="https://viejo.com")
+        self.assertEqual(resumen["reanudado_desde"], "b")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import imagenes
+from utils_py.cache_imagenes import CacheImagenes, EntradaPortada
+
+
+class RespuestaFalsa:
+    def __init__(self, status, headers):
+        self.status = status
+        self.headers = headers
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class PruebasRevalidacion(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.cache = CacheImagenes(directorio=self.directorio.name)
+        parche = mock.patch.object(imagenes, "cache_imagenes", self.cache)
+        parche.start()
+        self.addCleanup(parche.stop)
+        self.url = "https://img.example/portada.png"
+        await self.cache.guardar(EntradaPortada(self.url, b"\x89PNG datos", "png", "image/png", etag='"v1"',
+                                                frescura=0.0))
+
+    async def revalidar(self, cache_control):
+        sesion = mock.Mock()
+        sesion.get.return_value = RespuestaFalsa(304, {"Cache-Control": cache_control})
+        return await imagenes.descargar_imagen(sesion, self.url)
+
+    async def test_304_con_no_store_olvida_la_copia(self):
+        imagen = await self.revalidar("no-store")
+        self.assertEqual(imagen.datos, b"\x89PNG datos")
+        self.assertIsNone(await self.cache.buscar(self.url))
+
+    async def test_304_renueva_la_frescura(self):
+        await self.revalidar("max-age=60")
+        cacheada = await self.cache.buscar(self.url)
+        self.assertTrue(cacheada.fresca())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import intercambio_proyectos
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+class PruebasIntercambioProyectos(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.origen = AlmacenamientoSQLite(os.path.join(self.directorio.name, "origen.db"))
+        self.destino = AlmacenamientoSQLite(os.path.join(self.directorio.name, "destino.db"))
+        parche = mock.patch.object(intercambio_proyectos.cache_titulos, "registrar")
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    async def test_json_conserva_todos_los_campos(self):
+        proyecto = {"titulo": "Uno", "link_ikigai": "https://ikigai.example/uno", "sinopsis": "Algo",
+                    "rol_id": "123", "portada": "https://img.example/uno.png", "capitulos": [1, 2]}
+        await self.origen.crear_proyecto("1", "uno", proyecto)
+
+        with mock.patch.object(intercambio_proyectos, "almacenamiento", self.origen):
+            archivo, _, total = await intercambio_proyectos.exportar_proyectos("1", "json")
+        self.assertEqual(total, 1)
+        with mock.patch.object(intercambio_proyectos, "almacenamiento", self.destino):
+            resumen, informe = await intercambio_proyectos.importar_proyectos("2", archivo, "json")
+        archivo.close()
+        informe.close()
+
+        self.assertEqual(resumen["creados"], 1)
+        self.assertEqual(await self.destino.leer_proyecto("2", "uno"), proyecto)
+
+    async def test_json_rechaza_nombres_de_campo_con_punto(self):
+        archivo = io.BytesIO(b'{"titulo": "Uno", "link_ikigai": "https://ikigai.example/uno", "a.b": 1}\n')
+        with mock.patch.object(intercambio_proyectos, "almacenamiento", self.destino):
+            resumen, informe = await intercambio_proyectos.importar_proyectos("2", archivo, "json")
+        informe.close()
+
+        self.assertEqual(resumen["invalidos"], 1)
+        self.assertIn("a.b", resumen["problemas"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import threading
+import unittest
+
+from utils_py.metricas import Contador, Histograma
+
+
+class PruebasMetricas(unittest.TestCase):
+    def test_incrementos_desde_varios_hilos(self):
+        contador = Contador("prueba_total", "Prueba", ("hilo",))
+        histograma = Histograma("prueba_segundos", "Prueba", ("hilo",))
+
+        def trabajar(numero):
+            for indice in range(5000):
+                contador.inc(hilo=numero % 2)
+                histograma.observar(0.001, hilo=f"{numero}-{indice % 50}")
+
+        hilos = [threading.Thread(target=trabajar, args=(numero,)) for numero in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        # Exponer mientras aparecen etiquetas nuevas no debe fallar
+        while any(hilo.is_alive() for hilo in hilos):
+            list(contador.exponer())
+            list(histograma.exponer())
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(sum(float(linea.split()[-1]) for linea in contador.exponer()), 8 * 5000)
+        conteos = [linea for linea in histograma.exponer() if linea.startswith("prueba_segundos_count")]
+        self.assertEqual(sum(int(linea.split()[-1]) for linea in conteos), 8 * 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
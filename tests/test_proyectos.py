@@ -0,0 +1,74 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import proyectos
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+class PruebasObtenerProyectos(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        proyectos.invalidar("1")
+
+    async def test_titulos_sin_migrar_se_buscan_en_paralelo_y_sin_lectura_directa(self):
+        en_curso = []
+        maximo = 0
+
+        async def buscar(server_id, titulo):
+            nonlocal maximo
+            en_curso.append(titulo)
+            maximo = max(maximo, len(en_curso))
+            await asyncio.sleep(0.01)
+            en_curso.remove(titulo)
+            return (f"auto-{titulo}", {"titulo": titulo}) if titulo != "Ninguno" else None
+
+        falso = mock.Mock()
+        falso.leer_proyectos = mock.AsyncMock(return_value={"uno": {"titulo": "Uno"}})
+        falso.leer_proyecto = mock.AsyncMock(return_value=None)
+        falso.buscar_proyecto_por_titulo = mock.AsyncMock(side_effect=buscar)
+
+        with mock.patch.object(proyectos, "almacenamiento", falso):
+            encontrados = await proyectos.obtener_proyectos("1", ["Uno", "Dos", "Tres", "Ninguno", "Dos"])
+
+        self.assertEqual(set(encontrados), {"Uno", "Dos", "Tres"})
+        falso.leer_proyecto.assert_not_awaited()
+        self.assertEqual(falso.buscar_proyecto_por_titulo.await_count, 3)
+        self.assertEqual(maximo, 3)
+
+
+
+class PruebasTitulosNoLatinos(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        proyectos.invalidar("1")
+        self.directorio = tempfile.TemporaryDirectory()
+        self.almacenamiento = AlmacenamientoSQLite(os.path.join(self.directorio.name, "datos.db"))
+        parche = mock.patch.object(proyectos, "almacenamiento", self.almacenamiento)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_clave_de_hash_estable(self):
+        clave = proyectos.clave_titulo("나 혼자만 레벨업")
+        self.assertTrue(clave.startswith("t-"))
+        self.assertEqual(clave, proyectos.clave_titulo(" 나  혼자만 레벨업 "))
+        self.assertEqual(proyectos.clave_titulo("ТЕСТ"), proyectos.clave_titulo("Тест"))
+        self.assertNotEqual(proyectos.clave_titulo("Тест"), proyectos.clave_titulo("!!!"))
+        with self.assertRaises(ValueError):
+            proyectos.clave_titulo("   ")
+
+    async def test_crear_y_encontrar_titulos_no_latinos(self):
+        await proyectos.crear_proyecto("1", {"titulo": "나 혼자만 레벨업", "link_ikigai": "https://ikigai.example/a"})
+        # Proyecto antiguo con ID automático: solo se encuentra por el campo `titulo`
+        await self.almacenamiento.crear_proyecto("1", "AbCdEf123", {"titulo": "Тест"})
+
+        self.assertEqual((await proyectos.obtener_proyecto("1", "Тест"))[0], "AbCdEf123")
+        encontrados = await proyectos.obtener_proyectos("1", ["나 혼자만 레벨업", "Тест", "!!!"])
+        self.assertEqual(set(encontrados), {"나 혼자만 레벨업", "Тест"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+from unittest import mock
+
+from comandos_py import publicarlote
+from utils_py.cola_publicaciones import ColaPublicaciones
+
+
+class PruebasPublicacionesFallidas(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.cola = ColaPublicaciones(trabajadores=1)
+        self.cola.iniciar()
+        self.interaction = mock.Mock(guild_id=1)
+        self.interaction.followup.send = mock.AsyncMock()
+
+    async def asyncTearDown(self):
+        await self.cola.detener()
+
+    async def test_error_se_informa_y_cuenta_como_fallido(self):
+        with mock.patch.object(publicarlote.cache_config, "obtener", mock.AsyncMock(return_value=None)), \
+                mock.patch.object(publicarlote, "obtener_proyectos", mock.AsyncMock(return_value={})):
+            futuro = self.cola.encolar(publicarlote.publicar_lote, self.interaction, [("Uno", "1", "https://x/1.png", "")])
+            with self.assertRaises(ValueError):
+                await futuro
+
+        self.interaction.followup.send.assert_awaited_once()
+        self.assertEqual(self.cola.estadisticas()["fallidos"], 1)
+        self.assertEqual(self.cola.estadisticas()["procesados"], 0)
+
+
+
+class PruebasArchivoLote(unittest.IsolatedAsyncioTestCase):
+    async def test_archivo_demasiado_grande_no_se_lee(self):
+        bot = mock.Mock()
+        await publicarlote.setup(bot)
+        comando = bot.tree.add_command.call_args[0][0]
+
+        interaction = mock.Mock(guild_id=1)
+        interaction.response.defer = mock.AsyncMock()
+        interaction.followup.send = mock.AsyncMock()
+        archivo = mock.Mock(size=publicarlote.MAX_BYTES_ARCHIVO_LOTE + 1)
+        archivo.read = mock.AsyncMock(return_value=b"")
+
+        await comando.callback(interaction, archivo=archivo)
+
+        archivo.read.assert_not_awaited()
+        self.assertIn("supera el máximo", interaction.followup.send.call_args.kwargs["embed"].description)
+
+
+if __name__ == "__main__":
+    unittest.main()
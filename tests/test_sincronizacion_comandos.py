@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from utils_py import sincronizacion_comandos
+from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+
+
+def bot_falso(comandos):
+    bot = mock.Mock(application_id=42)
+    bot.tree.get_commands.return_value = [mock.Mock(to_dict=mock.Mock(return_value=comando)) for comando in comandos]
+    bot.tree.sync = mock.AsyncMock(side_effect=lambda guild=None: list(comandos))
+    return bot
+
+
+class PruebasSincronizacionComandos(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.almacenamiento = AlmacenamientoSQLite(os.path.join(self.directorio.name, "datos.db"))
+        parche = mock.patch.object(sincronizacion_comandos, "almacenamiento", self.almacenamiento)
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    async def test_la_huella_se_guarda_en_el_almacenamiento(self):
+        comandos = [{"name": "publicar", "description": "Publica un capítulo"}]
+        resumen = await sincronizacion_comandos.sincronizar_si_cambia(bot_falso(comandos), guild_id=None, forzar=False)
+        self.assertTrue(resumen["sincronizado"])
+
+        # Otro proceso (p. ej. tras reiniciar el dyno) ve la misma huella y no vuelve a sincronizar
+        bot = bot_falso(comandos)
+        resumen = await sincronizacion_comandos.sincronizar_si_cambia(bot, guild_id=None, forzar=False)
+        self.assertFalse(resumen["sincronizado"])
+        bot.tree.sync.assert_not_awaited()
+
+        comandos.append({"name": "lote", "description": "Publica varios capítulos"})
+        resumen = await sincronizacion_comandos.sincronizar_si_cambia(bot_falso(comandos), guild_id=None, forzar=False)
+        self.assertTrue(resumen["sincronizado"])
+        self.assertEqual(await self.almacenamiento.listar_servidores(), [])
+        self.assertIsNotNone(await self.almacenamiento.leer_metadato("comandos-42-global"))
+
+    async def test_reintenta_si_falla_la_sincronizacion(self):
+        comandos = [{"name": "publicar", "description": "Publica un capítulo"}]
+        bot = bot_falso(comandos)
+        bot.tree.sync.side_effect = [ConnectionError("Discord caído"), ConnectionError("Discord caído"), comandos]
+
+        resumen = await sincronizacion_comandos.reintentar_sincronizacion(bot, espera=0.01, espera_max=0.02)
+
+        self.assertTrue(resumen["sincronizado"])
+        self.assertEqual(bot.tree.sync.await_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
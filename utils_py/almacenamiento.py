@@ -0,0 +1,239 @@
+import glob
+import logging
+import os
+from abc import ABC, abstractmethod
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Backend de datos: "firestore" (por defecto) o "sqlite" para instalaciones pequeñas autoalojadas
+BACKEND = os.getenv("ALMACENAMIENTO", "firestore").lower()
+RUTA_SQLITE = os.getenv("SQLITE_RUTA", "publimanager.db")
+# Diario local de escritura diferida (ruta del archivo SQLite); vacío = escrituras directas
+RUTA_DIARIO = os.getenv("DIARIO_ESCRITURAS", "")
+
+
+class _BorrarCampo:
+    """
+    Valor de un campo que se debe eliminar (cada backend lo traduce; Firestore a DELETE_FIELD).
+    """
+    def __repr__(self):
+        return "BORRAR_CAMPO"
+
+
+BORRAR_CAMPO = _BorrarCampo()
+
+
+class DocumentoExistente(ValueError):
+    """
+    Se intentó crear un documento con un ID que ya existe.
+    """
+
+
+def aplicar_campos(datos: dict, campos: dict) -> dict:
+    """
+    Devuelve `datos` con `campos` aplicados (BORRAR_CAMPO elimina la clave).
+    """
+    resultado = dict(datos or {})
+    for clave, valor in campos.items():
+        if valor is BORRAR_CAMPO:
+            resultado.pop(clave, None)
+        else:
+            resultado[clave] = valor
+    return resultado
+
+
+class Almacenamiento(ABC):
+    """
+    Repositorio de datos del bot: configuración (incluidos los roles) y proyectos de cada servidor.
+
+    Los módulos del bot solo hablan con esta interfaz; cada backend decide cómo guardar
+    los datos. Los proyectos se identifican por `doc_id` dentro de su servidor. Los métodos
+    abstractos son el contrato de cada backend: uno incompleto falla al instanciarse.
+    """
+    nombre = "base"
+
+    def precalentar(self):
+        """
+        Empieza a preparar la conexión en segundo plano; por defecto no hace nada.
+        """
+
+    async def conectar(self):
+        """
+        Espera a que el backend esté listo para usarse; por defecto ya lo está.
+        """
+
+    async def cerrar(self):
+        """
+        Termina el trabajo pendiente antes de apagar; por defecto no hay nada que hacer.
+        """
+
+    def estadisticas(self):
+        return {"backend": self.nombre, "listo": True}
+
+    # Configuración del servidor (`id_canalp`, roles `id_role_N`/`ide_N`/`ido_N`, plantilla...)
+    @abstractmethod
+    async def leer_config(self, server_id: str):
+        """
+        Devuelve la configuración del servidor, o None si no existe.
+        """
+
+    @abstractmethod
+    async def escribir_config(self, server_id: str, campos: dict, merge: bool = True):
+        """
+        Escribe la configuración; con `merge` solo cambian los campos indicados.
+        """
+
+    @abstractmethod
+    async def actualizar_config(self, server_id: str, campos: dict):
+        """
+        Actualiza campos de una configuración existente (falla si no existe).
+        """
+
+    # Proyectos
+    @abstractmethod
+    async def leer_proyecto(self, server_id: str, doc_id: str):
+        """
+        Devuelve los datos del proyecto, o None si no existe.
+        """
+
+    @abstractmethod
+    async def leer_proyectos(self, server_id: str, doc_ids) -> dict:
+        """
+        Devuelve {doc_id: datos} de los proyectos que existen, en una sola lectura.
+        """
+
+    @abstractmethod
+    async def buscar_proyecto_por_titulo(self, server_id: str, titulo: str):
+        """
+        Devuelve (doc_id, datos) del proyecto con ese título, o None.
+        """
+
+    @abstractmethod
+    async def crear_proyecto(self, server_id: str, doc_id: str, datos: dict):
+        """
+        Crea un proyecto; lanza DocumentoExistente si el ID ya está ocupado.
+        """
+
+    @abstractmethod
+    async def actualizar_proyecto(self, server_id: str, doc_id: str, campos: dict):
+        """
+        Actualiza campos de un proyecto existente (admite BORRAR_CAMPO).
+        """
+
+    async def mover_proyecto(self, server_id: str, doc_id: str, nuevo_id: str, datos: dict):
+        """
+        Crea `nuevo_id` con `datos` y borra `doc_id` de forma atómica.
+        """
+        await self.escribir_lote(server_id, [("crear", nuevo_id, datos), ("borrar", doc_id, None)])
+
+    @abstractmethod
+    async def pagina_proyectos(self, server_id: str, despues_de: str = None, limite: int = 400, campos=None):
+        """
+        Devuelve hasta `limite` proyectos [(doc_id, datos)] ordenados por ID, a partir de `despues_de`.
+        """
+
+    @abstractmethod
+    async def escribir_lote(self, server_id: str, operaciones):
+        """
+        Aplica de forma atómica una lista de (operación, doc_id, datos) sobre los proyectos.
+
+        Las operaciones son "crear" (lanza DocumentoExistente si ya existe), "actualizar" y "borrar".
+        """
+
+    @abstractmethod
+    async def escuchar_proyectos(self, server_id: str, callback):
+        """
+        Llama a `callback(cambios)` con el estado inicial y luego con cada cambio.
+
+        Cada cambio es (doc_id, datos o None si se borró, marca de tiempo). Puede llamarse
+        desde otro hilo. Devuelve un objeto con `unsubscribe()`; el alta no bloquea el event loop.
+        """
+
+    @abstractmethod
+    async def listar_titulos(self, server_id: str):
+        """
+        Carga única de los títulos: [(doc_id, {"titulo": ...}, marca)].
+        """
+
+    # Puntos de control de las migraciones (`dominio`...)
+    @abstractmethod
+    async def leer_migracion(self, server_id: str, nombre: str):
+        """
+        Devuelve el punto de control de una migración del servidor, o None.
+        """
+
+    @abstractmethod
+    async def escribir_migracion(self, server_id: str, nombre: str, datos: dict, merge: bool = False):
+        """
+        Guarda el punto de control de una migración del servidor.
+        """
+
+    @abstractmethod
+    async def listar_servidores(self):
+        """
+        IDs de todos los servidores con datos.
+        """
+
+    # Metadatos del bot que no son de ningún servidor (huella de los comandos de barra...)
+    @abstractmethod
+    async def leer_metadato(self, nombre: str):
+        """
+        Devuelve un metadato del bot, o None si no existe.
+        """
+
+    @abstractmethod
+    async def escribir_metadato(self, nombre: str, datos: dict):
+        """
+        Guarda (reemplaza) un metadato del bot.
+        """
+
+
+def ruta_diario_proceso(ruta: str) -> str:
+    """
+    Ruta del diario de este proceso: cada cluster (ver `utils_py.clusters`) tiene el suyo.
+
+    `diario.db` pasa a `diario.cluster2.db` en el cluster 2; con un solo proceso no cambia.
+    """
+    cluster_id = os.getenv("CLUSTER_ID")
+    if cluster_id is None:
+        return ruta
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.cluster{cluster_id}{extension}"
+
+
+def diarios_heredados(ruta: str) -> list:
+    """
+    Diarios que dejó una ejecución con otra disposición de procesos y que este proceso debe vaciar.
+
+    El cluster 0 hereda el de una ejecución sin clusters (`diario.db`); un proceso único, los de
+    una ejecución anterior con clusters (`diario.cluster*.db`). Los demás clusters no heredan ninguno.
+    """
+    cluster_id = os.getenv("CLUSTER_ID")
+    if cluster_id is not None:
+        return [ruta] if cluster_id == "0" and os.path.exists(ruta) else []
+    base, extension = os.path.splitext(ruta)
+    return sorted(glob.glob(f"{glob.escape(base)}.cluster*{extension}"))
+
+
+def crear_almacenamiento(backend: str = BACKEND, ruta_diario: str = RUTA_DIARIO) -> Almacenamiento:
+    """
+    Crea el backend configurado en `ALMACENAMIENTO`, con diario de escritura diferida si hay `DIARIO_ESCRITURAS`.
+    """
+    if backend == "sqlite":
+        from utils_py.almacenamiento_sqlite import AlmacenamientoSQLite
+        instancia = AlmacenamientoSQLite(RUTA_SQLITE)
+    elif backend == "firestore":
+        from utils_py.almacenamiento_firestore import AlmacenamientoFirestore
+        instancia = AlmacenamientoFirestore()
+    else:
+        raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+    if ruta_diario:
+        from utils_py.almacenamiento_diario import AlmacenamientoDiferido
+        instancia = AlmacenamientoDiferido(instancia, ruta_diario_proceso(ruta_diario), diarios_heredados(ruta_diario))
+    return instancia
+
+
+# Instancia global del almacenamiento
+almacenamiento = crear_almacenamiento()
+logger.info(f"Almacenamiento de datos: {almacenamiento.nombre}")
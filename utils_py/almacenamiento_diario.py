@@ -0,0 +1,471 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils_py.almacenamiento import BORRAR_CAMPO, Almacenamiento, DocumentoExistente, aplicar_campos
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Ritmo del vaciado, operaciones por lote (Firestore admite 500 escrituras por commit) y espera máxima entre reintentos
+INTERVALO_VACIADO = float(os.getenv("DIARIO_INTERVALO", "0.5"))
+OPERACIONES_POR_LOTE = int(os.getenv("DIARIO_OPERACIONES_POR_LOTE", "450"))
+ESPERA_MAX_REINTENTO = 60.0
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS diario (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server_id TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    operacion TEXT NOT NULL,
+    doc_id TEXT,
+    datos TEXT,
+    merge INTEGER NOT NULL DEFAULT 1,
+    creado REAL NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_diario_estado ON diario (estado, id);
+"""
+
+# Marca JSON de BORRAR_CAMPO
+_MARCA_BORRAR = {"__borrar_campo__": True}
+
+
+def _serializar(datos):
+    if datos is None:
+        return None
+    return json.dumps({clave: _MARCA_BORRAR if valor is BORRAR_CAMPO else valor for clave, valor in datos.items()},
+                      ensure_ascii=False)
+
+
+def _deserializar(texto):
+    if texto is None:
+        return None
+    return {clave: BORRAR_CAMPO if valor == _MARCA_BORRAR else valor for clave, valor in json.loads(texto).items()}
+
+
+def _es_permanente(error) -> bool:
+    """
+    Errores que no se arreglan reintentando (documento inexistente o duplicado, datos inválidos).
+    """
+    if isinstance(error, ValueError):
+        return True
+    try:
+        from google.api_core.exceptions import InvalidArgument, NotFound
+    except ImportError:
+        return False
+    return isinstance(error, (NotFound, InvalidArgument))
+
+
+class _Entrada:
+    """
+    Mutación anotada en el diario y aún no aplicada en el backend.
+    """
+    __slots__ = ("id", "server_id", "tipo", "operacion", "doc_id", "datos", "merge")
+
+    def __init__(self, id, server_id, tipo, operacion, doc_id, datos, merge):
+        self.id = id
+        self.server_id = server_id
+        self.tipo = tipo            # "config" o "proyecto"
+        self.operacion = operacion  # config: "escribir"/"actualizar"; proyecto: "crear"/"actualizar"/"borrar"
+        self.doc_id = doc_id
+        self.datos = datos
+        self.merge = merge
+
+
+class AlmacenamientoDiferido(Almacenamiento):
+    """
+    Escritura diferida: las mutaciones se anotan en un diario SQLite local y se confirman al instante.
+
+    Un vaciador en segundo plano las aplica en el backend real en orden, agrupando las
+    consecutivas (varios cambios de la misma configuración en una escritura, los de
+    proyectos de un servidor en lotes) y reintentando con espera creciente si el backend
+    falla. Las entradas pendientes sobreviven a un reinicio y se aplican al arrancar.
+    Las lecturas de configuración y proyectos ven las escrituras pendientes. Las operaciones
+    masivas (páginas, lotes de migración, puntos de control) vacían antes el diario y van
+    directas al backend. Una entrada con un error permanente (p. ej. un proyecto duplicado que
+    se creó a la vez en otro proceso) se marca como `descartada` en el diario y se registra.
+
+    Los diarios `heredados` (de una ejecución con otra disposición de clusters) se vacían y
+    eliminan antes que el propio, para respetar el orden de las escrituras.
+    """
+    def __init__(self, backend: Almacenamiento, ruta: str, heredados=()):
+        self.backend = backend
+        self.nombre = f"{backend.nombre}+diario"
+        self.ruta = ruta
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="diario")
+        self._conexion = self._hilo.submit(self._conectar).result()
+        self._pendientes = self._hilo.submit(self._cargar_pendientes).result()
+        self._heredados = list(heredados)
+        self._tarea = None
+        self._despertar = None
+        self._lock_vaciado = None
+        self._espera = INTERVALO_VACIADO
+        self._intentos = 0
+        self.aplicadas = 0
+        self.descartadas = 0
+        self.ultimo_error = None
+        if self._pendientes:
+            logger.info(f"Diario de escrituras: {len(self._pendientes)} mutaciones pendientes de la ejecución anterior")
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta, isolation_level=None, check_same_thread=False, timeout=0)
+        # Un diario pertenece a un solo proceso: otro que abriera el mismo archivo aplicaría dos veces sus entradas
+        conexion.execute("PRAGMA locking_mode=EXCLUSIVE")
+        try:
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.executescript(ESQUEMA)
+        except sqlite3.OperationalError as e:
+            conexion.close()
+            raise RuntimeError(f"El diario de escrituras {self.ruta} está en uso por otro proceso: {e}")
+        return conexion
+
+    def _cargar_pendientes(self):
+        filas = self._conexion.execute(
+            "SELECT id, server_id, tipo, operacion, doc_id, datos, merge FROM diario "
+            "WHERE estado = 'pendiente' ORDER BY id"
+        )
+        return [_Entrada(id, server_id, tipo, operacion, doc_id, _deserializar(datos), bool(merge))
+                for id, server_id, tipo, operacion, doc_id, datos, merge in filas]
+
+    async def _ejecutar(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._hilo, funcion, *args)
+
+    # Anotar
+    async def _anotar(self, operaciones):
+        """
+        Guarda en el diario una o varias (server_id, tipo, operacion, doc_id, datos, merge) de forma atómica.
+        """
+        def guardar():
+            self._conexion.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [self._conexion.execute(
+                    "INSERT INTO diario (server_id, tipo, operacion, doc_id, datos, merge, creado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (server_id, tipo, operacion, doc_id, _serializar(datos), int(merge), time.time()),
+                ).lastrowid for server_id, tipo, operacion, doc_id, datos, merge in operaciones]
+            except BaseException:
+                self._conexion.execute("ROLLBACK")
+                raise
+            self._conexion.execute("COMMIT")
+            return ids
+
+        ids = await self._ejecutar(guardar)
+        for id, (server_id, tipo, operacion, doc_id, datos, merge) in zip(ids, operaciones):
+            self._pendientes.append(_Entrada(id, server_id, tipo, operacion, doc_id, datos, merge))
+        self._iniciar()
+        self._despertar.set()
+
+    def _marcar(self, entradas, estado=None, error=None):
+        ids = [(entrada.id,) for entrada in entradas]
+        if estado is None:
+            self._conexion.executemany("DELETE FROM diario WHERE id = ?", ids)
+        else:
+            self._conexion.executemany(f"UPDATE diario SET estado = '{estado}', error = ? WHERE id = ?",
+                                       [(error, id) for (id,) in ids])
+
+    # Vaciar
+    def _iniciar(self):
+        if self._tarea is None or self._tarea.done():
+            self._despertar = asyncio.Event()
+            self._lock_vaciado = asyncio.Lock()
+            self._tarea = asyncio.create_task(self._vaciador())
+
+    async def _vaciar_heredados(self):
+        """
+        Aplica y elimina cada diario heredado; reintenta con espera creciente mientras el backend falle.
+        """
+        while self._heredados:
+            ruta = self._heredados[0]
+            heredado = None
+            intentos = 0
+            while True:
+                try:
+                    if heredado is None:
+                        heredado = await asyncio.to_thread(AlmacenamientoDiferido, self.backend, ruta)
+                    await heredado.vaciar()
+                    break
+                except Exception as e:
+                    intentos += 1
+                    espera = min(ESPERA_MAX_REINTENTO, INTERVALO_VACIADO * 2 ** min(intentos, 16))
+                    self.ultimo_error = f"diario heredado {ruta}: {e}"
+                    logger.error(f"Diario de escrituras: no se pudo vaciar el diario heredado {ruta} "
+                                 f"(intento {intentos}, siguiente en {espera:.1f} s): {e}")
+                    await asyncio.sleep(espera)
+            await heredado._cerrar_diario()
+            for sufijo in ("", "-wal", "-shm"):
+                try:
+                    os.remove(f"{ruta}{sufijo}")
+                except FileNotFoundError:
+                    pass
+            self.ultimo_error = None
+            self._heredados.pop(0)
+            logger.info(f"Diario de escrituras: diario heredado {ruta} vaciado ({heredado.aplicadas} aplicadas, "
+                        f"{heredado.descartadas} descartadas) y eliminado")
+
+    async def _vaciador(self):
+        await self._vaciar_heredados()
+        while True:
+            if self._intentos:
+                # Backend caído: las escrituras nuevas no adelantan el reintento
+                await asyncio.sleep(self._espera)
+            else:
+                try:
+                    await asyncio.wait_for(self._despertar.wait(), timeout=INTERVALO_VACIADO)
+                except asyncio.TimeoutError:
+                    pass
+            self._despertar.clear()
+            if not self._pendientes:
+                continue
+            try:
+                await self.vaciar()
+                if self._intentos:
+                    logger.info(f"Diario de escrituras: backend recuperado tras {self._intentos} intentos fallidos")
+                self._espera = INTERVALO_VACIADO
+                self._intentos = 0
+                self.ultimo_error = None
+            except Exception as e:
+                # Error transitorio (los permanentes ya se descartan en `vaciar`): orden estricto,
+                # nada se salta ni se descarta; se reintenta indefinidamente con la espera máxima
+                self._intentos += 1
+                self._espera = min(ESPERA_MAX_REINTENTO, INTERVALO_VACIADO * 2 ** min(self._intentos, 16))
+                self.ultimo_error = str(e)
+                logger.error(f"Diario de escrituras: error al vaciar ({len(self._pendientes)} pendientes, "
+                             f"intento {self._intentos}, siguiente en {self._espera:.1f} s): {e}")
+
+    def _siguiente_unidad(self):
+        """
+        Entradas consecutivas al principio del diario que se aplican en una sola llamada al backend.
+        """
+        primera = self._pendientes[0]
+        unidad = [primera]
+        for entrada in self._pendientes[1:]:
+            if entrada.server_id != primera.server_id or entrada.tipo != primera.tipo:
+                break
+            if primera.tipo == "config":
+                # Misma operación y modo: los campos se funden (el último gana)
+                if (entrada.operacion, entrada.merge) != (primera.operacion, primera.merge) or not entrada.merge:
+                    break
+            elif len(unidad) >= OPERACIONES_POR_LOTE:
+                break
+            unidad.append(entrada)
+        return unidad
+
+    async def _aplicar(self, unidad):
+        primera = unidad[0]
+        if primera.tipo == "config":
+            campos = {}
+            for entrada in unidad:
+                campos.update(entrada.datos)
+            if primera.operacion == "actualizar":
+                await self.backend.actualizar_config(primera.server_id, campos)
+            else:
+                await self.backend.escribir_config(primera.server_id, campos, merge=primera.merge)
+        else:
+            await self.backend.escribir_lote(primera.server_id,
+                                             [(entrada.operacion, entrada.doc_id, entrada.datos) for entrada in unidad])
+
+    async def _descartar(self, entradas, error):
+        self.descartadas += len(entradas)
+        for entrada in entradas:
+            self._pendientes.remove(entrada)
+        await self._ejecutar(self._marcar, entradas, "descartada", str(error))
+        for entrada in entradas:
+            logger.error(f"Diario de escrituras: mutación {entrada.id} ({entrada.tipo} {entrada.operacion} "
+                         f"{entrada.doc_id or ''} en {entrada.server_id}) descartada: {error}")
+
+    async def vaciar(self):
+        """
+        Aplica en orden todas las mutaciones pendientes; lanza la excepción del backend si una falla.
+        """
+        if self._lock_vaciado is None:
+            self._iniciar()
+        async with self._lock_vaciado:
+            while self._pendientes:
+                unidad = self._siguiente_unidad()
+                try:
+                    await self._aplicar(unidad)
+                except Exception as e:
+                    if not _es_permanente(e):
+                        raise
+                    if len(unidad) == 1:
+                        await self._descartar(unidad, e)
+                        continue
+                    # Un lote falló entero: aplicar una a una para aislar la que sobra
+                    for entrada in unidad:
+                        try:
+                            await self._aplicar([entrada])
+                        except Exception as error_entrada:
+                            if not _es_permanente(error_entrada):
+                                raise
+                            await self._descartar([entrada], error_entrada)
+                            continue
+                        self._pendientes.remove(entrada)
+                        self.aplicadas += 1
+                        await self._ejecutar(self._marcar, [entrada])
+                    continue
+                # Primero en memoria: si se cancela aquí, el hilo termina igualmente de borrarlas del diario
+                del self._pendientes[:len(unidad)]
+                self.aplicadas += len(unidad)
+                await self._ejecutar(self._marcar, unidad)
+
+    # Ciclo de vida
+    def precalentar(self):
+        self._iniciar()
+        return self.backend.precalentar()
+
+    async def conectar(self):
+        await self.backend.conectar()
+
+    async def cerrar(self, espera: float = 10.0):
+        """
+        Intenta vaciar el diario antes de apagar; lo que quede se aplicará en el siguiente arranque.
+        """
+        if self._pendientes:
+            try:
+                await asyncio.wait_for(self.vaciar(), timeout=espera)
+            except Exception as e:
+                logger.warning(f"Diario de escrituras: {len(self._pendientes)} mutaciones quedan para el próximo arranque: {e}")
+        if self._tarea is not None:
+            self._tarea.cancel()
+        await self.backend.cerrar()
+
+    async def _cerrar_diario(self):
+        """
+        Detiene el vaciador y cierra el archivo del diario (sin cerrar el backend).
+        """
+        if self._tarea is not None and self._tarea is not asyncio.current_task():
+            self._tarea.cancel()
+        await self._ejecutar(self._conexion.close)
+        self._hilo.shutdown(wait=False)
+
+    def estadisticas(self):
+        return dict(self.backend.estadisticas(), backend=self.nombre, diario_pendientes=len(self._pendientes),
+                    diario_aplicadas=self.aplicadas, diario_descartadas=self.descartadas,
+                    diario_fallos_seguidos=self._intentos, diario_error=self.ultimo_error)
+
+    # Superposición de lo pendiente sobre lo leído
+    def _superponer_config(self, server_id, config):
+        for entrada in self._pendientes:
+            if entrada.tipo == "config" and entrada.server_id == server_id:
+                config = aplicar_campos(config if entrada.merge else None, entrada.datos)
+        return config
+
+    def _superponer_proyecto(self, server_id, doc_id, datos):
+        for entrada in self._pendientes:
+            if entrada.tipo != "proyecto" or entrada.server_id != server_id or entrada.doc_id != doc_id:
+                continue
+            if entrada.operacion == "borrar":
+                datos = None
+            elif entrada.operacion == "crear":
+                datos = aplicar_campos(None, entrada.datos)
+            elif datos is not None:
+                datos = aplicar_campos(datos, entrada.datos)
+        return datos
+
+    def _ids_pendientes(self, server_id):
+        return {entrada.doc_id for entrada in self._pendientes
+                if entrada.tipo == "proyecto" and entrada.server_id == server_id}
+
+    # Configuración
+    async def leer_config(self, server_id: str):
+        return self._superponer_config(server_id, await self.backend.leer_config(server_id))
+
+    async def escribir_config(self, server_id: str, campos: dict, merge: bool = True):
+        await self._anotar([(server_id, "config", "escribir", None, dict(campos), merge)])
+
+    async def actualizar_config(self, server_id: str, campos: dict):
+        # Como en el backend directo, actualizar una configuración inexistente falla aquí y no al vaciar,
+        # donde el error ya no llegaría a nadie; comprobada, se anota como escritura fusionada
+        if await self.leer_config(server_id) is None:
+            raise ValueError(f"No existe la configuración del servidor {server_id}.")
+        await self._anotar([(server_id, "config", "escribir", None, dict(campos), True)])
+
+    # Proyectos
+    async def leer_proyecto(self, server_id: str, doc_id: str):
+        return self._superponer_proyecto(server_id, doc_id, await self.backend.leer_proyecto(server_id, doc_id))
+
+    async def leer_proyectos(self, server_id: str, doc_ids) -> dict:
+        doc_ids = list(doc_ids)
+        encontrados = await self.backend.leer_proyectos(server_id, doc_ids)
+        pendientes = self._ids_pendientes(server_id)
+        for doc_id in pendientes.intersection(doc_ids):
+            datos = self._superponer_proyecto(server_id, doc_id, encontrados.get(doc_id))
+            if datos is None:
+                encontrados.pop(doc_id, None)
+            else:
+                encontrados[doc_id] = datos
+        return encontrados
+
+    async def buscar_proyecto_por_titulo(self, server_id: str, titulo: str):
+        for doc_id in self._ids_pendientes(server_id):
+            datos = await self.leer_proyecto(server_id, doc_id)
+            if datos is not None and datos.get("titulo") == titulo:
+                return doc_id, datos
+        encontrado = await self.backend.buscar_proyecto_por_titulo(server_id, titulo)
+        if encontrado is None:
+            return None
+        datos = self._superponer_proyecto(server_id, encontrado[0], encontrado[1])
+        return (encontrado[0], datos) if datos is not None and datos.get("titulo") == titulo else None
+
+    async def crear_proyecto(self, server_id: str, doc_id: str, datos: dict):
+        try:
+            existente = await self.leer_proyecto(server_id, doc_id)
+        except Exception as e:
+            # Sin backend no se puede comprobar: se anota igual y el conflicto, si lo hay, se detecta al aplicar
+            logger.warning(f"Diario de escrituras: no se pudo comprobar si existe {doc_id} en {server_id}: {e}")
+            existente = None
+        if existente is not None:
+            raise DocumentoExistente(doc_id)
+        await self._anotar([(server_id, "proyecto", "crear", doc_id, dict(datos), True)])
+
+    async def actualizar_proyecto(self, server_id: str, doc_id: str, campos: dict):
+        await self._anotar([(server_id, "proyecto", "actualizar", doc_id, dict(campos), True)])
+
+    async def mover_proyecto(self, server_id: str, doc_id: str, nuevo_id: str, datos: dict):
+        try:
+            existente = await self.leer_proyecto(server_id, nuevo_id)
+        except Exception as e:
+            logger.warning(f"Diario de escrituras: no se pudo comprobar si existe {nuevo_id} en {server_id}: {e}")
+            existente = None
+        if existente is not None:
+            raise DocumentoExistente(nuevo_id)
+        await self._anotar([(server_id, "proyecto", "crear", nuevo_id, dict(datos), True),
+                            (server_id, "proyecto", "borrar", doc_id, None, True)])
+
+    # Operaciones masivas: directas al backend, después de aplicar lo pendiente
+    async def pagina_proyectos(self, server_id: str, despues_de: str = None, limite: int = 400, campos=None):
+        await self.vaciar()
+        return await self.backend.pagina_proyectos(server_id, despues_de, limite, campos)
+
+    async def escribir_lote(self, server_id: str, operaciones):
+        await self.vaciar()
+        await self.backend.escribir_lote(server_id, operaciones)
+
+    async def escuchar_proyectos(self, server_id: str, callback):
+        return await self.backend.escuchar_proyectos(server_id, callback)
+
+    async def listar_titulos(self, server_id: str):
+        await self.vaciar()
+        return await self.backend.listar_titulos(server_id)
+
+    async def leer_migracion(self, server_id: str, nombre: str):
+        return await self.backend.leer_migracion(server_id, nombre)
+
+    async def escribir_migracion(self, server_id: str, nombre: str, datos: dict, merge: bool = False):
+        await self.backend.escribir_migracion(server_id, nombre, datos, merge)
+
+    async def leer_metadato(self, nombre: str):
+        return await self.backend.leer_metadato(nombre)
+
+    async def escribir_metadato(self, nombre: str, datos: dict):
+        await self.backend.escribir_metadato(nombre, datos)
+
+    async def listar_servidores(self):
+        await self.vaciar()
+        return await self.backend.listar_servidores()
@@ -0,0 +1,198 @@
+import asyncio
+import time
+
+from utils_py.almacenamiento import BORRAR_CAMPO, Almacenamiento, DocumentoExistente
+from utils_py.firestore import proveedor_firestore
+from utils_py.metricas import latencia_firestore, registrar_firestore
+
+
+def _campos(campos: dict) -> dict:
+    """
+    Traduce BORRAR_CAMPO al DELETE_FIELD de Firestore (importado aquí para no cargar el SDK al arrancar).
+    """
+    if not any(valor is BORRAR_CAMPO for valor in campos.values()):
+        return campos
+    from google.cloud.firestore import DELETE_FIELD
+    return {clave: DELETE_FIELD if valor is BORRAR_CAMPO else valor for clave, valor in campos.items()}
+
+
+def _marca(doc):
+    return doc.update_time.timestamp() if getattr(doc, 'update_time', None) else time.time()
+
+
+class AlmacenamientoFirestore(Almacenamiento):
+    """
+    Backend sobre Firestore con las rutas de siempre:
+    `servidores/{id}/configugeneral/main`, `servidores/{id}/proyectos/{doc_id}`
+    y `servidores/{id}/migraciones/{nombre}`; los metadatos del bot, en `metadatos/{nombre}`.
+
+    El cliente se pide al proveedor en cada operación: la primera espera a que termine
+    la inicialización en segundo plano y las siguientes lo obtienen al instante.
+    """
+    nombre = "firestore"
+
+    async def _config(self, server_id):
+        db_async = await proveedor_firestore.cliente_async()
+        return db_async.collection(f'servidores/{server_id}/configugeneral').document('main')
+
+    async def _proyectos(self, server_id):
+        db_async = await proveedor_firestore.cliente_async()
+        return db_async.collection(f'servidores/{server_id}/proyectos')
+
+    async def _migraciones(self, server_id):
+        db_async = await proveedor_firestore.cliente_async()
+        return db_async.collection(f"servidores/{server_id}/migraciones")
+
+    def precalentar(self):
+        return proveedor_firestore.precalentar()
+
+    async def conectar(self):
+        await proveedor_firestore.cliente_async()
+
+    def estadisticas(self):
+        return dict(super().estadisticas(), **proveedor_firestore.estadisticas())
+
+    async def leer_config(self, server_id: str):
+        ref = await self._config(server_id)
+        with latencia_firestore.cronometrar(operacion="config_leer"):
+            doc = await ref.get()
+        registrar_firestore("config_leer", lecturas=1)
+        return doc.to_dict() if doc.exists else None
+
+    async def escribir_config(self, server_id: str, campos: dict, merge: bool = True):
+        ref = await self._config(server_id)
+        with latencia_firestore.cronometrar(operacion="config_establecer"):
+            await ref.set(_campos(campos), merge=merge)
+        registrar_firestore("config_establecer", escrituras=1)
+
+    async def actualizar_config(self, server_id: str, campos: dict):
+        ref = await self._config(server_id)
+        with latencia_firestore.cronometrar(operacion="config_actualizar"):
+            await ref.update(_campos(campos))
+        registrar_firestore("config_actualizar", escrituras=1)
+
+    async def leer_proyecto(self, server_id: str, doc_id: str):
+        coleccion = await self._proyectos(server_id)
+        with latencia_firestore.cronometrar(operacion="proyecto_leer"):
+            doc = await coleccion.document(doc_id).get()
+        registrar_firestore("proyecto_leer", lecturas=1)
+        return doc.to_dict() if doc.exists else None
+
+    async def leer_proyectos(self, server_id: str, doc_ids) -> dict:
+        coleccion = await self._proyectos(server_id)
+        refs = [coleccion.document(doc_id) for doc_id in doc_ids]
+        encontrados = {}
+        if not refs:
+            return encontrados
+        db_async = await proveedor_firestore.cliente_async()
+        with latencia_firestore.cronometrar(operacion="proyectos_leer_lote"):
+            async for doc in db_async.get_all(refs):
+                if doc.exists:
+                    encontrados[doc.id] = doc.to_dict()
+        registrar_firestore("proyectos_leer_lote", lecturas=len(refs))
+        return encontrados
+
+    async def buscar_proyecto_por_titulo(self, server_id: str, titulo: str):
+        coleccion = await self._proyectos(server_id)
+        with latencia_firestore.cronometrar(operacion="proyecto_buscar_titulo"):
+            docs = await coleccion.where('titulo', '==', titulo).limit(1).get()
+        registrar_firestore("proyecto_buscar_titulo", lecturas=max(1, len(docs)))
+        return (docs[0].id, docs[0].to_dict()) if docs else None
+
+    async def crear_proyecto(self, server_id: str, doc_id: str, datos: dict):
+        from google.api_core.exceptions import AlreadyExists, Conflict
+        coleccion = await self._proyectos(server_id)
+        try:
+            with latencia_firestore.cronometrar(operacion="proyecto_crear"):
+                await coleccion.document(doc_id).create(datos)
+        except (AlreadyExists, Conflict):
+            raise DocumentoExistente(doc_id)
+        registrar_firestore("proyecto_crear", escrituras=1)
+
+    async def actualizar_proyecto(self, server_id: str, doc_id: str, campos: dict):
+        coleccion = await self._proyectos(server_id)
+        with latencia_firestore.cronometrar(operacion="proyecto_actualizar"):
+            await coleccion.document(doc_id).update(_campos(campos))
+        registrar_firestore("proyecto_actualizar", escrituras=1)
+
+    async def pagina_proyectos(self, server_id: str, despues_de: str = None, limite: int = 400, campos=None):
+        consulta = await self._proyectos(server_id)
+        if campos is not None:
+            consulta = consulta.select(list(campos))
+        consulta = consulta.order_by('__name__').limit(limite)
+        if despues_de:
+            consulta = consulta.start_after({'__name__': despues_de})
+        with latencia_firestore.cronometrar(operacion="proyectos_pagina"):
+            pagina = await consulta.get()
+        registrar_firestore("proyectos_pagina", lecturas=max(1, len(pagina)))
+        return [(doc.id, doc.to_dict() or {}) for doc in pagina]
+
+    async def escribir_lote(self, server_id: str, operaciones):
+        if not operaciones:
+            return
+        from google.api_core.exceptions import AlreadyExists, Conflict
+        coleccion = await self._proyectos(server_id)
+        batch = (await proveedor_firestore.cliente_async()).batch()
+        for operacion, doc_id, datos in operaciones:
+            if operacion == "crear":
+                batch.create(coleccion.document(doc_id), datos)
+            elif operacion == "actualizar":
+                batch.update(coleccion.document(doc_id), _campos(datos))
+            elif operacion == "borrar":
+                batch.delete(coleccion.document(doc_id))
+            else:
+                raise ValueError(f"Operación de lote desconocida: {operacion}")
+        try:
+            with latencia_firestore.cronometrar(operacion="proyectos_lote"):
+                await batch.commit()
+        except (AlreadyExists, Conflict) as e:
+            raise DocumentoExistente(str(e))
+        registrar_firestore("proyectos_lote", escrituras=len(operaciones))
+
+    async def escuchar_proyectos(self, server_id: str, callback):
+        def al_cambiar(docs, cambios, _):
+            registrar_firestore("titulos_escuchar", lecturas=len(cambios))
+            callback([
+                (cambio.document.id,
+                 None if cambio.type.name == 'REMOVED' else (cambio.document.to_dict() or {}),
+                 _marca(cambio.document))
+                for cambio in cambios
+            ])
+
+        # Listener del cliente síncrono (el asíncrono no los admite); se ejecuta en un hilo de Firestore.
+        # La inicialización se espera sin bloquear y el alta se hace fuera del event loop.
+        await proveedor_firestore.cliente_async()
+        db = proveedor_firestore.cliente()
+        return await asyncio.to_thread(db.collection(f'servidores/{server_id}/proyectos').on_snapshot, al_cambiar)
+
+    async def listar_titulos(self, server_id: str):
+        titulos = []
+        coleccion = await self._proyectos(server_id)
+        async for doc in coleccion.select(['titulo']).stream():
+            titulos.append((doc.id, doc.to_dict() or {}, _marca(doc)))
+        registrar_firestore("titulos_cargar", lecturas=len(titulos))
+        return titulos
+
+    async def leer_migracion(self, server_id: str, nombre: str):
+        doc = await (await self._migraciones(server_id)).document(nombre).get()
+        registrar_firestore("migraciones", lecturas=1)
+        return doc.to_dict() if doc.exists else None
+
+    async def escribir_migracion(self, server_id: str, nombre: str, datos: dict, merge: bool = False):
+        await (await self._migraciones(server_id)).document(nombre).set(_campos(datos), merge=merge)
+        registrar_firestore("migraciones", escrituras=1)
+
+    async def listar_servidores(self):
+        db_async = await proveedor_firestore.cliente_async()
+        return [servidor_ref.id async for servidor_ref in db_async.collection("servidores").list_documents()]
+
+    async def leer_metadato(self, nombre: str):
+        db_async = await proveedor_firestore.cliente_async()
+        doc = await db_async.collection("metadatos").document(nombre).get()
+        registrar_firestore("metadatos", lecturas=1)
+        return doc.to_dict() if doc.exists else None
+
+    async def escribir_metadato(self, nombre: str, datos: dict):
+        db_async = await proveedor_firestore.cliente_async()
+        await db_async.collection("metadatos").document(nombre).set(datos)
+        registrar_firestore("metadatos", escrituras=1)
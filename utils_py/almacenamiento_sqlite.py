@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils_py.almacenamiento import BORRAR_CAMPO, Almacenamiento, DocumentoExistente, aplicar_campos
+from utils_py.indice_titulos import normalizar
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS configuracion (
+    server_id TEXT PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS proyectos (
+    server_id TEXT NOT NULL,
+    doc_id TEXT NOT NULL,
+    titulo TEXT,
+    titulo_normalizado TEXT,
+    datos TEXT NOT NULL,
+    actualizado REAL NOT NULL,
+    PRIMARY KEY (server_id, doc_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_proyectos_titulo ON proyectos (server_id, titulo_normalizado);
+CREATE TABLE IF NOT EXISTS migraciones (
+    server_id TEXT NOT NULL,
+    nombre TEXT NOT NULL,
+    datos TEXT NOT NULL,
+    PRIMARY KEY (server_id, nombre)
+);
+CREATE TABLE IF NOT EXISTS metadatos (
+    nombre TEXT PRIMARY KEY,
+    datos TEXT NOT NULL
+);
+"""
+
+
+def _sin_borrados(campos: dict) -> dict:
+    return {clave: valor for clave, valor in campos.items() if valor is not BORRAR_CAMPO}
+
+
+class _Escucha:
+    def __init__(self, oyentes, callback, lock):
+        self._oyentes = oyentes
+        self._callback = callback
+        self._lock = lock
+
+    def unsubscribe(self):
+        # El mismo lock que el alta y `_avisar`: la lista puede cambiar desde otro hilo
+        with self._lock:
+            if self._callback in self._oyentes:
+                self._oyentes.remove(self._callback)
+
+
+class AlmacenamientoSQLite(Almacenamiento):
+    """
+    Backend local en un archivo SQLite, para instalaciones pequeñas autoalojadas.
+
+    Usa WAL (las lecturas no esperan a las escrituras) e índices por servidor y por
+    título normalizado. Todas las consultas pasan por un único hilo dedicado, así el
+    event loop nunca se bloquea y la conexión no se comparte entre hilos a la vez.
+    Como todas las escrituras pasan por aquí, los listeners se avisan en el mismo proceso.
+    """
+    nombre = "sqlite"
+
+    def __init__(self, ruta: str):
+        self.ruta = ruta
+        self._hilo = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._oyentes = {}  # server_id -> [callback]
+        self._lock_oyentes = threading.Lock()
+        self._conexion = self._hilo.submit(self._conectar).result()
+        logger.info(f"Base de datos SQLite abierta en {ruta}")
+
+    def _conectar(self):
+        conexion = sqlite3.connect(self.ruta, isolation_level=None, check_same_thread=False)
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.executescript(ESQUEMA)
+        return conexion
+
+    async def _ejecutar(self, funcion, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._hilo, funcion, *args)
+
+    def _transaccion(self, funcion, *args):
+        # Se ejecuta en el hilo de SQLite: todo o nada
+        self._conexion.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = funcion(*args)
+        except BaseException:
+            self._conexion.execute("ROLLBACK")
+            raise
+        self._conexion.execute("COMMIT")
+        return resultado
+
+    def _avisar(self, server_id, cambios):
+        with self._lock_oyentes:
+            oyentes = list(self._oyentes.get(server_id, ()))
+        for callback in oyentes:
+            try:
+                callback(cambios)
+            except Exception as e:
+                logger.error(f"Error en un listener de proyectos de {server_id}: {e}")
+
+    # Configuración
+    def _leer_config(self, server_id):
+        fila = self._conexion.execute("SELECT datos FROM configuracion WHERE server_id = ?", (server_id,)).fetchone()
+        return json.loads(fila[0]) if fila else None
+
+    def _guardar_config(self, server_id, datos):
+        self._conexion.execute(
+            "INSERT INTO configuracion (server_id, datos) VALUES (?, ?) "
+            "ON CONFLICT(server_id) DO UPDATE SET datos = excluded.datos",
+            (server_id, json.dumps(datos, ensure_ascii=False)),
+        )
+
+    async def leer_config(self, server_id: str):
+        return await self._ejecutar(self._leer_config, server_id)
+
+    async def escribir_config(self, server_id: str, campos: dict, merge: bool = True):
+        def escribir():
+            actual = self._leer_config(server_id) if merge else None
+            self._guardar_config(server_id, aplicar_campos(actual, campos))
+        await self._ejecutar(self._transaccion, escribir)
+
+    async def actualizar_config(self, server_id: str, campos: dict):
+        def actualizar():
+            actual = self._leer_config(server_id)
+            if actual is None:
+                raise ValueError(f"No existe la configuración del servidor {server_id}.")
+            self._guardar_config(server_id, aplicar_campos(actual, campos))
+        await self._ejecutar(self._transaccion, actualizar)
+
+    # Proyectos
+    def _leer_proyectos(self, server_id, doc_ids):
+        encontrados = {}
+        doc_ids = list(doc_ids)
+        # SQLite admite un número limitado de parámetros por consulta
+        for inicio in range(0, len(doc_ids), 500):
+            parte = doc_ids[inicio:inicio + 500]
+            filas = self._conexion.execute(
+                f"SELECT doc_id, datos FROM proyectos WHERE server_id = ? AND doc_id IN ({','.join('?' * len(parte))})",
+                (server_id, *parte),
+            )
+            encontrados.update((doc_id, json.loads(datos)) for doc_id, datos in filas)
+        return encontrados
+
+    def _escribir_proyecto(self, server_id, doc_id, datos, crear):
+        titulo = datos.get("titulo")
+        try:
+            self._conexion.execute(
+                ("INSERT INTO proyectos" if crear else "INSERT OR REPLACE INTO proyectos")
+                + " (server_id, doc_id, titulo, titulo_normalizado, datos, actualizado) VALUES (?, ?, ?, ?, ?, ?)",
+                (server_id, doc_id, titulo, normalizar(titulo) if titulo else None,
+                 json.dumps(datos, ensure_ascii=False), time.time()),
+            )
+        except sqlite3.IntegrityError:
+            raise DocumentoExistente(doc_id)
+
+    def _aplicar_lote(self, server_id, operaciones):
+        cambios = []
+        for operacion, doc_id, datos in operaciones:
+            if operacion == "borrar":
+                self._conexion.execute("DELETE FROM proyectos WHERE server_id = ? AND doc_id = ?", (server_id, doc_id))
+                cambios.append((doc_id, None, time.time()))
+                continue
+            if operacion == "crear":
+                datos = _sin_borrados(datos)
+                self._escribir_proyecto(server_id, doc_id, datos, crear=True)
+            elif operacion == "actualizar":
+                actual = self._leer_proyectos(server_id, [doc_id]).get(doc_id)
+                if actual is None:
+                    raise ValueError(f"No existe el proyecto {doc_id}.")
+                datos = aplicar_campos(actual, datos)
+                self._escribir_proyecto(server_id, doc_id, datos, crear=False)
+            else:
+                raise ValueError(f"Operación de lote desconocida: {operacion}")
+            cambios.append((doc_id, datos, time.time()))
+        return cambios
+
+    async def _lote(self, server_id, operaciones):
+        cambios = await self._ejecutar(self._transaccion, self._aplicar_lote, server_id, operaciones)
+        if cambios:
+            self._avisar(server_id, cambios)
+
+    async def leer_proyecto(self, server_id: str, doc_id: str):
+        return (await self._ejecutar(self._leer_proyectos, server_id, [doc_id])).get(doc_id)
+
+    async def leer_proyectos(self, server_id: str, doc_ids) -> dict:
+        return await self._ejecutar(self._leer_proyectos, server_id, doc_ids)
+
+    async def buscar_proyecto_por_titulo(self, server_id: str, titulo: str):
+        def buscar():
+            # Índice (server_id, titulo_normalizado); se confirma el título exacto si hay varios.
+            # Los títulos sin letras latinas ni dígitos se normalizan a "": ahí solo vale el exacto
+            normalizado = normalizar(titulo)
+            filas = self._conexion.execute(
+                "SELECT doc_id, titulo, datos FROM proyectos WHERE server_id = ? AND titulo_normalizado = ?",
+                (server_id, normalizado),
+            ).fetchall()
+            fila = next((fila for fila in filas if fila[1] == titulo), filas[0] if filas and normalizado else None)
+            return (fila[0], json.loads(fila[2])) if fila else None
+        return await self._ejecutar(buscar)
+
+    async def crear_proyecto(self, server_id: str, doc_id: str, datos: dict):
+        await self._lote(server_id, [("crear", doc_id, datos)])
+
+    async def actualizar_proyecto(self, server_id: str, doc_id: str, campos: dict):
+        await self._lote(server_id, [("actualizar", doc_id, campos)])
+
+    async def escribir_lote(self, server_id: str, operaciones):
+        await self._lote(server_id, list(operaciones))
+
+    async def pagina_proyectos(self, server_id: str, despues_de: str = None, limite: int = 400, campos=None):
+        def pagina():
+            filas = self._conexion.execute(
+                "SELECT doc_id, datos FROM proyectos WHERE server_id = ? AND doc_id > ? ORDER BY doc_id LIMIT ?",
+                (server_id, despues_de or "", limite),
+            )
+            resultado = []
+            for doc_id, datos in filas:
+                datos = json.loads(datos)
+                if campos is not None:
+                    datos = {campo: datos[campo] for campo in campos if campo in datos}
+                resultado.append((doc_id, datos))
+            return resultado
+        return await self._ejecutar(pagina)
+
+    async def escuchar_proyectos(self, server_id: str, callback):
+        def registrar():
+            # En el hilo de SQLite: el estado inicial y el alta del listener no se cruzan con una escritura
+            filas = self._conexion.execute(
+                "SELECT doc_id, titulo, actualizado FROM proyectos WHERE server_id = ?", (server_id,)
+            ).fetchall()
+            with self._lock_oyentes:
+                oyentes = self._oyentes.setdefault(server_id, [])
+                oyentes.append(callback)
+            callback([(doc_id, {"titulo": titulo}, actualizado) for doc_id, titulo, actualizado in filas])
+            return _Escucha(oyentes, callback, self._lock_oyentes)
+        # Se espera sin bloquear el event loop aunque el hilo esté ocupado con una transacción larga
+        return await self._ejecutar(registrar)
+
+    async def listar_titulos(self, server_id: str):
+        def listar():
+            filas = self._conexion.execute(
+                "SELECT doc_id, titulo, actualizado FROM proyectos WHERE server_id = ?", (server_id,)
+            )
+            return [(doc_id, {"titulo": titulo}, actualizado) for doc_id, titulo, actualizado in filas]
+        return await self._ejecutar(listar)
+
+    # Migraciones
+    async def leer_migracion(self, server_id: str, nombre: str):
+        def leer():
+            fila = self._conexion.execute(
+                "SELECT datos FROM migraciones WHERE server_id = ? AND nombre = ?", (server_id, nombre)
+            ).fetchone()
+            return json.loads(fila[0]) if fila else None
+        return await self._ejecutar(leer)
+
+    async def escribir_migracion(self, server_id: str, nombre: str, datos: dict, merge: bool = False):
+        def escribir():
+            actual = None
+            if merge:
+                fila = self._conexion.execute(
+                    "SELECT datos FROM migraciones WHERE server_id = ? AND nombre = ?", (server_id, nombre)
+                ).fetchone()
+                actual = json.loads(fila[0]) if fila else None
+            self._conexion.execute(
+                "INSERT OR REPLACE INTO migraciones (server_id, nombre, datos) VALUES (?, ?, ?)",
+                (server_id, nombre, json.dumps(aplicar_campos(actual, datos), ensure_ascii=False)),
+            )
+        await self._ejecutar(self._transaccion, escribir)
+
+    async def leer_metadato(self, nombre: str):
+        def leer():
+            fila = self._conexion.execute("SELECT datos FROM metadatos WHERE nombre = ?", (nombre,)).fetchone()
+            return json.loads(fila[0]) if fila else None
+        return await self._ejecutar(leer)
+
+    async def escribir_metadato(self, nombre: str, datos: dict):
+        def escribir():
+            self._conexion.execute("INSERT OR REPLACE INTO metadatos (nombre, datos) VALUES (?, ?)",
+                                   (nombre, json.dumps(datos, ensure_ascii=False)))
+        await self._ejecutar(self._transaccion, escribir)
+
+    async def listar_servidores(self):
+        def listar():
+            filas = self._conexion.execute(
+                "SELECT server_id FROM configuracion UNION SELECT DISTINCT server_id FROM proyectos"
+            )
+            return [fila[0] for fila in filas]
+        return await self._ejecutar(listar)
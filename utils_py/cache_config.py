@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import os
+import time
+
+from utils_py.almacenamiento import aplicar_campos, almacenamiento
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Tiempo de vida de la configuración cacheada (segundos)
+TTL_CONFIG = float(os.getenv("CACHE_CONFIG_TTL", "300"))
+# Locks de lectura compartidos por hash del servidor (memoria fija aunque el bot esté en miles de servidores)
+NUM_LOCKS_LECTURA = 64
+
+
+class CacheConfig:
+    """
+    Caché de lectura y escritura de la configuración de cada servidor.
+
+    Las lecturas pasan por la caché (con TTL) y las escrituras se aplican en el almacenamiento
+    y luego sobre la copia cacheada, así que no hace falta volver a leer la configuración.
+    """
+    def __init__(self, ttl=TTL_CONFIG):
+        self.ttl = ttl
+        self._entradas = {}  # server_id -> (config o None si no existe, expira)
+        self._locks = [asyncio.Lock() for _ in range(NUM_LOCKS_LECTURA)]
+        self._oyentes = []
+
+    def al_cambiar(self, funcion):
+        """
+        Registra `funcion(server_id)`, que se llama cada vez que cambia (o se recarga) la configuración cacheada.
+
+        `server_id` es None cuando se invalida la caché completa.
+        """
+        self._oyentes.append(funcion)
+
+    def _notificar(self, server_id):
+        for funcion in self._oyentes:
+            funcion(server_id)
+
+    async def obtener(self, server_id: str):
+        """
+        Devuelve una copia de la configuración del servidor, o None si no existe.
+        """
+        entrada = self._entradas.get(server_id)
+        if entrada is not None and entrada[1] > time.monotonic():
+            return dict(entrada[0]) if entrada[0] is not None else None
+
+        # Una sola lectura por servidor aunque lleguen varias peticiones a la vez
+        async with self._locks[hash(server_id) % len(self._locks)]:
+            entrada = self._entradas.get(server_id)
+            if entrada is None or entrada[1] <= time.monotonic():
+                logger.info(f"Leyendo configuración del servidor {server_id} ({almacenamiento.nombre})")
+                config = await almacenamiento.leer_config(server_id)
+                entrada = (config, time.monotonic() + self.ttl)
+                self._entradas[server_id] = entrada
+                self._notificar(server_id)
+        return dict(entrada[0]) if entrada[0] is not None else None
+
+    async def establecer(self, server_id: str, campos: dict, merge: bool = True):
+        """
+        Escribe la configuración (fusionando por defecto) y actualiza la caché.
+        """
+        await almacenamiento.escribir_config(server_id, campos, merge=merge)
+        entrada = self._entradas.get(server_id)
+        if not merge or (entrada is not None and entrada[0] is None):
+            # Sin merge, o sobre un documento inexistente, el documento queda igual a `campos`
+            config = aplicar_campos(None, campos)
+            self._entradas[server_id] = (config, time.monotonic() + self.ttl)
+            self._notificar(server_id)
+        else:
+            self._aplicar(server_id, campos)
+
+    async def actualizar(self, server_id: str, campos: dict):
+        """
+        Actualiza una configuración existente (admite BORRAR_CAMPO) y actualiza la caché.
+        """
+        await almacenamiento.actualizar_config(server_id, campos)
+        self._aplicar(server_id, campos)
+
+    def _aplicar(self, server_id, campos):
+        """
+        Aplica los cambios ya escritos sobre la copia cacheada, si la hay.
+        """
+        entrada = self._entradas.get(server_id)
+        if entrada is None or entrada[0] is None:
+            # No conocemos el documento completo: que la próxima lectura lo traiga
+            self._entradas.pop(server_id, None)
+            self._notificar(server_id)
+            return
+        config = aplicar_campos(entrada[0], campos)
+        self._entradas[server_id] = (config, time.monotonic() + self.ttl)
+        self._notificar(server_id)
+
+    def invalidar(self, server_id: str = None):
+        """
+        Descarta la configuración cacheada de un servidor (o de todos).
+        """
+        if server_id is None:
+            self._entradas.clear()
+        else:
+            self._entradas.pop(server_id, None)
+        self._notificar(server_id)
+
+
+# Instancia global de la caché de configuración
+cache_config = CacheConfig()
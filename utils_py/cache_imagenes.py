@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils_py.metricas import consultas_portadas
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Límites y ubicación de la caché de portadas (configurables por variables de entorno)
+MAX_BYTES_MEMORIA = int(os.getenv("CACHE_PORTADAS_MAX_MEMORIA", str(64 * 1024 * 1024)))
+MAX_BYTES_DISCO = int(os.getenv("CACHE_PORTADAS_MAX_DISCO", str(512 * 1024 * 1024)))
+DIRECTORIO = os.getenv("CACHE_PORTADAS_DIR", ".cache_portadas")
+FRESCURA_POR_DEFECTO = float(os.getenv("CACHE_PORTADAS_FRESCURA", "600"))
+# Cada cuánto se vuelve a medir el disco aunque el total llevado no llegue al límite
+# (otros clusters pueden escribir en el mismo directorio)
+INTERVALO_MEDICION_DISCO = 300.0
+# Al recortar se baja hasta esta fracción del límite, para no volver a recorrer el disco en cada escritura
+FRACCION_TRAS_RECORTE = 0.9
+
+
+def _clave_url(url: str) -> str:
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def frescura_desde_cabeceras(cabeceras) -> float:
+    """
+    Segundos que la respuesta puede reutilizarse sin revalidar, según Cache-Control.
+
+    Devuelve None si la respuesta no debe guardarse (`no-store`).
+    """
+    cache_control = (cabeceras.get('Cache-Control') or '').lower()
+    directivas = [directiva.strip() for directiva in cache_control.split(',') if directiva.strip()]
+    if 'no-store' in directivas:
+        return None
+    if 'no-cache' in directivas:
+        return 0.0
+    for directiva in directivas:
+        if directiva.startswith('max-age='):
+            try:
+                return float(directiva.split('=', 1)[1])
+            except ValueError:
+                break
+    return FRESCURA_POR_DEFECTO
+
+
+class EntradaPortada:
+    """
+    Portada cacheada: bytes, hash del contenido y datos para revalidar con el origen.
+    """
+    def __init__(self, url, datos, extension, content_type, etag=None, last_modified=None,
+                 frescura=FRESCURA_POR_DEFECTO, guardada=None, hash_contenido=None):
+        self.url = url
+        self.datos = datos
+        self.extension = extension
+        self.content_type = content_type
+        self.etag = etag
+        self.last_modified = last_modified
+        self.frescura = frescura
+        self.guardada = guardada if guardada is not None else time.time()
+        self.hash = hash_contenido or hashlib.sha256(datos).hexdigest()
+
+    def fresca(self) -> bool:
+        return time.time() - self.guardada < self.frescura
+
+    def cabeceras_condicionales(self) -> dict:
+        """
+        Cabeceras para pedir la imagen solo si cambió (respuesta 304 si no).
+        """
+        cabeceras = {}
+        if self.etag:
+            cabeceras['If-None-Match'] = self.etag
+        if self.last_modified:
+            cabeceras['If-Modified-Since'] = self.last_modified
+        return cabeceras
+
+    def metadatos(self) -> dict:
+        return {
+            "url": self.url,
+            "hash": self.hash,
+            "extension": self.extension,
+            "content_type": self.content_type,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "frescura": self.frescura,
+            "guardada": self.guardada,
+        }
+
+
+class CacheImagenes:
+    """
+    Caché LRU de portadas en dos niveles: memoria y disco.
+
+    En disco el contenido se guarda direccionado por su hash (`datos/<sha256>`), así que
+    varias URLs con la misma imagen comparten archivo; cada URL tiene su ficha en
+    `urls/<sha256(url)>.json` con el ETag/Last-Modified para revalidar.
+    """
+    def __init__(self, max_bytes_memoria=MAX_BYTES_MEMORIA, max_bytes_disco=MAX_BYTES_DISCO,
+                 directorio=DIRECTORIO):
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self.directorio = directorio
+        self._memoria = OrderedDict()  # url -> EntradaPortada
+        self._bytes_memoria = 0
+        # Bytes en disco (contenidos y fichas) según la última medición más lo escrito desde entonces
+        self._bytes_disco = 0
+        self._proxima_medicion = 0.0  # La primera escritura mide el disco
+        self._lock_disco = threading.Lock()
+        self.contadores = {
+            "aciertos_memoria": 0,
+            "aciertos_disco": 0,
+            "revalidadas": 0,
+            "fallos": 0,
+        }
+
+    def _contar(self, resultado):
+        self.contadores[resultado] += 1
+        consultas_portadas.inc(resultado=resultado)
+
+    async def buscar(self, url: str):
+        """
+        Busca la portada de una URL en memoria y luego en disco.
+        """
+        entrada = self._memoria.get(url)
+        if entrada is not None:
+            self._memoria.move_to_end(url)
+            self._contar("aciertos_memoria")
+            return entrada
+
+        entrada = await asyncio.to_thread(self._leer_disco, url)
+        if entrada is not None:
+            self._contar("aciertos_disco")
+            self._guardar_memoria(entrada)
+            return entrada
+
+        self._contar("fallos")
+        return None
+
+    async def guardar(self, entrada: EntradaPortada):
+        """
+        Guarda (o refresca) una portada en ambos niveles.
+        """
+        self._guardar_memoria(entrada)
+        try:
+            await asyncio.to_thread(self._escribir_disco, entrada)
+        except OSError as e:
+            logger.error(f"No se pudo guardar la portada en disco: {e}")
+
+    async def marcar_revalidada(self, entrada: EntradaPortada, frescura: float):
+        """
+        El origen respondió 304: la copia sigue siendo válida por otro periodo.
+        """
+        self._contar("revalidadas")
+        entrada.guardada = time.time()
+        entrada.frescura = frescura
+        await self.guardar(entrada)
+
+    async def eliminar(self, url: str):
+        """
+        Olvida la portada de una URL (p. ej. el origen pasó a responder `no-store`).
+
+        Solo se borra la ficha: el contenido puede compartirlo otra URL y, si no, lo expulsa el recorte.
+        """
+        anterior = self._memoria.pop(url, None)
+        if anterior is not None:
+            self._bytes_memoria -= len(anterior.datos)
+        await asyncio.to_thread(self._borrar_ficha, url)
+
+    def estadisticas(self) -> dict:
+        return dict(
+            self.contadores,
+            entradas_memoria=len(self._memoria),
+            bytes_memoria=self._bytes_memoria,
+            bytes_disco=self._bytes_disco,
+        )
+
+    def _guardar_memoria(self, entrada):
+        anterior = self._memoria.pop(entrada.url, None)
+        if anterior is not None:
+            self._bytes_memoria -= len(anterior.datos)
+        if len(entrada.datos) > self.max_bytes_memoria:
+            return
+        self._memoria[entrada.url] = entrada
+        self._bytes_memoria += len(entrada.datos)
+        while self._bytes_memoria > self.max_bytes_memoria:
+            _, expulsada = self._memoria.popitem(last=False)
+            self._bytes_memoria -= len(expulsada.datos)
+
+    # Operaciones de disco (se ejecutan en un hilo aparte)
+
+    def _rutas(self, url=None, hash_contenido=None):
+        ruta_ficha = os.path.join(self.directorio, 'urls', f"{_clave_url(url)}.json") if url else None
+        ruta_datos = os.path.join(self.directorio, 'datos', hash_contenido) if hash_contenido else None
+        return ruta_ficha, ruta_datos
+
+    def _leer_disco(self, url):
+        ruta_ficha, _ = self._rutas(url=url)
+        try:
+            with open(ruta_ficha, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            _, ruta_datos = self._rutas(hash_contenido=meta["hash"])
+            with open(ruta_datos, 'rb') as f:
+                datos = f.read()
+            # Marcar como usados recientemente para la expulsión LRU
+            os.utime(ruta_datos)
+            os.utime(ruta_ficha)
+        except (OSError, KeyError):
+            # El contenido fue expulsado: la ficha ya no sirve
+            try:
+                os.remove(ruta_ficha)
+            except OSError:
+                pass
+            return None
+        return EntradaPortada(
+            url, datos, meta["extension"], meta["content_type"], meta.get("etag"),
+            meta.get("last_modified"), meta.get("frescura", FRESCURA_POR_DEFECTO),
+            meta.get("guardada"), meta["hash"],
+        )
+
+    def _borrar_ficha(self, url):
+        ruta_ficha, _ = self._rutas(url=url)
+        try:
+            tamano = os.path.getsize(ruta_ficha)
+            os.remove(ruta_ficha)
+        except OSError:
+            return
+        with self._lock_disco:
+            self._bytes_disco -= tamano
+
+    def _escribir_disco(self, entrada):
+        ruta_ficha, ruta_datos = self._rutas(entrada.url, entrada.hash)
+        os.makedirs(os.path.dirname(ruta_ficha), exist_ok=True)
+        os.makedirs(os.path.dirname(ruta_datos), exist_ok=True)
+
+        nuevos = 0
+        if os.path.exists(ruta_datos):
+            os.utime(ruta_datos)
+        else:
+            temporal = f"{ruta_datos}.{os.getpid()}.tmp"
+            with open(temporal, 'wb') as f:
+                f.write(entrada.datos)
+            os.replace(temporal, ruta_datos)
+            nuevos = len(entrada.datos)
+
+        ficha = json.dumps(entrada.metadatos())
+        if not os.path.exists(ruta_ficha):
+            nuevos += len(ficha.encode('utf-8'))
+        temporal = f"{ruta_ficha}.{os.getpid()}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(ficha)
+        os.replace(temporal, ruta_ficha)
+
+        with self._lock_disco:
+            self._bytes_disco += nuevos
+            # Recorrer la carpeta es O(n): solo cuando el total llevado supera el límite o toca medir
+            if self._bytes_disco > self.max_bytes_disco or time.monotonic() >= self._proxima_medicion:
+                self._recortar_disco()
+
+    def _recortar_disco(self):
+        """
+        Mide el disco y, si supera el límite, borra los contenidos y fichas usados hace más
+        tiempo hasta bajar a FRACCION_TRAS_RECORTE del límite.
+
+        Las fichas cuentan y se expulsan igual que los contenidos, así que las que apuntan a un
+        contenido ya borrado no se acumulan aunque nadie vuelva a leerlas. Los `.tmp` son
+        escrituras en curso (quizá de otro cluster) y no se tocan.
+        """
+        archivos = []
+        total = 0
+        for subcarpeta in ('datos', 'urls'):
+            carpeta = os.path.join(self.directorio, subcarpeta)
+            try:
+                nombres = os.listdir(carpeta)
+            except FileNotFoundError:
+                continue
+            for nombre in nombres:
+                if nombre.endswith('.tmp'):
+                    continue
+                ruta = os.path.join(carpeta, nombre)
+                try:
+                    estado = os.stat(ruta)
+                except OSError:
+                    continue
+                archivos.append((estado.st_mtime, estado.st_size, ruta))
+                total += estado.st_size
+        self._proxima_medicion = time.monotonic() + INTERVALO_MEDICION_DISCO
+        self._bytes_disco = total
+        if total <= self.max_bytes_disco:
+            return
+
+        objetivo = self.max_bytes_disco * FRACCION_TRAS_RECORTE
+        for _, tamano, ruta in sorted(archivos):
+            if total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+            except OSError:
+                pass
+        self._bytes_disco = total
+
+
+# Instancia global de la caché de portadas
+cache_imagenes = CacheImagenes()
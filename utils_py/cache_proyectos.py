@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from utils_py.almacenamiento import almacenamiento
+from utils_py.indice_titulos import IndiceTitulos
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Límites de la caché (configurables por variables de entorno)
+MAX_SERVIDORES = int(os.getenv("CACHE_TITULOS_MAX_SERVIDORES", "200"))
+MAX_TITULOS_POR_SERVIDOR = int(os.getenv("CACHE_TITULOS_MAX_POR_SERVIDOR", "10000"))
+SEGUNDOS_INACTIVIDAD = float(os.getenv("CACHE_TITULOS_INACTIVIDAD", "1800"))
+# Espera máxima por los títulos de un servidor sin cargar; el autocompletado tiene 3 s para responder,
+# así que después se devuelve lo que haya (quizá nada) y la carga sigue en segundo plano
+ESPERA_SNAPSHOT_INICIAL = min(float(os.getenv("CACHE_TITULOS_ESPERA_INICIAL", "1.5")), 2.0)
+# Cada cuánto se revisan, como mucho, los servidores inactivos al buscar
+INTERVALO_PURGA = 60.0
+
+
+class _EntradaServidor:
+    """
+    Índice de títulos de un servidor junto con su listener de cambios.
+    """
+    def __init__(self):
+        self.indice = IndiceTitulos()
+        self.ultimo_acceso = time.monotonic()
+        self.lista = threading.Event()
+        self.escucha = None
+        self.carga = None  # Tarea que suscribe el listener (o lee los títulos una vez)
+        self._bucle = asyncio.get_running_loop()
+        self._lista_async = asyncio.Event()
+
+    def marcar_lista(self):
+        """
+        El snapshot inicial llegó (puede llamarse desde el hilo del listener).
+        """
+        if self.lista.is_set():
+            return
+        self.lista.set()
+        try:
+            self._bucle.call_soon_threadsafe(self._lista_async.set)
+        except RuntimeError:
+            pass  # Event loop ya cerrado
+
+    async def esperar_lista(self, espera: float):
+        """
+        Espera el snapshot inicial hasta `espera` segundos o hasta que falle la carga.
+        """
+        aviso = asyncio.ensure_future(self._lista_async.wait())
+        try:
+            await asyncio.wait({aviso, self.carga}, timeout=espera, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            aviso.cancel()
+
+
+class CacheTitulos:
+    """
+    Caché en memoria de los títulos de proyectos por servidor.
+
+    Se llena con un listener del almacenamiento (`escuchar_proyectos`) que también
+    la mantiene al día, y los modales la actualizan directamente tras cada escritura.
+    """
+    def __init__(self, max_servidores=MAX_SERVIDORES, max_titulos=MAX_TITULOS_POR_SERVIDOR,
+                 inactividad=SEGUNDOS_INACTIVIDAD):
+        self.max_servidores = max_servidores
+        self.max_titulos = max_titulos
+        self.inactividad = inactividad
+        self._servidores = OrderedDict()
+        self._lock = threading.Lock()
+        self._ultima_purga = time.monotonic()
+
+    async def buscar(self, server_id: str, consulta: str, limite: int = 25):
+        """
+        Busca títulos del servidor por relevancia, cargándolos si no están en caché.
+
+        Si la carga no termina en ESPERA_SNAPSHOT_INICIAL, devuelve los títulos recibidos hasta entonces.
+        """
+        inicio = time.monotonic()
+        with self._lock:
+            entrada = self._servidores.get(server_id)
+            if entrada is not None:
+                entrada.ultimo_acceso = time.monotonic()
+                self._servidores.move_to_end(server_id)
+        if entrada is None:
+            entrada = self._cargar(server_id)
+        elif time.monotonic() - self._ultima_purga > INTERVALO_PURGA:
+            # Expulsar también los inactivos aunque no se cargue ningún servidor nuevo
+            self._purgar()
+
+        # Si el snapshot inicial aún no llegó, esperar lo que quede del plazo
+        restante = ESPERA_SNAPSHOT_INICIAL - (time.monotonic() - inicio)
+        if not entrada.lista.is_set() and restante > 0:
+            await entrada.esperar_lista(restante)
+        if entrada.carga.done() and not entrada.carga.cancelled() and entrada.carga.exception() is not None:
+            raise entrada.carga.exception()
+
+        with self._lock:
+            return entrada.indice.buscar(consulta, limite)
+
+    def _cargar(self, server_id: str):
+        """
+        Crea la entrada del servidor y empieza a suscribirse a los cambios de su colección.
+        """
+        entrada = _EntradaServidor()
+        with self._lock:
+            existente = self._servidores.get(server_id)
+            if existente is not None:
+                return existente
+            self._servidores[server_id] = entrada
+        self._purgar()
+        entrada.carga = asyncio.create_task(self._suscribir(server_id, entrada))
+        # El error se consulta en `buscar`; si nadie espera ya la carga, que no quede como excepción sin leer
+        entrada.carga.add_done_callback(lambda tarea: tarea.cancelled() or tarea.exception())
+        return entrada
+
+    async def _suscribir(self, server_id: str, entrada):
+        try:
+            entrada.escucha = await almacenamiento.escuchar_proyectos(
+                server_id, lambda cambios: self._aplicar_cambios(server_id, entrada, cambios)
+            )
+            logger.info(f"Listener de títulos iniciado para el servidor {server_id}")
+            with self._lock:
+                expulsada = self._servidores.get(server_id) is not entrada
+            if expulsada:
+                # Se purgó mientras se suscribía: nadie cancelaría este listener
+                entrada.escucha.unsubscribe()
+        except Exception as e:
+            # Sin listener: carga única solo del campo 'titulo'
+            logger.error(f"No se pudo iniciar el listener de títulos para {server_id}: {e}")
+            try:
+                titulos = await almacenamiento.listar_titulos(server_id)
+            except Exception:
+                # Sin datos: no dejar en caché una entrada vacía que haría esperar a cada búsqueda
+                with self._lock:
+                    if self._servidores.get(server_id) is entrada:
+                        del self._servidores[server_id]
+                raise
+            with self._lock:
+                for doc_id, datos, marca in titulos:
+                    self._guardar(entrada, doc_id, datos, marca)
+            entrada.marcar_lista()
+
+    def _aplicar_cambios(self, server_id, entrada, cambios):
+        """
+        Callback del listener (puede ejecutarse en otro hilo, según el backend).
+        """
+        with self._lock:
+            for doc_id, datos, marca in cambios:
+                if datos is None:
+                    entrada.indice.eliminar(doc_id)
+                else:
+                    self._guardar(entrada, doc_id, datos, marca)
+        entrada.marcar_lista()
+        logger.debug(f"Caché de títulos actualizada para {server_id}: {len(cambios)} cambios")
+
+    def _guardar(self, entrada, doc_id, datos, marca):
+        """
+        Guarda un proyecto en la entrada respetando el límite de títulos.
+        """
+        titulo = datos.get('titulo')
+        if not titulo:
+            return
+        entrada.indice.agregar(doc_id, titulo, marca)
+        if len(entrada.indice) > self.max_titulos:
+            # Descartar el título modificado hace más tiempo
+            entrada.indice.eliminar(entrada.indice.mas_antiguo())
+
+    def registrar(self, server_id: str, doc_id: str, titulo: str):
+        """
+        Escritura directa tras agregar o renombrar un proyecto.
+        """
+        with self._lock:
+            entrada = self._servidores.get(server_id)
+            if entrada is not None:
+                self._guardar(entrada, doc_id, {"titulo": titulo}, time.time())
+
+    def eliminar(self, server_id: str, doc_id: str):
+        """
+        Quita un proyecto de la caché del servidor.
+        """
+        with self._lock:
+            entrada = self._servidores.get(server_id)
+            if entrada is not None:
+                entrada.indice.eliminar(doc_id)
+
+    def _purgar(self):
+        """
+        Expulsa servidores inactivos y, si hace falta, los menos usados.
+        """
+        ahora = time.monotonic()
+        self._ultima_purga = ahora
+        expulsados = []
+        with self._lock:
+            for server_id, entrada in list(self._servidores.items()):
+                if ahora - entrada.ultimo_acceso > self.inactividad:
+                    expulsados.append(self._servidores.pop(server_id))
+            while len(self._servidores) > self.max_servidores:
+                _, entrada = self._servidores.popitem(last=False)
+                expulsados.append(entrada)
+
+        for entrada in expulsados:
+            if entrada.escucha is not None:
+                try:
+                    entrada.escucha.unsubscribe()
+                except Exception as e:
+                    logger.error(f"Error al cancelar listener de títulos: {e}")
+        if expulsados:
+            logger.info(f"Caché de títulos: {len(expulsados)} servidores expulsados")
+
+
+# Instancia global de la caché de títulos
+cache_titulos = CacheTitulos()
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import math
+import os
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Procesos (clusters) entre los que se reparten los shards; 1 = un solo proceso
+CLUSTERS = int(os.getenv("CLUSTERS", "1"))
+# Total de shards; vacío = el recomendado por Discord
+SHARDS = int(os.getenv("SHARDS")) if os.getenv("SHARDS") else None
+# Variables que el supervisor asigna a cada proceso hijo
+CLUSTER_ID = int(os.getenv("CLUSTER_ID", "0"))
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard.strip()] or None
+
+# Espera antes de reiniciar un cluster caído (se duplica en cada caída seguida, hasta el máximo)
+ESPERA_REINICIO = 5.0
+ESPERA_REINICIO_MAX = 300.0
+# Discord permite un IDENTIFY cada 5 s por bucket de concurrencia
+SEGUNDOS_POR_IDENTIFY = 5.5
+# Un cluster que termina antes de este tiempo no llegó a arrancar (p. ej. configuración inválida);
+# tras varias salidas así seguidas se deja de reiniciar
+SEGUNDOS_SALIDA_INMEDIATA = 60.0
+MAX_SALIDAS_INMEDIATAS = 5
+
+
+def es_supervisor() -> bool:
+    """
+    True en el proceso que lanza los clusters (hay varios y este no es uno de ellos).
+    """
+    return CLUSTERS > 1 and "CLUSTER_ID" not in os.environ
+
+
+def repartir_shards(total: int, clusters: int):
+    """
+    Reparte los shards 0..total-1 en `clusters` rangos contiguos de tamaño parecido.
+    """
+    clusters = max(1, min(clusters, total))
+    tamano, resto = divmod(total, clusters)
+    rangos, inicio = [], 0
+    for indice in range(clusters):
+        fin = inicio + tamano + (1 if indice < resto else 0)
+        rangos.append(list(range(inicio, fin)))
+        inicio = fin
+    return rangos
+
+
+def opciones_bot() -> dict:
+    """
+    Argumentos de `AutoShardedBot` para este proceso.
+
+    En un cluster, sus shards y el total; en un solo proceso, el total configurado
+    (o ninguno, para que discord.py use el recomendado).
+    """
+    if SHARD_IDS is not None:
+        return {"shard_ids": SHARD_IDS, "shard_count": SHARDS}
+    return {"shard_count": SHARDS}
+
+
+def estado_shards(bot):
+    """
+    Latencia, estado y número de servidores de cada shard de este proceso.
+    """
+    servidores = Counter(guild.shard_id for guild in bot.guilds)
+    estado = []
+    for shard_id, shard in sorted(bot.shards.items()):
+        latencia = shard.latency
+        estado.append({
+            "shard": shard_id,
+            "latencia_ms": round(latencia * 1000, 1) if latencia == latencia else None,  # NaN antes del primer latido
+            "conectado": not shard.is_closed(),
+            "servidores": servidores.get(shard_id, 0),
+        })
+    return estado
+
+
+async def _datos_gateway(token: str) -> dict:
+    async with aiohttp.ClientSession() as sesion:
+        async with sesion.get("https://discord.com/api/v10/gateway/bot",
+                              headers={"Authorization": f"Bot {token}"}) as respuesta:
+            respuesta.raise_for_status()
+            return await respuesta.json()
+
+
+def ejecutar_supervisor(script: str, token: str):
+    """
+    Lanza un proceso por cluster con su rango de shards y los reinicia si se caen.
+
+    Cada proceso tiene sus propias cachés, cola de publicaciones y endpoint de métricas
+    (`METRICAS_PUERTO` + número de cluster). Los arranques se escalonan para respetar
+    el límite de IDENTIFY de Discord.
+    """
+    total, concurrencia = SHARDS, 1
+    try:
+        datos = asyncio.run(_datos_gateway(token))
+        total = total or datos["shards"]
+        concurrencia = datos.get("session_start_limit", {}).get("max_concurrency", 1)
+    except Exception as e:
+        if total is None:
+            raise RuntimeError(f"No se pudo obtener el número de shards recomendado; configura SHARDS: {e}")
+        logger.warning(f"No se pudo consultar el gateway de Discord, se usan SHARDS={total}: {e}")
+
+    rangos = repartir_shards(total, CLUSTERS)
+    logger.info(f"Supervisor: {total} shards en {len(rangos)} clusters: {rangos}")
+    if os.getenv("ALMACENAMIENTO", "firestore").lower() == "sqlite":
+        logger.warning("Con SQLite, cada cluster solo ve al momento sus propias escrituras en la caché de títulos.")
+
+    procesos = [None] * len(rangos)
+    esperas = [ESPERA_REINICIO] * len(rangos)
+    salidas_inmediatas = [0] * len(rangos)
+    abandonados = set()
+    detener = False
+    # Momento a partir del cual se puede lanzar otro cluster sin pisar los IDENTIFY del anterior
+    siguiente_lanzamiento = 0.0
+
+    def lanzar(cluster_id):
+        nonlocal siguiente_lanzamiento
+        entorno = dict(os.environ, CLUSTER_ID=str(cluster_id), SHARDS=str(total),
+                       SHARD_IDS=",".join(map(str, rangos[cluster_id])))
+        procesos[cluster_id] = (subprocess.Popen([sys.executable, script], env=entorno), time.monotonic())
+        siguiente_lanzamiento = (time.monotonic()
+                                 + math.ceil(len(rangos[cluster_id]) / concurrencia) * SEGUNDOS_POR_IDENTIFY)
+        logger.info(f"Cluster {cluster_id} iniciado (PID {procesos[cluster_id][0].pid}), shards {rangos[cluster_id]}")
+
+    def al_recibir_senal(numero, _):
+        nonlocal detener
+        detener = True
+        logger.info(f"Supervisor: señal {numero} recibida, deteniendo clusters")
+        for proceso in procesos:
+            if proceso is not None and proceso[0].poll() is None:
+                proceso[0].terminate()
+
+    signal.signal(signal.SIGTERM, al_recibir_senal)
+    signal.signal(signal.SIGINT, al_recibir_senal)
+
+    for cluster_id in range(len(rangos)):
+        if detener:
+            break
+        time.sleep(max(0.0, siguiente_lanzamiento - time.monotonic()))
+        lanzar(cluster_id)
+
+    reinicios = {}  # cluster_id -> momento del reinicio programado
+    while not detener:
+        time.sleep(1)
+        for cluster_id, proceso in enumerate(procesos):
+            if detener:
+                break
+            if cluster_id in abandonados or cluster_id in reinicios or proceso is None or proceso[0].poll() is None:
+                continue
+            duracion = time.monotonic() - proceso[1]
+            # Una caída tras mucho tiempo funcionando no cuenta como caída seguida
+            if duracion > ESPERA_REINICIO_MAX:
+                esperas[cluster_id] = ESPERA_REINICIO
+            salidas_inmediatas[cluster_id] = salidas_inmediatas[cluster_id] + 1 if duracion < SEGUNDOS_SALIDA_INMEDIATA else 0
+            if salidas_inmediatas[cluster_id] >= MAX_SALIDAS_INMEDIATAS:
+                abandonados.add(cluster_id)
+                logger.critical(f"Cluster {cluster_id} terminó {MAX_SALIDAS_INMEDIATAS} veces seguidas al arrancar "
+                                f"(último código {proceso[0].returncode}); no se reinicia más. Revisa su configuración.")
+                continue
+            reinicios[cluster_id] = time.monotonic() + esperas[cluster_id]
+            logger.error(f"Cluster {cluster_id} terminó con código {proceso[0].returncode}; "
+                         f"se reinicia en {esperas[cluster_id]:.0f} s")
+            esperas[cluster_id] = min(esperas[cluster_id] * 2, ESPERA_REINICIO_MAX)
+        # Reinicios pendientes, el más antiguo primero y respetando también el escalonado de IDENTIFY
+        vencidos = [cluster_id for cluster_id, momento in reinicios.items() if momento <= time.monotonic()]
+        if vencidos and not detener and time.monotonic() >= siguiente_lanzamiento:
+            cluster_id = min(vencidos, key=reinicios.get)
+            del reinicios[cluster_id]
+            lanzar(cluster_id)
+        if len(abandonados) == len(rangos):
+            logger.critical("Supervisor: ningún cluster consigue arrancar; se detiene")
+            break
+
+    for proceso in procesos:
+        if proceso is not None:
+            try:
+                proceso[0].wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                proceso[0].kill()
+    logger.info("Supervisor detenido")
+    if abandonados:
+        # Código de error para que la plataforma avise (y reinicie el supervisor, si está configurada así)
+        sys.exit(1)
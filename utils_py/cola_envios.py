@@ -0,0 +1,216 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+
+from utils_py.limites_discord import limitador_discord
+from utils_py.metricas import envios_cola, espera_cola_envios, espera_envios, latencia_envios
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Prioridades (sale antes el número menor): las publicaciones adelantan a las respuestas de administración
+PRIORIDAD_PUBLICACION = 0
+PRIORIDAD_ADMIN = 1
+NOMBRES_PRIORIDAD = {PRIORIDAD_PUBLICACION: "publicacion", PRIORIDAD_ADMIN: "admin"}
+
+# Mensajes pendientes como máximo por canal
+MAX_PENDIENTES_POR_CANAL = int(os.getenv("COLA_ENVIOS_MAX_POR_CANAL", "50"))
+# Discord admite hasta 10 embeds por mensaje
+MAX_EMBEDS_POR_MENSAJE = 10
+
+
+class ColaEnviosLlena(Exception):
+    """
+    El canal tiene demasiados mensajes pendientes; el envío se rechaza en lugar de esperar sin límite.
+    """
+
+
+class _Envio:
+    """
+    Mensaje pendiente de un canal, con el futuro que recibe el resultado.
+    """
+    __slots__ = ("prioridad", "secuencia", "kwargs", "agrupable", "futuro", "encolado", "espera", "latencia")
+
+    def __init__(self, prioridad, secuencia, kwargs, agrupable, futuro):
+        self.prioridad = prioridad
+        self.secuencia = secuencia
+        self.kwargs = kwargs
+        self.agrupable = agrupable
+        self.futuro = futuro
+        self.encolado = time.perf_counter()
+        self.espera = 0.0
+        self.latencia = 0.0
+
+    def __lt__(self, otro):
+        return (self.prioridad, self.secuencia) < (otro.prioridad, otro.secuencia)
+
+
+class _CanalSalida:
+    def __init__(self):
+        self.pendientes = []  # montículo de _Envio
+        self.tarea = None
+
+
+class ColaEnvios:
+    """
+    Cola de salida por canal: todos los mensajes a un canal pasan por un único trabajador.
+
+    El trabajador respeta los cubos de tokens de `limitador_discord` (así discord.py no
+    duerme por un 429 dentro de un handler), envía primero las publicaciones y luego las
+    respuestas de administración, y junta en un solo mensaje (hasta 10 embeds) las
+    respuestas agrupables que se acumulan mientras se espera turno.
+    Cada canal admite `max_por_canal` pendientes; si está lleno, una publicación desplaza
+    a la respuesta de administración más reciente y cualquier otro envío se rechaza con
+    `ColaEnviosLlena`. El trabajador termina cuando su canal se vacía.
+    """
+    def __init__(self, limitador=limitador_discord, max_por_canal=MAX_PENDIENTES_POR_CANAL):
+        self.limitador = limitador
+        self.max_por_canal = max_por_canal
+        self._canales = {}
+        self._secuencia = itertools.count()
+        self.enviados = 0
+        self.agrupados = 0
+        self.rechazados = 0
+
+    def pendientes(self, prioridad: int = None) -> int:
+        """
+        Mensajes en espera en todos los canales (de una prioridad, si se indica).
+        """
+        return sum(1 for estado in self._canales.values() for envio in estado.pendientes
+                   if prioridad is None or envio.prioridad == prioridad)
+
+    def estadisticas(self):
+        return {
+            "canales": len(self._canales),
+            "pendientes": self.pendientes(),
+            "enviados": self.enviados,
+            "agrupados": self.agrupados,
+            "rechazados": self.rechazados,
+        }
+
+    async def enviar(self, canal, prioridad: int = PRIORIDAD_ADMIN, agrupable: bool = False, **kwargs):
+        """
+        Encola `canal.send(**kwargs)` y devuelve el mensaje enviado.
+
+        `agrupable` solo se aplica a envíos con un único `embed`; varios de ellos pueden
+        acabar en el mismo mensaje, así que no conviene editar después el mensaje devuelto.
+        """
+        return await self._encolar(canal, prioridad, agrupable, kwargs).futuro
+
+    async def enviar_medido(self, canal, prioridad: int = PRIORIDAD_PUBLICACION, **kwargs):
+        """
+        Como `enviar`, pero devuelve (mensaje, segundos en cola, segundos del envío).
+        """
+        envio = self._encolar(canal, prioridad, False, kwargs)
+        mensaje = await envio.futuro
+        return mensaje, envio.espera, envio.latencia
+
+    def _encolar(self, canal, prioridad, agrupable, kwargs):
+        estado = self._canales.get(canal.id)
+        if estado is None:
+            estado = self._canales[canal.id] = _CanalSalida()
+
+        if len(estado.pendientes) >= self.max_por_canal:
+            self._hacer_sitio(canal, estado, prioridad)
+
+        futuro = asyncio.get_running_loop().create_future()
+        agrupable = agrupable and set(kwargs) == {"embed"}
+        envio = _Envio(prioridad, next(self._secuencia), kwargs, agrupable, futuro)
+        heapq.heappush(estado.pendientes, envio)
+        if estado.tarea is None:
+            estado.tarea = asyncio.create_task(self._trabajar(canal, estado))
+        return envio
+
+    def _hacer_sitio(self, canal, estado, prioridad):
+        """
+        Con el canal lleno, descarta el envío menos prioritario y más reciente si es de menor prioridad; si no, rechaza.
+        """
+        descartable = max(estado.pendientes)
+        if descartable.prioridad <= prioridad:
+            self._rechazar(prioridad)
+            raise ColaEnviosLlena(f"El canal {canal.id} tiene {len(estado.pendientes)} mensajes pendientes; "
+                                  f"inténtalo de nuevo en unos segundos.")
+        estado.pendientes.remove(descartable)
+        heapq.heapify(estado.pendientes)
+        self._rechazar(descartable.prioridad)
+        if not descartable.futuro.done():
+            descartable.futuro.set_exception(ColaEnviosLlena(
+                f"Mensaje descartado: el canal {canal.id} está lleno y había publicaciones pendientes."))
+
+    def _rechazar(self, prioridad):
+        self.rechazados += 1
+        envios_cola.inc(prioridad=NOMBRES_PRIORIDAD.get(prioridad, str(prioridad)), resultado="rechazado")
+        logger.warning(f"Cola de envíos llena: mensaje rechazado (prioridad {NOMBRES_PRIORIDAD.get(prioridad)})")
+
+    def _siguiente_grupo(self, estado):
+        """
+        Saca el próximo envío vivo y, si es agrupable, los agrupables que le siguen con su misma prioridad.
+        """
+        while estado.pendientes:
+            envio = heapq.heappop(estado.pendientes)
+            if not envio.futuro.done():  # El que esperaba pudo cancelarse
+                break
+        else:
+            return []
+        grupo = [envio]
+        while (envio.agrupable and len(grupo) < MAX_EMBEDS_POR_MENSAJE and estado.pendientes
+               and estado.pendientes[0].agrupable and estado.pendientes[0].prioridad == envio.prioridad):
+            siguiente = heapq.heappop(estado.pendientes)
+            if not siguiente.futuro.done():
+                grupo.append(siguiente)
+        return grupo
+
+    async def _trabajar(self, canal, estado):
+        try:
+            while estado.pendientes:
+                espera_limite = await self.limitador.esperar_turno(canal.id)
+                espera_envios.observar(espera_limite)
+                # El grupo se arma tras el turno: así se juntan las respuestas que llegaron mientras tanto
+                grupo = self._siguiente_grupo(estado)
+                if not grupo:
+                    break
+                await self._enviar_grupo(canal, grupo)
+        finally:
+            estado.tarea = None
+            if estado.pendientes:
+                # Cancelado con envíos pendientes (p. ej. al apagar): avisar a quien espera
+                for envio in estado.pendientes:
+                    if not envio.futuro.done():
+                        envio.futuro.cancel()
+                estado.pendientes.clear()
+            if self._canales.get(canal.id) is estado:
+                del self._canales[canal.id]
+
+    async def _enviar_grupo(self, canal, grupo):
+        inicio = time.perf_counter()
+        for envio in grupo:
+            envio.espera = inicio - envio.encolado
+            espera_cola_envios.observar(envio.espera, prioridad=NOMBRES_PRIORIDAD.get(envio.prioridad, "otra"))
+        kwargs = grupo[0].kwargs if len(grupo) == 1 else {"embeds": [envio.kwargs["embed"] for envio in grupo]}
+        try:
+            mensaje = await canal.send(**kwargs)
+        except Exception as e:
+            latencia_envios.observar(time.perf_counter() - inicio, resultado="error")
+            for envio in grupo:
+                if not envio.futuro.done():
+                    envio.futuro.set_exception(e)
+            return
+        latencia = time.perf_counter() - inicio
+        latencia_envios.observar(latencia, resultado="ok")
+        self.enviados += 1
+        self.agrupados += len(grupo) - 1
+        prioridad = NOMBRES_PRIORIDAD.get(grupo[0].prioridad, "otra")
+        envios_cola.inc(prioridad=prioridad, resultado="enviado")
+        if len(grupo) > 1:
+            envios_cola.inc(len(grupo) - 1, prioridad=prioridad, resultado="agrupado")
+        for envio in grupo:
+            envio.latencia = latencia
+            if not envio.futuro.done():
+                envio.futuro.set_result(mensaje)
+
+
+# Instancia global de la cola de envíos
+cola_envios = ColaEnvios()
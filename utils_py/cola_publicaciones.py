@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Trabajadores que publican en paralelo y máximo de trabajos pendientes
+TRABAJADORES = int(os.getenv("PUBLICACIONES_TRABAJADORES", "4"))
+MAX_PENDIENTES = int(os.getenv("PUBLICACIONES_MAX_PENDIENTES", "100"))
+
+
+class ColaPublicaciones:
+    """
+    Cola en proceso para los trabajos de publicación.
+
+    Los handlers responden (defer) de inmediato y dejan el trabajo pesado (Firestore,
+    descarga de la imagen y envío al canal) a un pool de trabajadores.
+    """
+    def __init__(self, trabajadores=TRABAJADORES, max_pendientes=MAX_PENDIENTES):
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self._cola = None
+        self._tareas = []
+        self.procesados = 0
+        self.fallidos = 0
+        self._esperas = deque(maxlen=500)    # segundos en cola por trabajo
+        self._latencias = deque(maxlen=500)  # segundos desde que se encoló hasta que terminó
+
+    def iniciar(self):
+        """
+        Crea la cola y arranca los trabajadores en el event loop actual.
+        """
+        if self._tareas:
+            return
+        self._cola = asyncio.Queue(maxsize=self.max_pendientes)
+        self._tareas = [asyncio.create_task(self._trabajador(i)) for i in range(self.trabajadores)]
+        logger.info(f"Cola de publicaciones iniciada con {self.trabajadores} trabajadores.")
+
+    async def detener(self):
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+
+    def encolar(self, funcion, *args) -> asyncio.Future:
+        """
+        Encola `funcion(*args)` y devuelve un future con su resultado.
+
+        Lanza ValueError si la cola está llena.
+        """
+        if self._cola is None:
+            self.iniciar()
+        futuro = asyncio.get_running_loop().create_future()
+        # Los errores ya se registran en el trabajador; evitar avisos si nadie espera el future
+        futuro.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            self._cola.put_nowait((funcion, args, time.perf_counter(), futuro))
+        except asyncio.QueueFull:
+            raise ValueError("Hay demasiadas publicaciones en cola. Inténtalo de nuevo en unos segundos.")
+        return futuro
+
+    async def _trabajador(self, numero):
+        while True:
+            funcion, args, encolado, futuro = await self._cola.get()
+            inicio = time.perf_counter()
+            self._esperas.append(inicio - encolado)
+            try:
+                resultado = await funcion(*args)
+                if not futuro.done():
+                    futuro.set_result(resultado)
+                self.procesados += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.fallidos += 1
+                logger.error(f"Error en el trabajador de publicaciones {numero}: {e}")
+                if not futuro.done():
+                    futuro.set_exception(e)
+            finally:
+                self._latencias.append(time.perf_counter() - encolado)
+                self._cola.task_done()
+
+    def estadisticas(self) -> dict:
+        def percentil(valores, p):
+            if not valores:
+                return 0.0
+            ordenados = sorted(valores)
+            return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))] * 1000, 1)
+
+        return {
+            "profundidad": self._cola.qsize() if self._cola is not None else 0,
+            "trabajadores": len(self._tareas),
+            "procesados": self.procesados,
+            "fallidos": self.fallidos,
+            "espera_p50_ms": percentil(self._esperas, 0.5),
+            "latencia_p50_ms": percentil(self._latencias, 0.5),
+            "latencia_p95_ms": percentil(self._latencias, 0.95),
+        }
+
+
+# Instancia global de la cola de publicaciones
+cola_publicaciones = ColaPublicaciones()
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from utils_py.cola_envios import PRIORIDAD_PUBLICACION, cola_envios
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+
+class ResultadoEnvio:
+    """
+    Resultado del envío a un canal destino.
+    """
+    def __init__(self, canal_id: int, nombre: str, espera: float = 0.0, latencia: float = 0.0, error: str = None):
+        self.canal_id = canal_id
+        self.nombre = nombre
+        self.espera = espera
+        self.latencia = latencia
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+async def _enviar(canal_id, canal, contenido, imagen):
+    nombre = f"#{canal.name} ({canal.guild.name})" if canal is not None else f"canal {canal_id}"
+    if canal is None:
+        return ResultadoEnvio(canal_id, nombre, error="El canal no existe o el bot no tiene acceso.")
+    try:
+        # La cola del canal marca el ritmo (rate limits) y da prioridad a las publicaciones
+        archivo = imagen.como_archivo() if imagen is not None else None
+        _, espera, latencia = await cola_envios.enviar_medido(canal, prioridad=PRIORIDAD_PUBLICACION,
+                                                               content=contenido, file=archivo)
+        return ResultadoEnvio(canal.id, nombre, espera, latencia)
+    except Exception as e:
+        logger.error(f"Error al publicar en {nombre}: {e}")
+        return ResultadoEnvio(canal.id, nombre, error=str(e))
+
+
+async def difundir(destinos, imagen=None):
+    """
+    Envía el mismo anuncio a varios canales en paralelo, a través de la cola de cada canal.
+
+    `destinos` es una lista de tuplas (canal_id, canal o None, contenido); la imagen,
+    ya descargada, se vuelve a adjuntar desde memoria en cada envío.
+    Devuelve un `ResultadoEnvio` por destino, en el mismo orden.
+    """
+    resultados = await asyncio.gather(*(_enviar(canal_id, canal, contenido, imagen)
+                                        for canal_id, canal, contenido in destinos))
+    fallidos = sum(1 for resultado in resultados if not resultado.ok)
+    logger.info(f"Difusión completada: {len(resultados) - fallidos}/{len(resultados)} destinos")
+    return resultados
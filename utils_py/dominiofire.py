@@ -1,10 +1,194 @@
-def actualizar_dominios(db, server_id, nuevo_dominio):
-    collection = db.collection('servidores').document(server_id).collections()
-    for collection_name in collection:
-        docs = db.collection(collection_name).stream()
-        for doc in docs:
-            data = doc.to_dict()
-            if "link_ikigai" in data:
-                viejo_dominio = data['link_ikigai'].split('/')[2]
-                data['link_ikigai'] = data['link_ikigai'].replace(viejo_dominio, nuevo_dominio)
-                db.collection(collection_name).document(doc.id).update(data)
+import asyncio
+import logging
+import os
+from urllib.parse import urlsplit, urlunsplit
+
+from utils_py import proyectos
+from utils_py.almacenamiento import almacenamiento
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Tamaño de cada lote (Firestore admite hasta 500 escrituras por commit) y lotes en vuelo
+TAMANO_LOTE = int(os.getenv("DOMINIO_TAMANO_LOTE", "400"))
+LOTES_CONCURRENTES = int(os.getenv("DOMINIO_LOTES_CONCURRENTES", "4"))
+
+# Límites de la migración entre servidores: servidores en paralelo y commits en vuelo en total
+SERVIDORES_CONCURRENTES = int(os.getenv("DOMINIO_SERVIDORES_CONCURRENTES", "8"))
+LOTES_GLOBALES = int(os.getenv("DOMINIO_LOTES_GLOBALES", "16"))
+
+
+def _host(dominio: str) -> str:
+    """
+    Host en minúsculas de un dominio dado con o sin esquema (`https://a.com` o `a.com`).
+    """
+    partes = urlsplit(dominio if "//" in dominio else f"//{dominio}")
+    return (partes.hostname or "").lower()
+
+
+def reemplazar_dominio(link: str, nuevo_dominio: str, dominio_anterior: str = None) -> str:
+    """
+    Reemplaza el host (y el esquema, si se indica) de un enlace conservando ruta, query y fragmento.
+
+    Si se pasa `dominio_anterior`, solo se reescriben los enlaces cuyo host coincide
+    exactamente con él; el resto se devuelve sin cambios.
+    """
+    partes = urlsplit(link.strip())
+    if not partes.netloc:
+        return link
+    if dominio_anterior and (partes.hostname or "").lower() != _host(dominio_anterior):
+        return link
+
+    destino = urlsplit(nuevo_dominio if "//" in nuevo_dominio else f"//{nuevo_dominio}")
+    esquema = destino.scheme or partes.scheme
+    ruta = destino.path.rstrip("/") + partes.path
+    return urlunsplit((esquema, destino.netloc, ruta, partes.query, partes.fragment))
+
+
+async def migrar_dominio_servidor(server_id: str, nuevo_dominio: str, simular: bool = False, progreso=None,
+                                  dominio_anterior: str = None, limite_global: asyncio.Semaphore = None):
+    """
+    Cambia el dominio de `link_ikigai` en todos los proyectos de un servidor.
+
+    Recorre la colección por páginas ordenadas por ID, escribe cada página en un lote
+    (con varios lotes en vuelo a la vez) y guarda un punto de control (la migración
+    `dominio` del servidor) para reanudar si se interrumpe.
+    Con `simular=True` solo cuenta los proyectos que cambiarían.
+    `progreso` es una corrutina opcional que recibe el resumen tras cada página.
+    `limite_global` acota los commits en vuelo cuando se migran varios servidores a la vez.
+    """
+    resumen = {"revisados": 0, "actualizados": 0, "sin_cambios": 0, "lotes": 0, "reanudado_desde": None}
+    ultimo_id = None
+    # Filtro de la migración: solo se reanuda una interrumpida con el mismo dominio destino y el mismo filtro,
+    # porque una filtrada pudo saltarse documentos que esta sí debe reescribir
+    filtro = _host(dominio_anterior) if dominio_anterior else None
+
+    # Reanudar una migración interrumpida hacia el mismo dominio
+    if not simular:
+        datos_control = await almacenamiento.leer_migracion(server_id, "dominio")
+        if (datos_control and datos_control.get("dominio") == nuevo_dominio
+                and datos_control.get("dominio_anterior") == filtro and not datos_control.get("completado")):
+            ultimo_id = datos_control.get("ultimo_id")
+            resumen["revisados"] = datos_control.get("revisados", 0)
+            resumen["actualizados"] = datos_control.get("actualizados", 0)
+            resumen["reanudado_desde"] = ultimo_id
+            logger.info(f"Reanudando migración de dominio en {server_id} desde el documento {ultimo_id}")
+
+    async def commit(operaciones):
+        if limite_global is None:
+            await almacenamiento.escribir_lote(server_id, operaciones)
+        else:
+            async with limite_global:
+                await almacenamiento.escribir_lote(server_id, operaciones)
+
+    en_vuelo = []  # (tarea de commit, último id de la página, actualizados de la página, revisados hasta ella)
+
+    async def confirmar_mas_antiguo():
+        # Los lotes se confirman en orden para que el punto de control nunca salte documentos
+        tarea, ultimo, actualizados, revisados = en_vuelo.pop(0)
+        if tarea is not None:
+            await tarea
+        resumen["actualizados"] += actualizados
+        resumen["lotes"] += 1
+        await almacenamiento.escribir_migracion(server_id, "dominio", {
+            "dominio": nuevo_dominio,
+            "dominio_anterior": filtro,
+            "ultimo_id": ultimo,
+            "revisados": revisados,
+            "actualizados": resumen["actualizados"],
+            "completado": False,
+        })
+
+    try:
+        while True:
+            pagina = await almacenamiento.pagina_proyectos(server_id, ultimo_id, TAMANO_LOTE, campos=["link_ikigai"])
+            if not pagina:
+                break
+
+            operaciones = []
+            for doc_id, datos in pagina:
+                link = datos.get("link_ikigai")
+                if not link:
+                    continue
+                nuevo_link = reemplazar_dominio(link, nuevo_dominio, dominio_anterior)
+                if nuevo_link == link:
+                    resumen["sin_cambios"] += 1
+                    continue
+                operaciones.append(("actualizar", doc_id, {"link_ikigai": nuevo_link}))
+                logger.debug(f"Documento {doc_id}: {link} -> {nuevo_link}")
+
+            cambios = len(operaciones)
+            resumen["revisados"] += len(pagina)
+            ultimo_id = pagina[-1][0]
+
+            if simular:
+                resumen["actualizados"] += cambios
+            else:
+                tarea = asyncio.create_task(commit(operaciones)) if cambios else None
+                en_vuelo.append((tarea, ultimo_id, cambios, resumen["revisados"]))
+                if len(en_vuelo) >= LOTES_CONCURRENTES:
+                    await confirmar_mas_antiguo()
+                logger.info(f"Migración de dominio en {server_id}: {resumen['revisados']} proyectos revisados")
+
+            if progreso is not None:
+                await progreso(dict(resumen))
+            if len(pagina) < TAMANO_LOTE:
+                break
+
+        while en_vuelo:
+            await confirmar_mas_antiguo()
+    except Exception:
+        # Cancelar los lotes en vuelo; el punto de control queda en el último lote confirmado
+        # (reescribir un enlace que ya tiene el dominio nuevo no produce cambios)
+        for tarea, _, _, _ in en_vuelo:
+            if tarea is not None:
+                tarea.cancel()
+        raise
+
+    if not simular:
+        # Los proyectos cacheados tienen el enlace anterior
+        proyectos.invalidar(server_id)
+        await almacenamiento.escribir_migracion(server_id, "dominio", {
+            "completado": True, "revisados": resumen["revisados"], "actualizados": resumen["actualizados"],
+        }, merge=True)
+    return resumen
+
+
+async def migrar_dominio_global(nuevo_dominio: str, dominio_anterior: str = None, simular: bool = False,
+                                servidores_concurrentes: int = SERVIDORES_CONCURRENTES,
+                                lotes_globales: int = LOTES_GLOBALES):
+    """
+    Migra el dominio de los proyectos de todos los servidores (`servidores/*/proyectos`).
+
+    Un pool de trabajadores toma servidores de una cola; cada servidor se migra con
+    `migrar_dominio_servidor` (lotes y punto de control propios) y un semáforo común
+    limita los commits en vuelo entre todos. Devuelve un resumen por servidor; los
+    errores de un servidor se registran en su resumen sin detener a los demás.
+    """
+    cola = asyncio.Queue()
+    for server_id in await almacenamiento.listar_servidores():
+        cola.put_nowait(server_id)
+    total = cola.qsize()
+    logger.info(f"Migración global de dominio a {nuevo_dominio}: {total} servidores en cola")
+
+    limite_global = asyncio.Semaphore(lotes_globales)
+    informe = {}
+
+    async def trabajador():
+        while True:
+            try:
+                server_id = cola.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                informe[server_id] = await migrar_dominio_servidor(
+                    server_id, nuevo_dominio, simular=simular,
+                    dominio_anterior=dominio_anterior, limite_global=limite_global,
+                )
+            except Exception as e:
+                logger.error(f"Error al migrar el dominio del servidor {server_id}: {e}")
+                informe[server_id] = {"error": str(e)}
+            logger.info(f"Migración global: {len(informe)}/{total} servidores procesados")
+
+    await asyncio.gather(*(trabajador() for _ in range(max(1, min(servidores_concurrentes, total)))))
+    return informe
@@ -1,29 +1,124 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
-import os
+import asyncio
 import base64
 import json
+import logging
+import os
+import threading
+import time
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+
+class ProveedorFirestore:
+    """
+    Crea los clientes de Firestore la primera vez que se necesitan, no al importar el módulo.
+
+    La inicialización (importar firebase_admin, decodificar las credenciales y abrir el canal
+    gRPC) se hace en un hilo, así que el event loop sigue libre mientras tanto. `precalentar()`
+    la lanza en segundo plano durante el login del gateway y hace una lectura barata para
+    dejar el canal abierto. Si falla, se registra el error y se reintenta en la siguiente
+    petición en lugar de tumbar el proceso.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_async = None
+        self._tarea = None
+        self._calentamiento = None
+        self.tiempos = {}  # fase -> segundos: importacion, credenciales, clientes, calentamiento
+        self.ultimo_error = None
+
+    @property
+    def listo(self) -> bool:
+        return self._db_async is not None
+
+    def _inicializar(self):
+        """
+        Inicialización bloqueante; segura si varios hilos la llaman a la vez.
+        """
+        with self._lock:
+            if self._db_async is not None:
+                return
+            try:
+                inicio = time.perf_counter()
+                import firebase_admin
+                from firebase_admin import credentials, firestore, firestore_async
+                self.tiempos["importacion"] = time.perf_counter() - inicio
+
+                # Leer credenciales desde base64
+                inicio = time.perf_counter()
+                encoded_creds = os.getenv('FIRESTORE_CREDENTIALS')
+                if not encoded_creds:
+                    raise ValueError("FIRESTORE_CREDENTIALS no está configurado en las variables de entorno.")
+                creds_dict = json.loads(base64.b64decode(encoded_creds).decode("utf-8"))
+                cred = credentials.Certificate(creds_dict)
+                self.tiempos["credenciales"] = time.perf_counter() - inicio
+
+                # Inicializar Firebase Admin (una sola vez aunque se reintente) y los clientes
+                inicio = time.perf_counter()
+                try:
+                    firebase_admin.get_app()
+                except ValueError:
+                    firebase_admin.initialize_app(cred)
+                # Cliente síncrono: listeners y tareas fuera del event loop
+                db = firestore.client()
+                # Cliente asíncrono para usar desde los comandos sin bloquear el event loop
+                db_async = firestore_async.client()
+                self.tiempos["clientes"] = time.perf_counter() - inicio
+            except Exception as e:
+                self.ultimo_error = str(e)
+                raise RuntimeError(f"Error al inicializar Firestore: {str(e)}")
+            self._db, self._db_async = db, db_async
+            self.ultimo_error = None
+            logger.info("Firestore inicializado: " + ", ".join(f"{fase} {segundos:.2f} s"
+                                                             for fase, segundos in self.tiempos.items()))
+
+    def cliente(self):
+        """
+        Cliente síncrono. Bloquea si aún no está inicializado: no llamar desde el event loop sin `cliente_async` antes.
+        """
+        self._inicializar()
+        return self._db
+
+    async def cliente_async(self):
+        """
+        Cliente asíncrono; la primera llamada espera a la inicialización sin bloquear el event loop.
+        """
+        if self._db_async is not None:
+            return self._db_async
+        # Todas las corrutinas esperan a la misma inicialización
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.ensure_future(asyncio.to_thread(self._inicializar))
+        await asyncio.shield(self._tarea)
+        return self._db_async
+
+    def precalentar(self):
+        """
+        Inicia la conexión en segundo plano (p. ej. mientras el gateway hace login).
+        """
+        async def calentar():
+            try:
+                db_async = await self.cliente_async()
+                # Lectura barata para abrir el canal gRPC antes del primer comando
+                inicio = time.perf_counter()
+                await db_async.collection("servidores").limit(1).get()
+                self.tiempos["calentamiento"] = time.perf_counter() - inicio
+                logger.info(f"Conexión con Firestore precalentada en {self.tiempos['calentamiento']:.2f} s")
+            except Exception as e:
+                logger.error(f"No se pudo precalentar Firestore (se reintentará al usarlo): {e}")
+
+        # Guardar la referencia: una tarea sin referencias puede recolectarse antes de terminar
+        self._calentamiento = asyncio.create_task(calentar())
+        return self._calentamiento
+
+    def estadisticas(self):
+        return {
+            "listo": self.listo,
+            "tiempos_ms": {fase: round(segundos * 1000, 1) for fase, segundos in self.tiempos.items()},
+            "ultimo_error": self.ultimo_error,
+        }
+
 
-# Inicializar Firestore
-def init_firestore():
-    try:
-        # Leer credenciales desde base64
-        encoded_creds = os.getenv('FIRESTORE_CREDENTIALS')
-        if not encoded_creds:
-            raise ValueError("FIRESTORE_CREDENTIALS no está configurado en las variables de entorno.")
-        
-        # Decodificar base64 y convertir a diccionario
-        firestore_creds = base64.b64decode(encoded_creds).decode("utf-8")
-        creds_dict = json.loads(firestore_creds)
-        
-        # Inicializar Firebase Admin con las credenciales
-        cred = credentials.Certificate(creds_dict)
-        firebase_admin.initialize_app(cred)
-        
-        # Retornar cliente de Firestore
-        return firestore.client()
-    except Exception as e:
-        raise RuntimeError(f"Error al inicializar Firestore: {str(e)}")
-
-# Instancia global de Firestore
-db = init_firestore()
+# Instancia global del proveedor de Firestore
+proveedor_firestore = ProveedorFirestore()
@@ -0,0 +1,123 @@
+import io
+import logging
+import time
+
+import discord
+
+from utils_py.cache_imagenes import EntradaPortada, cache_imagenes, frescura_desde_cabeceras
+from utils_py.metricas import bytes_imagenes, latencia_imagenes
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Límite de subida por defecto de Discord (servidores sin mejoras) y tamaño de bloque de lectura
+LIMITE_SUBIDA = 10 * 1024 * 1024
+TAMANO_BLOQUE = 64 * 1024
+
+# Firmas de los formatos de imagen aceptados: (prefijo, extensión, content-type)
+_FIRMAS = (
+    (b'\x89PNG\r\n\x1a\n', 'png', 'image/png'),
+    (b'\xff\xd8\xff', 'jpg', 'image/jpeg'),
+    (b'GIF87a', 'gif', 'image/gif'),
+    (b'GIF89a', 'gif', 'image/gif'),
+)
+
+
+def detectar_formato(cabecera: bytes):
+    """
+    Detecta el formato de imagen a partir de sus primeros bytes.
+
+    Devuelve una tupla (extensión, content-type) o None si no es un formato conocido.
+    """
+    for firma, extension, content_type in _FIRMAS:
+        if cabecera.startswith(firma):
+            return extension, content_type
+    if cabecera[:4] == b'RIFF' and cabecera[8:12] == b'WEBP':
+        return 'webp', 'image/webp'
+    return None
+
+
+class ImagenDescargada:
+    """
+    Imagen descargada en memoria, lista para adjuntarse a uno o varios mensajes.
+    """
+    def __init__(self, datos: bytes, extension: str, content_type: str):
+        self.datos = datos
+        self.extension = extension
+        self.content_type = content_type
+
+    def como_archivo(self, nombre: str = "portada") -> discord.File:
+        """
+        Crea un `discord.File` nuevo sobre los mismos bytes (cada envío consume el suyo).
+        """
+        return discord.File(io.BytesIO(self.datos), filename=f"{nombre}.{self.extension}")
+
+
+def _medir(origen, inicio, tamano):
+    latencia_imagenes.observar(time.perf_counter() - inicio, origen=origen)
+    bytes_imagenes.inc(tamano, origen=origen)
+
+
+def _error_limite(limite):
+    return ValueError(f"La imagen supera el límite de subida de Discord ({limite // (1024 * 1024)} MB).")
+
+
+async def descargar_imagen(session, url: str, limite: int = LIMITE_SUBIDA) -> ImagenDescargada:
+    """
+    Obtiene una imagen desde la caché de portadas o la descarga por bloques sin tocar el disco.
+
+    Si hay una copia cacheada vigente no se contacta al origen; si caducó se revalida
+    con ETag/Last-Modified y solo se descarga de nuevo si cambió.
+    """
+    inicio = time.perf_counter()
+    cacheada = await cache_imagenes.buscar(url)
+    if cacheada is not None and cacheada.fresca():
+        if len(cacheada.datos) > limite:
+            raise _error_limite(limite)
+        _medir("cache", inicio, len(cacheada.datos))
+        return ImagenDescargada(cacheada.datos, cacheada.extension, cacheada.content_type)
+
+    cabeceras = cacheada.cabeceras_condicionales() if cacheada is not None else {}
+    async with session.get(url, headers=cabeceras) as resp:
+        if resp.status == 304 and cacheada is not None:
+            frescura = frescura_desde_cabeceras(resp.headers)
+            if frescura is None:
+                # El origen ahora prohíbe guardarla (`no-store`): la copia vale para esta vez y se olvida
+                await cache_imagenes.eliminar(url)
+            else:
+                await cache_imagenes.marcar_revalidada(cacheada, frescura)
+            if len(cacheada.datos) > limite:
+                raise _error_limite(limite)
+            logger.info(f"Portada revalidada sin descargar: {url}")
+            _medir("revalidada", inicio, len(cacheada.datos))
+            return ImagenDescargada(cacheada.datos, cacheada.extension, cacheada.content_type)
+
+        if resp.status != 200:
+            raise ValueError("No se pudo descargar la imagen desde la URL proporcionada.")
+        if resp.content_length is not None and resp.content_length > limite:
+            raise _error_limite(limite)
+
+        buffer = bytearray()
+        async for bloque in resp.content.iter_chunked(TAMANO_BLOQUE):
+            buffer.extend(bloque)
+            if len(buffer) > limite:
+                raise _error_limite(limite)
+        cabeceras_respuesta = resp.headers
+
+    formato = detectar_formato(bytes(buffer[:16]))
+    if formato is None:
+        raise ValueError("La URL proporcionada no contiene una imagen válida (PNG, JPG, GIF o WEBP).")
+
+    datos = bytes(buffer)
+    logger.info(f"Imagen descargada: {len(datos)} bytes ({formato[1]})")
+    _medir("red", inicio, len(datos))
+
+    frescura = frescura_desde_cabeceras(cabeceras_respuesta)
+    if frescura is not None:
+        await cache_imagenes.guardar(EntradaPortada(
+            url, datos, *formato,
+            etag=cabeceras_respuesta.get('ETag'),
+            last_modified=cabeceras_respuesta.get('Last-Modified'),
+            frescura=frescura,
+        ))
+    return ImagenDescargada(datos, *formato)
@@ -0,0 +1,195 @@
+import heapq
+import re
+import unicodedata
+from collections import Counter
+
+# Umbral mínimo de similitud por trigramas para considerar un resultado difuso
+UMBRAL_SIMILITUD = 0.3
+
+_NO_ALFANUMERICO = re.compile(r'[^0-9a-z]+')
+
+
+def normalizar(texto: str) -> str:
+    """
+    Normaliza un texto para búsqueda: sin acentos, en minúsculas y con espacios simples.
+    """
+    descompuesto = unicodedata.normalize('NFKD', texto or '')
+    sin_acentos = ''.join(c for c in descompuesto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', sin_acentos.casefold()).strip()
+
+
+def trigramas(normalizado: str) -> set:
+    """
+    Trigramas del texto normalizado, con relleno para favorecer inicios de palabra.
+    """
+    relleno = f"  {normalizado} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class _NodoTrie:
+    __slots__ = ('hijos', 'completos', 'palabras')
+
+    def __init__(self):
+        self.hijos = {}
+        self.completos = set()  # doc_ids cuyo título completo pasa por este nodo
+        self.palabras = set()   # doc_ids con alguna palabra que pasa por este nodo
+
+
+class IndiceTitulos:
+    """
+    Índice de búsqueda de títulos: trie de prefijos más índice invertido de trigramas.
+
+    Los resultados se ordenan primero por coincidencias de prefijo del título completo,
+    luego por prefijo de alguna palabra y por último por similitud difusa de trigramas.
+    Dentro de cada nivel gana el título más parecido y, a igualdad, el más reciente.
+    """
+    def __init__(self):
+        self._docs = {}  # doc_id -> (titulo, normalizado, trigramas, marca)
+        self._raiz = _NodoTrie()
+        self._trigramas = {}  # trigrama -> set(doc_id)
+        self._recientes = None  # títulos ordenados por recencia (se recalcula tras cambios)
+        self._por_marca = []  # heap (marca, doc_id); las entradas obsoletas se descartan al consultarlo
+
+    def __len__(self):
+        return len(self._docs)
+
+    def agregar(self, doc_id: str, titulo: str, marca: float = 0.0):
+        """
+        Agrega o reemplaza el título de un documento.
+        """
+        if doc_id in self._docs:
+            self.eliminar(doc_id)
+        self._recientes = None
+        normalizado = normalizar(titulo)
+        tris = trigramas(normalizado)
+        self._docs[doc_id] = (titulo, normalizado, tris, marca)
+
+        self._recorrer(normalizado, doc_id, 'completos', agregar=True)
+        for palabra in set(normalizado.split()):
+            self._recorrer(palabra, doc_id, 'palabras', agregar=True)
+        for tri in tris:
+            self._trigramas.setdefault(tri, set()).add(doc_id)
+        heapq.heappush(self._por_marca, (marca, doc_id))
+        if len(self._por_marca) > 2 * len(self._docs) + 16:
+            # Demasiadas entradas obsoletas: reconstruir con las vigentes
+            self._por_marca = [(datos[3], doc) for doc, datos in self._docs.items()]
+            heapq.heapify(self._por_marca)
+
+    def eliminar(self, doc_id: str):
+        """
+        Quita un documento del índice.
+        """
+        datos = self._docs.pop(doc_id, None)
+        if datos is None:
+            return
+        self._recientes = None
+        _, normalizado, tris, _ = datos
+
+        self._recorrer(normalizado, doc_id, 'completos', agregar=False)
+        for palabra in set(normalizado.split()):
+            self._recorrer(palabra, doc_id, 'palabras', agregar=False)
+        for tri in tris:
+            docs = self._trigramas.get(tri)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self._trigramas[tri]
+
+    def mas_antiguo(self):
+        """
+        Devuelve el doc_id con la marca de actualización más antigua.
+        """
+        while self._por_marca:
+            marca, doc_id = self._por_marca[0]
+            datos = self._docs.get(doc_id)
+            if datos is not None and datos[3] == marca:
+                return doc_id
+            heapq.heappop(self._por_marca)
+        return None
+
+    def _recorrer(self, texto, doc_id, campo, agregar):
+        """
+        Inserta o retira un doc_id a lo largo del camino de `texto` en el trie.
+        """
+        nodo = self._raiz
+        camino = []
+        for caracter in texto:
+            siguiente = nodo.hijos.get(caracter)
+            if siguiente is None:
+                if not agregar:
+                    return
+                siguiente = nodo.hijos[caracter] = _NodoTrie()
+            camino.append((nodo, caracter, siguiente))
+            nodo = siguiente
+            if agregar:
+                getattr(nodo, campo).add(doc_id)
+            else:
+                getattr(nodo, campo).discard(doc_id)
+
+        # Podar los nodos que quedaron vacíos
+        if not agregar:
+            for padre, caracter, hijo in reversed(camino):
+                if hijo.hijos or hijo.completos or hijo.palabras:
+                    break
+                del padre.hijos[caracter]
+
+    def _nodo(self, prefijo):
+        nodo = self._raiz
+        for caracter in prefijo:
+            nodo = nodo.hijos.get(caracter)
+            if nodo is None:
+                return None
+        return nodo
+
+    def buscar(self, consulta: str, limite: int = 25):
+        """
+        Devuelve hasta `limite` títulos ordenados por relevancia para la consulta.
+        """
+        normalizado = normalizar(consulta)
+        if not normalizado:
+            # Sin filtro: los proyectos más recientes
+            if self._recientes is None:
+                self._recientes = [datos[0] for datos in sorted(self._docs.values(), key=lambda datos: -datos[3])]
+            return self._recientes[:limite]
+
+        # Nivel 0: prefijo del título completo; nivel 1: prefijo de alguna palabra
+        niveles = {}
+        nodo = self._nodo(normalizado)
+        if nodo is not None:
+            for doc_id in nodo.completos:
+                niveles[doc_id] = 0
+            for doc_id in nodo.palabras:
+                niveles.setdefault(doc_id, 1)
+        ultima_palabra = normalizado.split()[-1]
+        if ultima_palabra != normalizado:
+            nodo = self._nodo(ultima_palabra)
+            if nodo is not None:
+                for doc_id in nodo.palabras:
+                    if all(p in self._docs[doc_id][1] for p in normalizado.split()[:-1]):
+                        niveles.setdefault(doc_id, 1)
+
+        # Dentro de los prefijos, primero los títulos más cortos (más parecidos a la consulta)
+        candidatos = []
+        for doc_id, nivel in niveles.items():
+            titulo, normalizado_doc, _, marca = self._docs[doc_id]
+            candidatos.append((nivel, len(normalizado_doc), -marca, titulo))
+        if len(candidatos) >= limite:
+            return [candidato[3] for candidato in heapq.nsmallest(limite, candidatos)]
+
+        # Nivel 2: coincidencias difusas por trigramas
+        tris_consulta = trigramas(normalizado)
+        comunes = Counter()
+        for tri in tris_consulta:
+            docs = self._trigramas.get(tri)
+            if docs:
+                comunes.update(docs)
+
+        for doc_id, compartidos in comunes.items():
+            if doc_id in niveles:
+                continue
+            titulo, _, tris_doc, marca = self._docs[doc_id]
+            similitud = compartidos / (len(tris_consulta) + len(tris_doc) - compartidos)
+            if similitud >= UMBRAL_SIMILITUD:
+                candidatos.append((2, -similitud, -marca, titulo))
+
+        return [candidato[3] for candidato in heapq.nsmallest(limite, candidatos)]
@@ -0,0 +1,316 @@
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import aiohttp
+
+from utils_py.almacenamiento import DocumentoExistente, almacenamiento
+from utils_py.cache_proyectos import cache_titulos
+from utils_py.proyectos import clave_titulo, invalidar
+from utils_py.sesion_http import obtener_sesion
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Campos de un proyecto que se importan (y columnas del CSV exportado)
+CAMPOS_PROYECTO = ("titulo", "link_ikigai", "sinopsis")
+SINOPSIS_POR_DEFECTO = "Sin sinopsis"
+LONGITUD_MAX_TITULO = 256
+LONGITUD_MAX_SINOPSIS = 4000
+# Nombres válidos para los demás campos de un proyecto importado desde JSON (sin puntos: Firestore los
+# tomaría como rutas de subcampos al actualizar; los `__...` están reservados)
+NOMBRE_CAMPO_EXTRA = re.compile(r"(?!__)[A-Za-z_][A-Za-z0-9_]*")
+
+# Documentos leídos por página al exportar y escrituras por lote al importar (límite de Firestore: 500)
+PAGINA_EXPORTACION = 400
+OPERACIONES_POR_LOTE = 500
+# Tamaño máximo del archivo a importar
+MAX_BYTES_IMPORTACION = int(os.getenv("IMPORTACION_MAX_BYTES", str(25 * 1024 * 1024)))
+# Problemas que se muestran en el mensaje (el informe adjunto los lista todos)
+MAX_PROBLEMAS_MOSTRADOS = 15
+
+
+def _a_texto(valor):
+    return valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False, default=str)
+
+
+async def exportar_proyectos(server_id: str, formato: str = "csv", limite_bytes: int = None):
+    """
+    Vuelca los proyectos del servidor en un archivo temporal, página a página.
+
+    `csv` usa `;` como el archivo de `/publicarlote` y trae las columnas de CAMPOS_PROYECTO;
+    `json` escribe una línea JSON por proyecto con todos sus campos (JSON Lines), así que
+    ninguno de los dos formatos necesita tener la colección entera en memoria. Si el
+    resultado supera `limite_bytes` se comprime con gzip.
+    Devuelve (archivo binario en la posición 0, nombre sugerido, número de proyectos).
+    """
+    if formato not in ("csv", "json"):
+        raise ValueError("El formato de exportación debe ser `csv` o `json`.")
+    archivo = tempfile.TemporaryFile()
+    total = 0
+    ultimo_id = None
+    try:
+        if formato == "csv":
+            archivo.write("\ufeff".encode("utf-8"))  # BOM: las hojas de cálculo reconocen así los acentos
+            archivo.write((";".join(CAMPOS_PROYECTO) + "\r\n").encode("utf-8"))
+        while True:
+            pagina = await almacenamiento.pagina_proyectos(server_id, ultimo_id, PAGINA_EXPORTACION)
+            if not pagina:
+                break
+            ultimo_id = pagina[-1][0]
+            bloque = io.StringIO()
+            if formato == "csv":
+                escritor = csv.writer(bloque, delimiter=";")
+                escritor.writerows([_a_texto(datos.get(campo, "")) for campo in CAMPOS_PROYECTO]
+                                   for _, datos in pagina)
+            else:
+                for _, datos in pagina:
+                    bloque.write(json.dumps(datos, ensure_ascii=False, default=str) + "\n")
+            archivo.write(bloque.getvalue().encode("utf-8"))
+            total += len(pagina)
+            if len(pagina) < PAGINA_EXPORTACION:
+                break
+
+        nombre = f"proyectos-{server_id}.{'csv' if formato == 'csv' else 'jsonl'}"
+        if limite_bytes is not None and archivo.tell() > limite_bytes:
+            archivo.seek(0)
+            comprimido = tempfile.TemporaryFile()
+            with gzip.GzipFile(fileobj=comprimido, mode="wb", filename=nombre) as destino:
+                shutil.copyfileobj(archivo, destino)
+            archivo.close()
+            archivo, nombre = comprimido, f"{nombre}.gz"
+            if archivo.tell() > limite_bytes:
+                raise ValueError(f"La exportación ocupa {archivo.tell() // 1024} KB comprimida y supera "
+                                 f"el límite de archivos del servidor.")
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    logger.info(f"Exportados {total} proyectos de servidores/{server_id}/proyectos ({formato})")
+    return archivo, nombre, total
+
+
+async def descargar_adjunto(url: str, tamano: int = None, limite: int = MAX_BYTES_IMPORTACION):
+    """
+    Descarga un adjunto por bloques a un archivo temporal (no se guarda entero en memoria).
+    """
+    if tamano is not None and tamano > limite:
+        raise ValueError(f"El archivo supera el máximo de {limite // (1024 * 1024)} MB.")
+    archivo = tempfile.TemporaryFile()
+    try:
+        # Sin límite de tiempo total: un archivo grande tarda más que una portada
+        async with obtener_sesion().get(url, timeout=aiohttp.ClientTimeout(total=None, sock_read=60)) as resp:
+            if resp.status != 200:
+                raise ValueError("No se pudo descargar el archivo adjunto.")
+            recibidos = 0
+            async for bloque in resp.content.iter_chunked(64 * 1024):
+                recibidos += len(bloque)
+                if recibidos > limite:
+                    raise ValueError(f"El archivo supera el máximo de {limite // (1024 * 1024)} MB.")
+                archivo.write(bloque)
+    except BaseException:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return archivo
+
+
+def detectar_formato(nombre: str, archivo) -> str:
+    """
+    `csv` o `json` según la extensión del archivo o, si no la tiene, su primer carácter.
+    """
+    extension = os.path.splitext(nombre or "")[1].lower()
+    if extension == ".csv":
+        return "csv"
+    if extension in (".json", ".jsonl", ".ndjson"):
+        return "json"
+    inicio = archivo.read(64).lstrip(b"\xef\xbb\xbf \t\r\n")
+    archivo.seek(0)
+    return "json" if inicio[:1] in (b"{", b"[") else "csv"
+
+
+def leer_filas(archivo, formato: str):
+    """
+    Genera (número de fila, dict con los campos o None, motivo si la fila no se pudo leer).
+
+    El CSV necesita cabecera con al menos `titulo` (separado por `;` o `,`); el JSON va
+    en formato JSON Lines, un objeto por línea, como el que produce la exportación.
+    """
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        if formato == "csv":
+            cabecera = texto.readline()
+            separador = ";" if cabecera.count(";") >= cabecera.count(",") else ","
+            columnas = [columna.strip().lower() for columna in next(csv.reader([cabecera], delimiter=separador), [])]
+            if "titulo" not in columnas:
+                raise ValueError("El CSV necesita una cabecera con la columna `titulo` "
+                                 f"(columnas reconocidas: {', '.join(CAMPOS_PROYECTO)}).")
+            lector = csv.reader(texto, delimiter=separador)
+            for fila in lector:
+                if not fila or not "".join(fila).strip():
+                    continue
+                # Línea del archivo donde termina la fila (una sinopsis entre comillas puede ocupar varias)
+                yield lector.line_num + 1, dict(zip(columnas, fila)), None
+        else:
+            for numero, linea in enumerate(texto, start=1):
+                linea = linea.strip()
+                if not linea:
+                    continue
+                if numero == 1 and linea.startswith("["):
+                    raise ValueError("El JSON debe tener un proyecto por línea (JSON Lines), como el de `/exportarproyectos`.")
+                try:
+                    datos = json.loads(linea)
+                except ValueError as e:
+                    yield numero, None, f"JSON no válido: {e}"
+                    continue
+                if not isinstance(datos, dict):
+                    yield numero, None, "se esperaba un objeto JSON"
+                    continue
+                yield numero, datos, None
+    except UnicodeDecodeError:
+        raise ValueError("El archivo debe estar codificado en UTF-8.")
+    finally:
+        texto.detach()
+
+
+def validar_fila(datos: dict, conservar_extra: bool = False):
+    """
+    Devuelve (clave, campos) de una fila válida o lanza ValueError con el motivo.
+
+    Con `conservar_extra` (filas JSON, que traen todos los campos exportados) los campos
+    que no son de CAMPOS_PROYECTO se copian tal cual.
+    """
+    titulo = str(datos.get("titulo") or "").strip()
+    if not titulo:
+        raise ValueError("falta el título")
+    if len(titulo) > LONGITUD_MAX_TITULO:
+        raise ValueError(f"el título supera {LONGITUD_MAX_TITULO} caracteres")
+    link = str(datos.get("link_ikigai") or "").strip()
+    if not link:
+        raise ValueError("falta el link de Ikigai")
+    if not link.startswith(("http://", "https://")):
+        raise ValueError("el link de Ikigai debe empezar por http:// o https://")
+    campos = {"titulo": titulo, "link_ikigai": link}
+    sinopsis = str(datos.get("sinopsis") or "").strip()
+    if len(sinopsis) > LONGITUD_MAX_SINOPSIS:
+        raise ValueError(f"la sinopsis supera {LONGITUD_MAX_SINOPSIS} caracteres")
+    if sinopsis:
+        campos["sinopsis"] = sinopsis
+    if conservar_extra:
+        for nombre, valor in datos.items():
+            if nombre in CAMPOS_PROYECTO:
+                continue
+            if not NOMBRE_CAMPO_EXTRA.fullmatch(nombre):
+                raise ValueError(f"nombre de campo no válido: `{nombre}`")
+            campos[nombre] = valor
+    return clave_titulo(titulo), campos
+
+
+class _Informe:
+    """
+    Resumen de la importación y archivo CSV con cada fila omitida y su motivo.
+    """
+    def __init__(self):
+        self.resumen = {"filas": 0, "creados": 0, "actualizados": 0, "existentes": 0,
+                        "duplicados": 0, "invalidos": 0, "problemas": []}
+        self.archivo = tempfile.TemporaryFile()
+        self.archivo.write("\ufefffila;titulo;motivo\r\n".encode("utf-8"))
+
+    def problema(self, numero, titulo, motivo, tipo):
+        self.resumen[tipo] += 1
+        linea = io.StringIO()
+        csv.writer(linea, delimiter=";").writerow([numero, titulo or "", motivo])
+        self.archivo.write(linea.getvalue().encode("utf-8"))
+        if len(self.resumen["problemas"]) < MAX_PROBLEMAS_MOSTRADOS:
+            self.resumen["problemas"].append(f"Fila {numero}: {motivo}" + (f" ({titulo})" if titulo else ""))
+
+
+async def _escribir_lote(server_id, lote, actualizar, simular, informe, intentos=3):
+    """
+    Comprueba qué claves del lote ya existen y escribe el resto en un solo commit.
+    """
+    for intento in range(intentos):
+        existentes = await almacenamiento.leer_proyectos(server_id, [clave for _, clave, _ in lote])
+        operaciones, omitidos = [], []
+        for numero, clave, campos in lote:
+            if clave not in existentes:
+                operaciones.append(("crear", clave, dict({"sinopsis": SINOPSIS_POR_DEFECTO}, **campos)))
+            elif actualizar:
+                operaciones.append(("actualizar", clave, campos))
+            else:
+                omitidos.append((numero, campos["titulo"]))
+        if not operaciones or simular:
+            break
+        try:
+            await almacenamiento.escribir_lote(server_id, operaciones)
+            break
+        except DocumentoExistente:
+            # Alguien creó uno de estos proyectos entre la lectura y el commit: volver a comprobar
+            if intento == intentos - 1:
+                raise
+
+    for numero, titulo in omitidos:
+        informe.problema(numero, titulo, "ya existe un proyecto con ese título", "existentes")
+    for operacion, clave, campos in operaciones:
+        informe.resumen["creados" if operacion == "crear" else "actualizados"] += 1
+        if operacion == "crear" and not simular:
+            cache_titulos.registrar(server_id, clave, campos["titulo"])
+
+
+async def importar_proyectos(server_id: str, archivo, formato: str, actualizar: bool = False,
+                             simular: bool = False):
+    """
+    Importa proyectos desde un archivo leyéndolo por filas y escribiendo en lotes de hasta 500.
+
+    Cada fila se valida (título, link de Ikigai, longitud de la sinopsis) y se deduplica
+    por `clave_titulo` dentro del archivo y contra los proyectos existentes, que se
+    omiten o, con `actualizar`, se sobrescriben con los campos del archivo. Con
+    `simular` solo se genera el informe. Las filas JSON conservan además los demás campos
+    exportados (ver `validar_fila`). Los proyectos antiguos con ID automático no se
+    detectan como existentes: conviene ejecutar antes `$manager migrar_claves`.
+    Devuelve (resumen, archivo CSV del informe en la posición 0).
+    """
+    informe = _Informe()
+    vistos = {}  # clave -> fila donde apareció primero
+    lote = []
+    try:
+        for numero, datos, motivo in leer_filas(archivo, formato):
+            informe.resumen["filas"] += 1
+            titulo = str(datos.get("titulo") or "").strip() if datos else ""
+            if motivo is None:
+                try:
+                    clave, campos = validar_fila(datos, conservar_extra=formato == "json")
+                except ValueError as e:
+                    motivo = str(e)
+            if motivo is not None:
+                informe.problema(numero, titulo, motivo, "invalidos")
+                continue
+            if clave in vistos:
+                informe.problema(numero, titulo, f"título repetido en el archivo (fila {vistos[clave]})", "duplicados")
+                continue
+            vistos[clave] = numero
+            lote.append((numero, clave, campos))
+            if len(lote) == OPERACIONES_POR_LOTE:
+                await _escribir_lote(server_id, lote, actualizar, simular, informe)
+                lote = []
+                logger.info(f"Importación en {server_id}: {informe.resumen['filas']} filas leídas")
+        if lote:
+            await _escribir_lote(server_id, lote, actualizar, simular, informe)
+    except BaseException:
+        informe.archivo.close()
+        raise
+    finally:
+        if actualizar and not simular:
+            invalidar(server_id)
+    informe.archivo.seek(0)
+    resumen = informe.resumen
+    logger.info(f"Importación en servidores/{server_id}/proyectos (simular={simular}): {resumen['filas']} filas, "
+                f"{resumen['creados']} creados, {resumen['actualizados']} actualizados, "
+                f"{resumen['existentes'] + resumen['duplicados'] + resumen['invalidos']} omitidos")
+    return resumen, informe.archivo
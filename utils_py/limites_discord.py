@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+
+# Límites de Discord para crear mensajes: 5 por canal cada 5 segundos y 50 por segundo en total
+MENSAJES_POR_CANAL = int(os.getenv("DISCORD_MENSAJES_POR_CANAL", "5"))
+PERIODO_CANAL = float(os.getenv("DISCORD_PERIODO_CANAL", "5"))
+PETICIONES_GLOBALES = int(os.getenv("DISCORD_PETICIONES_GLOBALES", "50"))
+
+
+class CuboTokens:
+    """
+    Cubo de tokens: admite ráfagas de `capacidad` y se rellena a `capacidad / periodo` por segundo.
+    """
+    def __init__(self, capacidad: int, periodo: float):
+        self.capacidad = capacidad
+        self.ritmo = capacidad / periodo
+        self.tokens = float(capacidad)
+        self.actualizado = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _rellenar(self):
+        ahora = time.monotonic()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self.actualizado) * self.ritmo)
+        self.actualizado = ahora
+
+    def espera_estimada(self) -> float:
+        """
+        Segundos hasta que haya un token disponible (0 si ya lo hay).
+        """
+        self._rellenar()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.ritmo
+
+    def lleno(self) -> bool:
+        self._rellenar()
+        return self.tokens >= self.capacidad and not self._lock.locked()
+
+    async def tomar(self) -> float:
+        """
+        Espera hasta obtener un token y devuelve cuánto tuvo que esperar.
+        """
+        inicio = time.monotonic()
+        async with self._lock:
+            while True:
+                espera = self.espera_estimada()
+                if espera == 0:
+                    self.tokens -= 1
+                    return time.monotonic() - inicio
+                await asyncio.sleep(espera)
+
+
+class LimitadorRutas:
+    """
+    Planificador de envíos según los buckets de rate limit de Discord.
+
+    La ruta de creación de mensajes tiene un bucket por canal, además del límite global
+    del bot; esperar aquí evita los 429 (y que discord.py duerma dentro del handler).
+    """
+    def __init__(self, por_canal=MENSAJES_POR_CANAL, periodo_canal=PERIODO_CANAL, globales=PETICIONES_GLOBALES):
+        self.por_canal = por_canal
+        self.periodo_canal = periodo_canal
+        self._global = CuboTokens(globales, 1.0)
+        self._canales = {}
+
+    def cubo(self, canal_id: int) -> CuboTokens:
+        cubo = self._canales.get(canal_id)
+        if cubo is None:
+            if len(self._canales) >= 1000:
+                # Un cubo lleno equivale a uno nuevo: se puede descartar
+                for otro_id, otro in list(self._canales.items()):
+                    if otro.lleno():
+                        del self._canales[otro_id]
+            cubo = self._canales[canal_id] = CuboTokens(self.por_canal, self.periodo_canal)
+        return cubo
+
+    async def esperar_turno(self, canal_id: int) -> float:
+        """
+        Espera el turno del canal y luego el global; devuelve el tiempo total de espera.
+        """
+        espera = await self.cubo(canal_id).tomar()
+        espera += await self._global.tomar()
+        return espera
+
+
+# Instancia global del limitador
+limitador_discord = LimitadorRutas()
@@ -0,0 +1,261 @@
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from aiohttp import web
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Dirección del endpoint /metrics (puerto 0 para desactivarlo)
+METRICAS_HOST = os.getenv("METRICAS_HOST", "127.0.0.1")
+METRICAS_PUERTO = int(os.getenv("METRICAS_PUERTO", "9100"))
+
+# Límites de los buckets de latencia (segundos)
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    return "{" + ",".join(f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)) + "}"
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Contador:
+    """
+    Contador monótono con etiquetas.
+
+    Seguro entre hilos: los listeners de Firestore lo incrementan desde su propio hilo.
+    """
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad: float = 1, **etiquetas):
+        clave = tuple(etiquetas.get(nombre, "") for nombre in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def exponer(self):
+        with self._lock:
+            valores = list(self._valores.items())
+        for clave, valor in valores:
+            yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+
+
+class Indicador:
+    """
+    Valor instantáneo leído de una función en cada exposición (profundidad de cola, retraso del loop...).
+
+    Con etiquetas, la función devuelve {(valores de las etiquetas): valor}.
+    """
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, funcion, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.funcion = funcion
+        self.etiquetas = tuple(etiquetas)
+
+    def exponer(self):
+        try:
+            if not self.etiquetas:
+                yield f"{self.nombre} {self.funcion()}"
+                return
+            for clave, valor in self.funcion().items():
+                yield f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {valor}"
+        except Exception as e:
+            logger.error(f"No se pudo leer la métrica {self.nombre}: {e}")
+
+
+class Histograma:
+    """
+    Histograma acumulativo al estilo de Prometheus (buckets `le`, `_sum` y `_count`), seguro entre hilos.
+    """
+    tipo = "histogram"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket (+Inf al final), suma]
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, **etiquetas):
+        clave = tuple(etiquetas.get(nombre, "") for nombre in self.etiquetas)
+        indice = bisect.bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * (len(self.buckets) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    @contextmanager
+    def cronometrar(self, **etiquetas):
+        """
+        Observa la duración del bloque `with`, termine bien o con excepción.
+        """
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+    def exponer(self):
+        nombres = self.etiquetas + ("le",)
+        # Copia bajo el lock: se recorre sin bloquear a los hilos que observan
+        with self._lock:
+            series = [(clave, list(conteos), suma) for clave, (conteos, suma) in self._series.items()]
+        for clave, conteos, suma in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + ("+Inf",), conteos):
+                acumulado += conteo
+                yield f"{self.nombre}_bucket{_etiquetas(nombres, clave + (limite,))} {acumulado}"
+            yield f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {suma}"
+            yield f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {acumulado}"
+
+
+class RegistroMetricas:
+    """
+    Registro de métricas del bot, expuesto en formato de texto de Prometheus.
+    """
+    def __init__(self):
+        self._metricas = []
+        self._runner = None
+
+    def registrar(self, metrica):
+        self._metricas.append(metrica)
+        return metrica
+
+    def contador(self, nombre, ayuda, etiquetas=()) -> Contador:
+        return self.registrar(Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA) -> Histograma:
+        return self.registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def indicador(self, nombre, ayuda, funcion, etiquetas=()) -> Indicador:
+        return self.registrar(Indicador(nombre, ayuda, funcion, etiquetas))
+
+    def exponer(self) -> str:
+        lineas = []
+        for metrica in self._metricas:
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+    async def _handler(self, request):
+        return web.Response(text=self.exponer(), content_type="text/plain", charset="utf-8")
+
+    async def iniciar_servidor(self, host: str = METRICAS_HOST, puerto: int = METRICAS_PUERTO):
+        """
+        Sirve `/metrics` con aiohttp en el event loop del bot.
+        """
+        if not puerto or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self._handler)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, host, puerto).start()
+        except OSError as e:
+            # Sin métricas el bot sigue funcionando (p. ej. puerto ocupado)
+            logger.error(f"No se pudo iniciar el endpoint de métricas en {host}:{puerto}: {e}")
+            await self.detener_servidor()
+            return
+        logger.info(f"Métricas disponibles en http://{host}:{puerto}/metrics")
+
+    async def detener_servidor(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+# Instancia global del registro de métricas
+metricas = RegistroMetricas()
+
+# Comandos (slash, con prefijo y modales) y autocompletado
+latencia_comandos = metricas.histograma(
+    "publimanager_comando_segundos", "Duración de los comandos", ("tipo", "comando", "resultado"))
+latencia_autocompletado = metricas.histograma(
+    "publimanager_autocompletado_segundos", "Duración de las respuestas de autocompletado", ("comando",))
+
+# Firestore
+operaciones_firestore = metricas.contador(
+    "publimanager_firestore_documentos_total", "Documentos leídos o escritos en Firestore", ("operacion", "tipo"))
+latencia_firestore = metricas.histograma(
+    "publimanager_firestore_segundos", "Duración de las llamadas a Firestore", ("operacion",))
+
+# Imágenes y envíos a Discord
+latencia_imagenes = metricas.histograma(
+    "publimanager_imagen_segundos", "Tiempo para obtener una portada", ("origen",))
+bytes_imagenes = metricas.contador(
+    "publimanager_imagen_bytes_total", "Bytes de portadas obtenidas", ("origen",))
+consultas_portadas = metricas.contador(
+    "publimanager_portadas_cache_total", "Consultas a la caché de portadas por resultado", ("resultado",))
+latencia_envios = metricas.histograma(
+    "publimanager_discord_envio_segundos", "Duración de los envíos de mensajes a Discord", ("resultado",))
+espera_envios = metricas.histograma(
+    "publimanager_discord_espera_segundos", "Espera por rate limit antes de cada envío")
+espera_cola_envios = metricas.histograma(
+    "publimanager_cola_envios_espera_segundos", "Tiempo de cada mensaje en la cola de su canal", ("prioridad",))
+envios_cola = metricas.contador(
+    "publimanager_cola_envios_total", "Mensajes de la cola de envíos por resultado", ("prioridad", "resultado"))
+
+
+def medir_comando(tipo: str, comando: str):
+    """
+    Decorador para handlers async (modales, trabajos de la cola): observa su duración y si fallaron.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        async def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = "error"
+            try:
+                valor = await funcion(*args, **kwargs)
+                resultado = "ok"
+                return valor
+            finally:
+                latencia_comandos.observar(time.perf_counter() - inicio, tipo=tipo, comando=comando, resultado=resultado)
+        return envoltura
+    return decorador
+
+
+def medir_autocompletado(comando: str):
+    """
+    Decorador para las funciones de autocompletado.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        async def envoltura(interaction, current):
+            with latencia_autocompletado.cronometrar(comando=comando):
+                return await funcion(interaction, current)
+        return envoltura
+    return decorador
+
+
+def registrar_firestore(operacion: str, lecturas: int = 0, escrituras: int = 0):
+    """
+    Cuenta los documentos leídos y escritos por una operación de Firestore.
+    """
+    if lecturas:
+        operaciones_firestore.inc(lecturas, operacion=operacion, tipo="lectura")
+    if escrituras:
+        operaciones_firestore.inc(escrituras, operacion=operacion, tipo="escritura")
@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import os
+import time
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Intervalo de muestreo y umbral a partir del cual se reporta un bloqueo (segundos)
+INTERVALO = float(os.getenv("MONITOR_LOOP_INTERVALO", "0.5"))
+UMBRAL_BLOQUEO = float(os.getenv("MONITOR_LOOP_UMBRAL", "0.25"))
+
+
+class MonitorLoop:
+    """
+    Mide cuánto se retrasa el event loop respecto a lo programado.
+
+    Un retraso alto significa que algún handler ejecutó código bloqueante.
+    """
+    def __init__(self, intervalo=INTERVALO, umbral=UMBRAL_BLOQUEO):
+        self.intervalo = intervalo
+        self.umbral = umbral
+        self.ultimo_retraso = 0.0
+        self.max_retraso = 0.0
+        self.bloqueos = 0
+        self.retraso_total = 0.0
+        self._tarea = None
+
+    def iniciar(self):
+        """
+        Arranca la tarea de muestreo en el event loop actual.
+        """
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.create_task(self._vigilar())
+
+    def detener(self):
+        if self._tarea is not None:
+            self._tarea.cancel()
+            self._tarea = None
+
+    async def _vigilar(self):
+        while True:
+            inicio = time.perf_counter()
+            await asyncio.sleep(self.intervalo)
+            retraso = max(0.0, time.perf_counter() - inicio - self.intervalo)
+            self.ultimo_retraso = retraso
+            self.max_retraso = max(self.max_retraso, retraso)
+            if retraso >= self.umbral:
+                self.bloqueos += 1
+                self.retraso_total += retraso
+                logger.warning(f"Event loop bloqueado durante {retraso * 1000:.0f} ms")
+
+    def estadisticas(self):
+        return {
+            "ultimo_retraso_ms": round(self.ultimo_retraso * 1000, 1),
+            "max_retraso_ms": round(self.max_retraso * 1000, 1),
+            "bloqueos": self.bloqueos,
+            "retraso_total_ms": round(self.retraso_total * 1000, 1),
+        }
+
+
+# Instancia global del monitor
+monitor_loop = MonitorLoop()
@@ -0,0 +1,124 @@
+import logging
+import string
+
+from utils_py.cache_config import cache_config
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Longitud máxima de una plantilla (los mensajes de Discord admiten 2000 caracteres)
+LONGITUD_MAX_PLANTILLA = 1500
+
+# Plantilla por defecto: el anuncio de siempre
+PLANTILLA_PREDETERMINADA = (
+    ":mega:| {menciones}\n"
+    ":loudspeaker: Buenas, nuevo capítulo de **{titulo}** :rotating_light:\n"
+    "# :newspaper2: Capítulo {capitulo}\n"
+    "# :link: [Link de Ikigai](<{link_ikigai}>)\n"
+    "{linea_tmo}"
+    ":newspaper2: Gracias a todo el staff por el trabajo realizado :hearts:\n"
+    "{linea_donadores}"
+    "⊳Sinopsis:\n```{sinopsis}```\n"
+)
+
+# Campos que dependen solo de la configuración: se renderizan al compilar
+CAMPOS_FIJOS = ("menciones", "menciones_donadores", "linea_donadores")
+# Campos que cambian en cada anuncio
+CAMPOS_VARIABLES = ("titulo", "capitulo", "link_ikigai", "link_tmo", "linea_tmo", "sinopsis")
+
+
+class PlantillaCompilada:
+    """
+    Plantilla de anuncio ya analizada, con las menciones de roles del servidor pre-renderizadas.
+
+    Se guarda como una lista de (texto fijo, campo variable o None), así que renderizar
+    es solo concatenar.
+    """
+    def __init__(self, texto: str, config: dict):
+        menciones_ide = ' '.join(f'<@&{config[f"ide_{i}"]}>' for i in range(1, 6) if config.get(f'ide_{i}'))
+        menciones_ido = ' '.join(f'<@&{config[f"ido_{i}"]}>' for i in range(1, 6) if config.get(f'ido_{i}'))
+        fijos = {
+            "menciones": menciones_ide,
+            "menciones_donadores": menciones_ido,
+            "linea_donadores": (f":newspaper2: Gracias a {menciones_ido} por apoyar el proyecto :hearts:\n"
+                                if menciones_ido else ""),
+        }
+
+        self.partes = []
+        pendiente = ""
+        for literal, campo, formato, conversion in analizar(texto):
+            pendiente += literal
+            if campo is None:
+                continue
+            if campo in fijos:
+                pendiente += fijos[campo]
+            else:
+                self.partes.append((pendiente, campo))
+                pendiente = ""
+        if pendiente:
+            self.partes.append((pendiente, None))
+
+    def renderizar(self, proyecto_data: dict, capitulo: str, tmo_link: str = "") -> str:
+        tmo_link = (tmo_link or "").strip()
+        valores = {
+            "titulo": proyecto_data.get('titulo', 'Título no encontrado'),
+            "capitulo": capitulo,
+            "link_ikigai": proyecto_data.get('link_ikigai', '#'),
+            "link_tmo": tmo_link,
+            "linea_tmo": f":link: [Link de TMO](<{tmo_link}>)\n" if tmo_link else "",
+            "sinopsis": proyecto_data.get('sinopsis', 'Sin sinopsis disponible'),
+        }
+        return "".join(texto + valores[campo] if campo else texto for texto, campo in self.partes)
+
+
+def analizar(texto: str):
+    """
+    Analiza una plantilla y valida sus campos; lanza ValueError si no es válida.
+    """
+    if len(texto) > LONGITUD_MAX_PLANTILLA:
+        raise ValueError(f"La plantilla no puede superar los {LONGITUD_MAX_PLANTILLA} caracteres.")
+    try:
+        partes = list(string.Formatter().parse(texto))
+    except ValueError:
+        raise ValueError("La plantilla tiene llaves sin cerrar; usa `{{` y `}}` para escribir llaves literales.")
+    for _, campo, formato, conversion in partes:
+        if campo is None:
+            continue
+        if campo not in CAMPOS_FIJOS + CAMPOS_VARIABLES:
+            raise ValueError(f"Campo desconocido `{{{campo}}}`. Campos disponibles: "
+                             + ", ".join(f"`{{{nombre}}}`" for nombre in CAMPOS_FIJOS + CAMPOS_VARIABLES))
+        if formato or conversion:
+            raise ValueError(f"El campo `{{{campo}}}` no admite formato ni conversión.")
+    return partes
+
+
+class CachePlantillas:
+    """
+    Plantillas compiladas por servidor; se descartan cuando cambia su configuración.
+    """
+    def __init__(self):
+        self._compiladas = {}
+        cache_config.al_cambiar(self.invalidar)
+
+    def obtener(self, server_id: str, config: dict) -> PlantillaCompilada:
+        plantilla = self._compiladas.get(server_id)
+        if plantilla is None:
+            texto = config.get('plantilla_anuncio') or PLANTILLA_PREDETERMINADA
+            try:
+                plantilla = PlantillaCompilada(texto, config)
+            except ValueError as e:
+                # Una plantilla guardada a mano en Firestore no debe impedir publicar
+                logger.error(f"Plantilla no válida en {server_id}, se usa la predeterminada: {e}")
+                plantilla = PlantillaCompilada(PLANTILLA_PREDETERMINADA, config)
+            self._compiladas[server_id] = plantilla
+        return plantilla
+
+    def invalidar(self, server_id: str = None):
+        if server_id is None:
+            self._compiladas.clear()
+        else:
+            self._compiladas.pop(server_id, None)
+
+
+# Instancia global de la caché de plantillas
+cache_plantillas = CachePlantillas()
@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+
+from utils_py.almacenamiento import DocumentoExistente, almacenamiento
+from utils_py.indice_titulos import normalizar
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Longitud máxima de la clave y parámetros de la caché de proyectos
+LONGITUD_MAX_CLAVE = 200
+TTL_PROYECTOS = float(os.getenv("CACHE_PROYECTOS_TTL", "120"))
+MAX_PROYECTOS_CACHEADOS = int(os.getenv("CACHE_PROYECTOS_MAX", "2000"))
+
+# Cada proyecto re-clavado ocupa dos escrituras (crear + borrar) de las 500 de un lote
+PROYECTOS_POR_LOTE_MIGRACION = 200
+
+
+def clave_titulo(titulo: str) -> str:
+    """
+    ID de documento determinista para un título: normalizado, sin acentos y con guiones.
+
+    "Solo Leveling: Ragnarök " y "solo leveling ragnarok" producen la misma clave. Los títulos
+    sin letras latinas ni dígitos ("나 혼자만 레벨업", "!!!") usan un hash del título (NFKC, sin
+    distinguir mayúsculas ni espacios repetidos): `t-<sha1[:16]>`.
+    """
+    clave = normalizar(titulo).replace(' ', '-')
+    if not clave:
+        canonico = ' '.join(unicodedata.normalize('NFKC', titulo or '').casefold().split())
+        if not canonico:
+            raise ValueError("El título del proyecto no puede estar vacío.")
+        return f"t-{hashlib.sha1(canonico.encode('utf-8')).hexdigest()[:16]}"
+    if len(clave) > LONGITUD_MAX_CLAVE:
+        resumen = hashlib.sha1(clave.encode('utf-8')).hexdigest()[:12]
+        clave = f"{clave[:LONGITUD_MAX_CLAVE - 13]}-{resumen}"
+    return clave
+
+
+# Caché de proyectos leídos: (server_id, clave) -> (doc_id, datos, expira)
+_cache = OrderedDict()
+
+
+def _cachear(server_id, clave, doc_id, datos):
+    _cache[(server_id, clave)] = (doc_id, datos, time.monotonic() + TTL_PROYECTOS)
+    _cache.move_to_end((server_id, clave))
+    while len(_cache) > MAX_PROYECTOS_CACHEADOS:
+        _cache.popitem(last=False)
+
+
+def invalidar(server_id: str, titulo: str = None):
+    """
+    Descarta de la caché un proyecto (o todos los del servidor).
+    """
+    if titulo is not None:
+        _cache.pop((server_id, clave_titulo(titulo)), None)
+        return
+    for llave in [llave for llave in _cache if llave[0] == server_id]:
+        del _cache[llave]
+
+
+async def obtener_proyecto(server_id: str, titulo: str):
+    """
+    Devuelve (doc_id, datos) del proyecto con ese título, o None si no existe.
+
+    Es una lectura directa por ID; los proyectos antiguos con ID automático (aún
+    no migrados con `$manager migrar_claves`) se buscan por el campo `titulo`.
+    """
+    clave = clave_titulo(titulo)
+    cacheado = _cache.get((server_id, clave))
+    if cacheado is not None and cacheado[2] > time.monotonic():
+        return cacheado[0], dict(cacheado[1])
+
+    datos = await almacenamiento.leer_proyecto(server_id, clave)
+    if datos is None:
+        # Compatibilidad con proyectos sin migrar
+        return await _buscar_sin_migrar(server_id, titulo)
+
+    _cachear(server_id, clave, clave, datos)
+    return clave, dict(datos)
+
+
+async def _buscar_sin_migrar(server_id: str, titulo: str):
+    """
+    Busca por el campo `titulo` un proyecto cuyo ID aún no es su clave (ya se sabe que la lectura directa falló).
+    """
+    encontrado = await almacenamiento.buscar_proyecto_por_titulo(server_id, titulo)
+    if encontrado is None:
+        return None
+    doc_id, datos = encontrado
+    _cachear(server_id, clave_titulo(titulo), doc_id, datos)
+    return doc_id, dict(datos)
+
+
+async def obtener_proyectos(server_id: str, titulos):
+    """
+    Devuelve {titulo: datos} para varios títulos con una sola lectura por lotes.
+    """
+    claves = {}
+    for titulo in titulos:
+        claves.setdefault(clave_titulo(titulo), []).append(titulo)
+
+    encontrados = {}
+    for doc_id, datos in (await almacenamiento.leer_proyectos(server_id, claves)).items():
+        _cachear(server_id, doc_id, doc_id, datos)
+        for titulo in claves[doc_id]:
+            encontrados[titulo] = datos
+
+    # Compatibilidad con proyectos sin migrar: solo la consulta por título (la lectura directa ya falló), en paralelo
+    faltantes = list(dict.fromkeys(titulo for titulo in titulos if titulo not in encontrados))
+    resultados = await asyncio.gather(*(_buscar_sin_migrar(server_id, titulo) for titulo in faltantes))
+    for titulo, resultado in zip(faltantes, resultados):
+        if resultado is not None:
+            encontrados[titulo] = resultado[1]
+    return encontrados
+
+
+async def crear_proyecto(server_id: str, datos: dict) -> str:
+    """
+    Crea un proyecto con ID derivado de su título; falla si ya existe uno equivalente.
+    """
+    clave = clave_titulo(datos["titulo"])
+    try:
+        await almacenamiento.crear_proyecto(server_id, clave, datos)
+    except DocumentoExistente:
+        raise ValueError(f"Ya existe un proyecto con el título '{datos['titulo']}'.")
+    _cachear(server_id, clave, clave, dict(datos))
+    return clave
+
+
+async def actualizar_proyecto(server_id: str, titulo_actual: str, campos: dict):
+    """
+    Actualiza un proyecto; si cambia el título, lo mueve al ID de la nueva clave.
+
+    Devuelve (doc_id anterior, doc_id nuevo) o None si el proyecto no existe.
+    """
+    encontrado = await obtener_proyecto(server_id, titulo_actual)
+    if encontrado is None:
+        return None
+    doc_id, datos = encontrado
+    nuevo_id = clave_titulo(campos.get("titulo", datos.get("titulo", titulo_actual)))
+
+    if nuevo_id == doc_id:
+        await almacenamiento.actualizar_proyecto(server_id, doc_id, campos)
+    else:
+        # Renombrado: crear el documento con la nueva clave y borrar el anterior de forma atómica
+        try:
+            await almacenamiento.mover_proyecto(server_id, doc_id, nuevo_id, dict(datos, **campos))
+        except DocumentoExistente:
+            raise ValueError(f"Ya existe un proyecto con el título '{campos['titulo']}'.")
+
+    invalidar(server_id, titulo_actual)
+    _cachear(server_id, nuevo_id, nuevo_id, dict(datos, **campos))
+    return doc_id, nuevo_id
+
+
+async def migrar_claves(server_id: str, simular: bool = False):
+    """
+    Re-clava los proyectos de un servidor para que su ID sea `clave_titulo(titulo)`.
+
+    Procesa la colección por páginas y mueve cada página en un lote (crear + borrar).
+    Los títulos que colisionan con otro proyecto se omiten y se informan.
+    Se puede volver a ejecutar sin riesgo: los proyectos ya migrados se saltan.
+    """
+    resumen = {"revisados": 0, "migrados": 0, "ya_migrados": 0, "colisiones": []}
+    asignadas = set()
+    ultimo_id = None
+
+    while True:
+        pagina = await almacenamiento.pagina_proyectos(server_id, ultimo_id, PROYECTOS_POR_LOTE_MIGRACION)
+        if not pagina:
+            break
+        ultimo_id = pagina[-1][0]
+
+        # Documentos a mover y comprobación de que sus claves destino estén libres
+        pendientes = []
+        for doc_id, datos in pagina:
+            if doc_id in asignadas:
+                # Documento creado por esta misma migración en una página anterior
+                continue
+            resumen["revisados"] += 1
+            try:
+                clave = clave_titulo(datos.get('titulo', ''))
+            except ValueError:
+                resumen["colisiones"].append(f"{doc_id} (sin título)")
+                continue
+            if clave == doc_id:
+                resumen["ya_migrados"] += 1
+                asignadas.add(clave)
+            else:
+                pendientes.append((doc_id, datos, clave))
+
+        existentes = set()
+        if pendientes:
+            existentes = set(await almacenamiento.leer_proyectos(server_id, [clave for _, _, clave in pendientes]))
+
+        operaciones = []
+        for doc_id, datos, clave in pendientes:
+            if clave in existentes or clave in asignadas:
+                resumen["colisiones"].append(f"{datos.get('titulo')} ({doc_id})")
+                continue
+            asignadas.add(clave)
+            operaciones.append(("crear", clave, datos))
+            operaciones.append(("borrar", doc_id, None))
+        movidos = len(operaciones) // 2
+
+        if movidos and not simular:
+            await almacenamiento.escribir_lote(server_id, operaciones)
+        resumen["migrados"] += movidos
+        logger.info(f"Migración de claves en {server_id}: {resumen['revisados']} revisados, {resumen['migrados']} migrados")
+
+        if len(pagina) < PROYECTOS_POR_LOTE_MIGRACION:
+            break
+
+    if not simular:
+        invalidar(server_id)
+    return resumen
@@ -0,0 +1,51 @@
+import logging
+import os
+
+import aiohttp
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Parámetros del pool de conexiones (configurables por variables de entorno)
+LIMITE_CONEXIONES = int(os.getenv("HTTP_LIMITE_CONEXIONES", "100"))
+LIMITE_POR_HOST = int(os.getenv("HTTP_LIMITE_POR_HOST", "10"))
+TTL_DNS = int(os.getenv("HTTP_TTL_DNS", "300"))
+KEEPALIVE = float(os.getenv("HTTP_KEEPALIVE", "60"))
+TIMEOUT = aiohttp.ClientTimeout(
+    total=float(os.getenv("HTTP_TIMEOUT_TOTAL", "30")),
+    connect=float(os.getenv("HTTP_TIMEOUT_CONEXION", "10")),
+    sock_read=float(os.getenv("HTTP_TIMEOUT_LECTURA", "15")),
+)
+
+_sesion = None
+
+
+def obtener_sesion() -> aiohttp.ClientSession:
+    """
+    Devuelve la sesión HTTP compartida del proceso, creándola si hace falta.
+
+    Reutilizar la sesión mantiene vivas las conexiones (y el TLS) con las CDNs de
+    las portadas y cachea sus resoluciones DNS.
+    """
+    global _sesion
+    if _sesion is None or _sesion.closed:
+        conector = aiohttp.TCPConnector(
+            limit=LIMITE_CONEXIONES,
+            limit_per_host=LIMITE_POR_HOST,
+            ttl_dns_cache=TTL_DNS,
+            keepalive_timeout=KEEPALIVE,
+        )
+        _sesion = aiohttp.ClientSession(connector=conector, timeout=TIMEOUT, raise_for_status=False)
+        logger.info("Sesión HTTP compartida creada.")
+    return _sesion
+
+
+async def cerrar_sesion():
+    """
+    Cierra la sesión compartida (se llama al apagar el bot).
+    """
+    global _sesion
+    if _sesion is not None and not _sesion.closed:
+        await _sesion.close()
+        logger.info("Sesión HTTP compartida cerrada.")
+    _sesion = None
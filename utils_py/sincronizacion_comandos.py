@@ -0,0 +1,121 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+import discord
+
+from utils_py.almacenamiento import almacenamiento
+
+# Configuración del logger
+logger = logging.getLogger(__name__)
+
+# Servidor de desarrollo: si se indica, los comandos se sincronizan solo ahí (al instante)
+GUILD_DESARROLLO = os.getenv("GUILD_DESARROLLO")
+# Sincronizar aunque la huella no haya cambiado
+FORZAR_SINCRONIZACION = os.getenv("FORZAR_SINCRONIZACION", "").lower() in ("1", "true", "si", "sí")
+# Reintentos si la sincronización falla (espera inicial, se duplica en cada fallo hasta el máximo)
+ESPERA_REINTENTO = 30.0
+ESPERA_MAX_REINTENTO = 900.0
+
+# Tarea de reintento en curso (como mucho una)
+_reintento = None
+
+
+def huella_arbol(tree, guild=None) -> str:
+    """
+    Hash estable de los comandos de barra registrados (nombres, descripciones, opciones, autocompletado...).
+
+    Usa la misma representación que se envía a Discord al sincronizar, así que cambia
+    exactamente cuando cambiaría lo que Discord tiene registrado.
+    """
+    comandos = sorted((comando.to_dict(tree) for comando in tree.get_commands(guild=guild)),
+                      key=lambda comando: (comando.get("type", 1), comando["name"]))
+    serializado = json.dumps(comandos, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(serializado.encode("utf-8")).hexdigest()
+
+
+async def _leer_huella(nombre):
+    # Un fallo al leer solo fuerza una sincronización, nunca la salta
+    try:
+        datos = await almacenamiento.leer_metadato(nombre)
+    except Exception as e:
+        logger.warning(f"No se pudo leer la huella de comandos ({nombre}): {e}")
+        return None
+    return (datos or {}).get("huella")
+
+
+async def _guardar_huella(nombre, huella):
+    try:
+        await almacenamiento.escribir_metadato(nombre, {"huella": huella})
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la huella de comandos ({nombre}): {e}")
+
+
+async def sincronizar_si_cambia(bot, guild_id=GUILD_DESARROLLO, forzar: bool = FORZAR_SINCRONIZACION):
+    """
+    Sincroniza los comandos de barra solo si cambiaron desde la última sincronización.
+
+    Con `guild_id` los comandos globales se copian a ese servidor y se sincronizan solo
+    ahí, lo que Discord aplica al momento (útil en desarrollo). Devuelve un resumen con
+    el ámbito, si se sincronizó y cuánto tardó.
+
+    La huella se guarda en el almacenamiento (no en un archivo local), así que sobrevive a
+    los reinicios en sistemas de archivos efímeros como los dynos de Heroku.
+    """
+    guild = discord.Object(id=int(guild_id)) if guild_id else None
+    if guild is not None:
+        bot.tree.copy_global_to(guild=guild)
+    ambito = f"guild:{guild.id}" if guild is not None else "global"
+    # La huella guardada es por aplicación: otro token (p. ej. un bot de pruebas) no la reutiliza
+    nombre = f"comandos-{bot.application_id}-{ambito}"
+
+    huella = huella_arbol(bot.tree, guild=guild)
+    resumen = {"ambito": ambito, "sincronizado": False, "comandos": len(bot.tree.get_commands(guild=guild)),
+               "segundos": 0.0}
+    if not forzar and await _leer_huella(nombre) == huella:
+        logger.info(f"Comandos de barra sin cambios ({ambito}): se omite la sincronización")
+        return resumen
+
+    inicio = time.perf_counter()
+    sincronizados = await bot.tree.sync(guild=guild)
+    resumen.update(sincronizado=True, comandos=len(sincronizados), segundos=time.perf_counter() - inicio)
+    logger.info(f"Comandos de barra sincronizados ({ambito}): {len(sincronizados)} en {resumen['segundos']:.2f} s")
+
+    # Solo se guarda tras una sincronización correcta
+    await _guardar_huella(nombre, huella)
+    return resumen
+
+
+async def _reintentar(bot, espera, espera_max):
+    intento = 0
+    while True:
+        await asyncio.sleep(espera)
+        intento += 1
+        try:
+            resumen = await sincronizar_si_cambia(bot)
+        except discord.app_commands.CommandSyncFailure as e:
+            # Discord rechazó la definición de los comandos: reintentar no lo arregla
+            logger.error(f"Discord rechazó los comandos de barra; no se reintenta: {e}")
+            return None
+        except Exception as e:
+            espera = min(espera * 2, espera_max)
+            logger.error(f"Error al sincronizar comandos de barra (reintento {intento}, siguiente en {espera:.0f} s): {e}")
+            continue
+        logger.info(f"Comandos de barra sincronizados tras {intento} reintentos")
+        return resumen
+
+
+def reintentar_sincronizacion(bot, espera: float = ESPERA_REINTENTO, espera_max: float = ESPERA_MAX_REINTENTO):
+    """
+    Reintenta en segundo plano, con espera creciente, una sincronización que falló al arrancar.
+
+    Las reconexiones no vuelven a sincronizar, así que sin esto los comandos quedarían
+    desactualizados hasta el siguiente reinicio. Solo hay una tarea de reintento a la vez.
+    """
+    global _reintento
+    if _reintento is None or _reintento.done():
+        _reintento = asyncio.create_task(_reintentar(bot, espera, espera_max))
+    return _reintento
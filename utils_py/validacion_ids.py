@@ -0,0 +1,63 @@
+import discord
+from utils_py.almacenamiento import BORRAR_CAMPO
+
+
+class ResolucionIds:
+    """
+    Roles y canales resueltos contra un servidor, y los IDs que no se pudieron usar.
+    """
+    def __init__(self):
+        self.roles = []
+        self.canales = []
+        self.invalidos = []
+
+    def validar(self):
+        """
+        Lanza ValueError con todos los IDs no válidos, antes de escribir nada.
+        """
+        if self.invalidos:
+            raise ValueError("IDs no válidos:\n" + "\n".join(self.invalidos))
+        return self
+
+
+def resolver_ids(guild: discord.Guild, roles_ids=(), canales_ids=()) -> ResolucionIds:
+    """
+    Resuelve en una pasada los IDs de roles y canales con los índices por ID del servidor.
+
+    `get_role` y `get_channel` son búsquedas directas en la caché de discord.py, sin recorrer
+    `guild.roles` ni `guild.channels`. Los IDs repetidos se cuentan una sola vez.
+    """
+    resolucion = ResolucionIds()
+    for role_id in dict.fromkeys(roles_ids):
+        rol = guild.get_role(role_id)
+        if rol is None:
+            resolucion.invalidos.append(f"`{role_id}` (no es un rol de {guild.name})")
+        elif rol.is_default():
+            resolucion.invalidos.append(f"`{role_id}` (@everyone no se puede configurar)")
+        else:
+            resolucion.roles.append(rol)
+
+    for canal_id in dict.fromkeys(canales_ids):
+        canal = guild.get_channel(canal_id)
+        if canal is None:
+            resolucion.invalidos.append(f"`{canal_id}` (no es un canal de {guild.name})")
+        elif not isinstance(canal, discord.abc.Messageable):
+            resolucion.invalidos.append(f"`{canal_id}` (#{canal.name} no admite mensajes)")
+        elif not canal.permissions_for(guild.me).send_messages:
+            resolucion.invalidos.append(f"`{canal_id}` (el bot no puede escribir en #{canal.name})")
+        else:
+            resolucion.canales.append(canal)
+    return resolucion
+
+
+def campos_numerados(prefijo: str, ids, config: dict = None) -> dict:
+    """
+    Campos `{prefijo}1..N` para los IDs dados, con BORRAR_CAMPO para los sobrantes de la configuración actual.
+
+    Así una sola escritura deja exactamente el nuevo conjunto, aunque antes hubiera más.
+    """
+    campos = {f"{prefijo}{i+1}": valor for i, valor in enumerate(ids)}
+    for clave in (config or {}):
+        if clave.startswith(prefijo) and clave[len(prefijo):].isdigit() and clave not in campos:
+            campos[clave] = BORRAR_CAMPO
+    return campos